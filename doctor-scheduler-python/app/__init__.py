@@ -1,36 +1,71 @@
-from flask import Flask, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 import os
 from app.models.base import Base
 
 # ---  Khởi tạo extensions ---
-db = SQLAlchemy(model_class=Base)
-migrate = Migrate()
+# `db` và `migrate` được tạo LƯỜI (lazy) ở lần truy cập đầu tiên: tiến trình
+# worker của solver (app/worker.py) import package `app` mà không cần kéo theo
+# Flask, Flask-SQLAlchemy và Flask-Migrate.
+_LAZY_EXTENSIONS = ('db', 'migrate')
+
+def _init_extensions():
+    from flask_sqlalchemy import SQLAlchemy
+    from flask_migrate import Migrate
+    globals()['db'] = SQLAlchemy(model_class=Base)
+    globals()['migrate'] = Migrate()
+
+def __getattr__(name):
+    if name in _LAZY_EXTENSIONS:
+        _init_extensions()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def engine_options(db_uri: str) -> dict:
+    """Tùy chọn engine chung cho web app và worker."""
+    # pyodbc gửi executemany (INSERT hàng loạt) thành 1 lượt thay vì từng dòng
+    if db_uri.startswith('mssql+pyodbc'):
+        return {'fast_executemany': True}
+    return {}
 
 def create_app():
     """
     Hàm factory để tạo và cấu hình ứng dụng Flask.
     (Phiên bản đã thêm Seeder CLI)
     """
+    from flask import Flask, jsonify
+    from app import db, migrate
+
     app = Flask(__name__)
 
     # --- Tải cấu hình (DB_URI) ---
     DB_URI = os.environ.get('SQLALCHEMY_DATABASE_URI')
     if not DB_URI:
         raise RuntimeError("SQLALCHEMY_DATABASE_URI is not set. Check your .env file.")
-    
+
     app.config['SQLALCHEMY_DATABASE_URI'] = DB_URI
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False 
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DB_URI)
     app.config['SECRET_KEY'] = 'day-la-khoa-bi-mat-cua-ban-12345'
     db.init_app(app)
-    migrate.init_app(app, db) 
+    migrate.init_app(app, db)
     from app import models
     from app.routes.main_routes import main_bp
     app.register_blueprint(main_bp)
     from app import seeder
     seeder.register_seeder(app)
+    from app import importer
+    importer.register_importer(app)
+    from app import query_counter
+    query_counter.register_query_counter(app)
+    from app import metrics
+    metrics.register_metrics(app)
+
 
+    # Đo hiệu năng từng request (tùy chọn): mỗi request ghi 1 file .prof vào thư mục này
+    web_profile_dir = os.environ.get('WEB_PROFILE_DIR')
+    if web_profile_dir:
+        from werkzeug.middleware.profiler import ProfilerMiddleware
+        os.makedirs(web_profile_dir, exist_ok=True)
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app, profile_dir=web_profile_dir, stream=None)
 
     @app.route('/health')
     def health_check():
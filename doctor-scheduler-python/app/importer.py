@@ -0,0 +1,27 @@
+import time
+import click
+from app import db
+from app.services.import_service import BulkImportService, IMPORT_KINDS
+
+
+def register_importer(app):
+    """Đăng ký các lệnh nhập dữ liệu hàng loạt từ CSV với ứng dụng Flask."""
+
+    @app.cli.command(name='import-csv')
+    @click.argument('kind', type=click.Choice(list(IMPORT_KINDS)))
+    @click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+    def import_csv(kind, csv_file):
+        """Nhập hàng loạt KIND (doctors | leave_requests | preferences) từ file CSV."""
+        print(f"--- Nhập {kind} từ {csv_file.name} ---")
+        t0 = time.perf_counter()
+        try:
+            report = BulkImportService(db.session).import_csv(kind, csv_file)
+        finally:
+            db.session.close()
+
+        elapsed = time.perf_counter() - t0
+        print(f"Đã nhập {report.inserted}/{report.total_rows} dòng trong {elapsed:.2f}s, {report.error_count} lỗi.")
+        for line_no, message in report.errors:
+            print(f"  Dòng {line_no}: {message}")
+        if report.error_count > len(report.errors):
+            print(f"  ... và {report.error_count - len(report.errors)} lỗi khác.")
@@ -0,0 +1,320 @@
+"""
+Số liệu vận hành (metrics) dạng Prometheus text cho web app và worker solver.
+
+Mỗi tiến trình giữ số liệu trong bộ nhớ (`registry`) rồi ghi định kỳ ra 1 file JSON
+riêng trong METRICS_DIR (mặc định <tmp>/doctor-scheduler-metrics). Endpoint /metrics
+gộp mọi file lại - không cần dịch vụ ngoài (Redis, pushgateway...).
+    - Web app : ghi tối đa mỗi FLUSH_INTERVAL giây (sau request) và lúc thoát
+    - Worker  : ghi 1 lần khi Job kết thúc (final=True)
+File "final" của tiến trình đã kết thúc được gộp dần vào archive.json để thư mục không phình ra.
+
+Module chỉ import thư viện chuẩn ở cấp module (worker cần khởi động nhanh).
+"""
+from __future__ import annotations
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+
+FLUSH_INTERVAL = 5.0
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = 'compact.lock'
+LOCK_STALE_SECONDS = 60
+
+HISTOGRAM_BUCKETS = {
+    'scheduler_job_duration_seconds': (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+    # simanneal ~1e3, lexicographic / kernel Python thuần ~1e5, kernel Numba ~1e6 bước/giây
+    'scheduler_anneal_steps_per_second': (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000,
+                                          100000, 250000, 500000, 1000000, 2500000, 5000000),
+    'scheduler_phase_duration_seconds': (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+    'http_request_duration_seconds': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+}
+
+HELP = {
+    'scheduler_jobs': 'Số Job theo trạng thái (độ dài hàng đợi)',
+    'scheduler_jobs_finished_total': 'Số Job solver đã kết thúc theo kết quả',
+    'scheduler_job_duration_seconds': 'Thời gian chạy 1 Job solver',
+    'scheduler_anneal_steps_per_second': 'Tốc độ annealing (bước/giây) của mỗi Job',
+    'scheduler_phase_duration_seconds': 'Thời gian từng giai đoạn solver (build_context, save_results...)',
+    'scheduler_job_final_cost': 'Chi phí cứng/mềm của Job hoàn thành gần nhất',
+    'http_requests_total': 'Số request HTTP theo route và mã trạng thái',
+    'http_request_duration_seconds': 'Độ trễ request HTTP theo route',
+    'db_pool_connections': 'Kết nối trong connection pool của tiến trình web',
+}
+
+
+def metrics_dir() -> str:
+    return os.environ.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'doctor-scheduler-metrics')
+
+
+def _key(name: str, labels: dict) -> str:
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+
+# =================================================================
+# REGISTRY (1 tiến trình)
+# =================================================================
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}   # key -> [value, timestamp]: khi gộp, giá trị mới nhất thắng
+        self.last_flush = 0.0
+        self._file = None
+
+    def reset(self):
+        """
+        Bỏ toàn bộ số liệu và file đang ghi. Gọi ở đầu tiến trình con được fork từ web app:
+        nếu không, con kế thừa bộ đếm + đường dẫn file của cha và flush(final=True) sẽ ghi đè
+        file của cha bằng số liệu của cha (bị gộp 2 lần sau khi nén vào archive).
+        """
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.last_flush = 0.0
+        self._file = None
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        buckets = HISTOGRAM_BUCKETS[name]
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = [value, time.time()]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {k: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                               for k, h in self.histograms.items()},
+                "gauges": {k: list(v) for k, v in self.gauges.items()},
+            }
+
+    def flush(self, final: bool = False):
+        """Ghi số liệu của tiến trình ra file riêng (ghi đè nguyên tử)."""
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        if self._file is None:
+            self._file = os.path.join(directory, f"proc-{os.getpid()}-{time.time_ns()}.json")
+        data = self.snapshot()
+        data["final"] = final
+        if final:
+            # Pool của tiến trình đã dừng không còn ý nghĩa
+            data["gauges"] = {k: v for k, v in data["gauges"].items()
+                              if not k.startswith('["db_pool_')}
+        _atomic_write(self._file, data)
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+
+registry = MetricsRegistry()
+
+
+def _atomic_write(path: str, data: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read(path: str) -> dict | None:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(into: dict, data: dict):
+    for k, v in data.get("counters", {}).items():
+        into["counters"][k] = into["counters"].get(k, 0) + v
+    for k, h in data.get("histograms", {}).items():
+        # File ghi với bộ ngưỡng cũ (đã đổi HISTOGRAM_BUCKETS) không cộng được vào bộ ngưỡng mới
+        if len(h["buckets"]) != len(HISTOGRAM_BUCKETS.get(json.loads(k)[0], ())):
+            continue
+        acc = into["histograms"].get(k)
+        if acc is None:
+            into["histograms"][k] = {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+        else:
+            acc["buckets"] = [a + b for a, b in zip(acc["buckets"], h["buckets"])]
+            acc["sum"] += h["sum"]
+            acc["count"] += h["count"]
+    for k, v in data.get("gauges", {}).items():
+        if k not in into["gauges"] or v[1] >= into["gauges"][k][1]:
+            into["gauges"][k] = list(v)
+
+
+def _empty() -> dict:
+    return {"counters": {}, "histograms": {}, "gauges": {}}
+
+
+def _compact(directory: str, final_files: list):
+    """Gộp file 'final' vào archive.json. Khóa bằng file tạo độc quyền (O_EXCL)."""
+    lock_path = os.path.join(directory, LOCK_FILE)
+    try:
+        # Khóa bị bỏ lại bởi tiến trình chết giữa chừng
+        if time.time() - os.path.getmtime(lock_path) > LOCK_STALE_SECONDS:
+            os.remove(lock_path)
+    except OSError:
+        pass
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return
+    try:
+        os.close(fd)
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        archive = _read(archive_path) or _empty()
+        for path, data in final_files:
+            _merge(archive, data)
+        _atomic_write(archive_path, archive)
+        for path, _ in final_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    finally:
+        os.remove(lock_path)
+
+
+def collect(own: MetricsRegistry | None = None) -> dict:
+    """Gộp số liệu của mọi tiến trình (file) + tiến trình hiện tại (bộ nhớ)."""
+    directory = metrics_dir()
+    merged = _empty()
+    final_files = []
+    own_file = own._file if own else None
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(directory, name)
+            if path == own_file:
+                continue
+            data = _read(path)
+            if data is None:
+                continue
+            _merge(merged, data)
+            if data.get("final"):
+                final_files.append((path, data))
+    if own:
+        _merge(merged, own.snapshot())
+    if final_files:
+        _compact(directory, final_files)
+    return merged
+
+
+# =================================================================
+# ĐỊNH DẠNG PROMETHEUS TEXT
+# =================================================================
+def _fmt_labels(labels) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for k, v in labels:
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{k}="{v}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _fmt_value(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(merged: dict) -> str:
+    families = {}
+    for kind in ("counters", "gauges", "histograms"):
+        for key, value in merged[kind].items():
+            name, labels = json.loads(key)
+            families.setdefault(name, (kind, []))[1].append((labels, value))
+
+    lines = []
+    for name in sorted(families):
+        kind, samples = families[name]
+        prom_type = {"counters": "counter", "gauges": "gauge", "histograms": "histogram"}[kind]
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} {prom_type}")
+        for labels, value in sorted(samples, key=lambda s: s[0]):
+            if kind == "counters":
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+            elif kind == "gauges":
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value[0])}")
+            else:
+                # Bucket trong file là số đếm theo từng ngưỡng (đã cộng dồn lúc observe)
+                for bound, count in zip(HISTOGRAM_BUCKETS[name], value["buckets"]):
+                    lines.append(f"{name}_bucket{_fmt_labels(labels + [['le', str(bound)]])} {count}")
+                lines.append(f"{name}_bucket{_fmt_labels(labels + [['le', '+Inf']])} {value['count']}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(value['sum'])}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# =================================================================
+# GẮN VÀO FLASK
+# =================================================================
+def register_metrics(app):
+    """Đo độ trễ từng route và thêm endpoint /metrics."""
+    from flask import g, request, Response
+    from sqlalchemy import select, func
+    from app import db
+    from app.models import SchedulingJob
+    from app.models.scheduling_job import JobStatus
+
+    atexit.register(registry.flush, final=True)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        t0 = g.pop('_metrics_t0', None)
+        if t0 is not None and request.endpoint != 'metrics':
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            registry.observe('http_request_duration_seconds', time.perf_counter() - t0,
+                             route=route, method=request.method)
+            registry.inc('http_requests_total', route=route, method=request.method,
+                         status=str(response.status_code))
+            registry.maybe_flush()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        # Độ dài hàng đợi: đọc thẳng từ CSDL tại thời điểm scrape
+        counts = dict(db.session.execute(
+            select(SchedulingJob.status, func.count()).group_by(SchedulingJob.status)
+        ).all())
+        for status in JobStatus:
+            registry.set_gauge('scheduler_jobs', counts.get(status, 0), status=status.value)
+
+        pool = db.engine.pool
+        pid = str(os.getpid())
+        for state, fn in (('size', 'size'), ('checked_out', 'checkedout'), ('overflow', 'overflow')):
+            if hasattr(pool, fn):
+                registry.set_gauge('db_pool_connections', getattr(pool, fn)(), state=state, pid=pid)
+        registry.flush()
+
+        body = render_prometheus(collect(own=registry))
+        return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -8,6 +8,7 @@ from .leave_request import LeaveRequest
 from .schedule_preference import SchedulePreference
 from .scheduling_job import SchedulingJob
 from .assignment import Assignment
+from .job_summary import JobDoctorSummary, JobSlotSummary
 
 
 __all__ = [
@@ -19,5 +20,7 @@ __all__ = [
     'LeaveRequest',
     'SchedulePreference',
     'SchedulingJob',
-    'Assignment'
+    'Assignment',
+    'JobDoctorSummary',
+    'JobSlotSummary'
 ]
\ No newline at end of file
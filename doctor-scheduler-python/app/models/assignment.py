@@ -1,6 +1,6 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
-from sqlalchemy import Integer, Date, ForeignKey
+from sqlalchemy import Integer, Date, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import datetime
 from sqlalchemy.dialects.mssql import NVARCHAR
@@ -14,6 +14,13 @@ if TYPE_CHECKING:
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        # Trang Xem Lịch lọc theo job + khoảng ngày (+ khoa) ngay trong SQL; so sánh 2 Job đọc
+        # assignments theo đúng thứ tự (ngày, khoa, ca, bác sĩ) của index này - không cần sắp xếp
+        Index("ix_assignments_job_slot_doctor", "job_id", "assignment_date", "clinic_id", "shift_id", "doctor_id"),
+        # Đuôi lịch đã công bố trước ngày bắt đầu Job mới (mọi bác sĩ, theo khoảng ngày)
+        Index("ix_assignments_date_doctor", "assignment_date", "doctor_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     
@@ -28,11 +35,15 @@ class Assignment(Base):
     # --- Kết thúc Khóa ngoại ---
 
     # --- Quan hệ (Relationships) ---
-    doctor: Mapped["Doctor"] = relationship(back_populates="assignments", lazy="joined")
-    clinic: Mapped["Clinic"] = relationship(back_populates="assignments", lazy="joined")
-    shift: Mapped["Shift"] = relationship(back_populates="assignments", lazy="joined")
-    scheduling_job: Mapped["SchedulingJob"] = relationship(back_populates="assignments", lazy="joined") # lazy='joined' tải kèm luôn job
+    # Không JOIN mặc định: route cần dữ liệu liên quan thì dùng joinedload(...) tường minh.
+    # lazy="raise_on_sql": truy cập mà chưa tải -> báo lỗi ngay thay vì phát sinh N+1 truy vấn.
+    doctor: Mapped["Doctor"] = relationship(back_populates="assignments", lazy="raise_on_sql")
+    clinic: Mapped["Clinic"] = relationship(back_populates="assignments", lazy="raise_on_sql")
+    shift: Mapped["Shift"] = relationship(back_populates="assignments", lazy="raise_on_sql")
+    scheduling_job: Mapped["SchedulingJob"] = relationship(back_populates="assignments", lazy="raise_on_sql")
 
     def __repr__(self):
-        doc_name = self.doctor.name if self.doctor else f"ID:{self.doctor_id}"
+        # Chỉ dùng tên bác sĩ nếu đã được tải sẵn (repr không được phát sinh truy vấn)
+        doctor = self.__dict__.get("doctor")
+        doc_name = doctor.name if doctor else f"ID:{self.doctor_id}"
         return f"<Assignment(id={self.id}, date={self.assignment_date}, doc='{doc_name}', job={self.job_id})>"
\ No newline at end of file
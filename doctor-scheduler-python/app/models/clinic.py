@@ -19,9 +19,11 @@ class Clinic(Base):
     required_main: Mapped[int] = mapped_column(Integer, default=2, nullable=False) # Mặc định 2 chính
     required_sub: Mapped[int] = mapped_column(Integer, default=1, nullable=False)  # Mặc định 1 phụ
     
-    assignments: Mapped[List["Assignment"]] = relationship(back_populates="clinic", lazy="selectin")
+    # Các collection lớn KHÔNG tự tải (lazy="raise"): route nào cần phải khai báo
+    # loader option tường minh (selectinload/joinedload) hoặc truy vấn riêng.
+    assignments: Mapped[List["Assignment"]] = relationship(back_populates="clinic", lazy="raise")
     # Danh sách bác sĩ thuộc biên chế khoa này
-    doctors: Mapped[List["Doctor"]] = relationship(back_populates="clinic", lazy="selectin")
+    doctors: Mapped[List["Doctor"]] = relationship(back_populates="clinic", lazy="raise")
 
     def __repr__(self) -> str:
         return f"<Clinic(id={self.id}, name='{self.name}')>"
\ No newline at end of file
@@ -36,10 +36,10 @@ class Doctor(Base):
 
     total_shifts_worked: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     
-    # Quan hệ
-    assignments: Mapped[List["Assignment"]] = relationship(back_populates="doctor", lazy="selectin")
-    leave_requests: Mapped[List["LeaveRequest"]] = relationship(back_populates="doctor", lazy="selectin")
-    preferences: Mapped[List["SchedulePreference"]] = relationship(back_populates="doctor", lazy="selectin")
+    # Quan hệ - collection không tự tải (lazy="raise"), route cần thì khai báo loader option
+    assignments: Mapped[List["Assignment"]] = relationship(back_populates="doctor", lazy="raise")
+    leave_requests: Mapped[List["LeaveRequest"]] = relationship(back_populates="doctor", lazy="raise")
+    preferences: Mapped[List["SchedulePreference"]] = relationship(back_populates="doctor", lazy="raise")
     
     # Quan hệ với Khoa chủ quản
     clinic: Mapped["Clinic"] = relationship(back_populates="doctors")
@@ -0,0 +1,53 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from sqlalchemy import Integer, Float, Date, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+import datetime
+from app.models.base import Base
+
+# Bảng tổng hợp (materialized) theo từng Job, được ghi trong CÙNG giao dịch với
+# assignments khi solver lưu kết quả. Dashboard/báo cáo đọc thẳng các dòng này
+# thay vì gom nhóm lại bảng assignments.
+
+class JobDoctorSummary(Base):
+    __tablename__ = "job_doctor_summaries"
+    __table_args__ = (
+        Index("ix_job_doctor_summaries_job_doctor", "job_id", "doctor_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    job_id: Mapped[int] = mapped_column(ForeignKey("scheduling_jobs.id"), nullable=False)
+    doctor_id: Mapped[int] = mapped_column(ForeignKey("doctors.id"), nullable=False)
+
+    shift_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    total_hours: Mapped[float] = mapped_column(Float, default=0, nullable=False)
+    night_shifts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    preference_hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    violations: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<JobDoctorSummary(job={self.job_id}, doc={self.doctor_id}, shifts={self.shift_count})>"
+
+
+class JobSlotSummary(Base):
+    __tablename__ = "job_slot_summaries"
+    __table_args__ = (
+        Index("ix_job_slot_summaries_job_date", "job_id", "slot_date"),
+        Index("ix_job_slot_summaries_job_missing", "job_id", "missing"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    job_id: Mapped[int] = mapped_column(ForeignKey("scheduling_jobs.id"), nullable=False)
+    slot_date: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+    clinic_id: Mapped[int] = mapped_column(ForeignKey("clinics.id"), nullable=False)
+    shift_id: Mapped[int] = mapped_column(ForeignKey("shifts.id"), nullable=False)
+
+    # Nhân sự thực tế so với định biên của khoa
+    assigned_main: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    assigned_sub: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    required_main: Mapped[int] = mapped_column(Integer, nullable=False)
+    required_sub: Mapped[int] = mapped_column(Integer, nullable=False)
+    missing: Mapped[int] = mapped_column(Integer, default=0, nullable=False) # > 0 = thiếu người
+
+    def __repr__(self):
+        return f"<JobSlotSummary(job={self.job_id}, date={self.slot_date}, clinic={self.clinic_id}, shift={self.shift_id}, missing={self.missing})>"
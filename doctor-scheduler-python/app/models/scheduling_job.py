@@ -1,7 +1,7 @@
 from __future__ import annotations
 from typing import List
 from sqlalchemy import (
-    DateTime, func, Integer, Enum, Date 
+    DateTime, func, Integer, Enum, Date, Float, String, Text, Index
 )
 from sqlalchemy.dialects.mssql import NVARCHAR # Dùng NVARCHAR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -17,6 +17,11 @@ class JobStatus(enum.Enum):
 
 class SchedulingJob(Base):
     __tablename__ = "scheduling_jobs"
+    __table_args__ = (
+        # Danh sách Job phân trang keyset theo (created_at, id) - mới nhất trước, có/không lọc trạng thái
+        Index("ix_scheduling_jobs_created_id", "created_at", "id"),
+        Index("ix_scheduling_jobs_status_created_id", "status", "created_at", "id"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(NVARCHAR(255), nullable=False) # Dùng NVARCHAR
@@ -38,9 +43,43 @@ class SchedulingJob(Base):
         server_default=func.now(),
         nullable=False
     )
+
+    # Thời điểm solver ghi xong kết quả - chọn lịch đang công bố / đuôi lịch trước kỳ (Job mới nhất thắng)
+    finished_at: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+
+    # Lần cuối kết quả thay đổi (giải xong HOẶC đổi ca tay) - "phiên bản" cho cache/ETag/Last-Modified
+    # và chỉ mục tra cứu người trực thay. Đổi ca không động vào finished_at.
+    result_version: Mapped[datetime.datetime | None] = mapped_column(DateTime(timezone=True))
+
+    # Chi phí cuối cùng (tính lúc lưu kết quả): số đơn vị vi phạm cứng / điểm phạt mềm
+    final_hard_cost: Mapped[float | None] = mapped_column(Float)
+    final_soft_cost: Mapped[float | None] = mapped_column(Float)
+
+    # Báo cáo vi phạm của lịch đã lưu (JSON gọn, xem ScheduleSummary.violation_report)
+    # + số vi phạm theo loại (JSON nhỏ) cho danh sách Job, không cần đọc cả báo cáo
+    violation_report: Mapped[str | None] = mapped_column(Text)
+    violation_counts: Mapped[str | None] = mapped_column(String(255))
+
+    # Giải cuốn chiếu (rolling horizon): None = giải cả kỳ 1 lần
+    window_days: Mapped[int | None] = mapped_column(Integer)
+    overlap_days: Mapped[int | None] = mapped_column(Integer)
+
+    # Trọng số thành phần công bằng trong chi phí mềm: None = mặc định (DEFAULT_FAIRNESS_WEIGHT), 0 = tắt
+    fairness_weight: Mapped[float | None] = mapped_column(Float)
+
+    # Đo hiệu năng tùy chọn: None / 'phases' / 'cprofile' (xem app/services/profiling.py)
+    profile_mode: Mapped[str | None] = mapped_column(String(20))
+    # Kết quả đo (JSON): thời gian từng giai đoạn, mẫu hàm mục tiêu, pstats
+    profile_data: Mapped[str | None] = mapped_column(Text)
     
-    assignments: Mapped[List["Assignment"]] = relationship(back_populates="scheduling_job")
+    # Có thể tới hàng chục nghìn dòng -> không bao giờ tự tải
+    assignments: Mapped[List["Assignment"]] = relationship(back_populates="scheduling_job", lazy="raise")
     
+    @property
+    def cache_version(self) -> datetime.datetime:
+        # Job cũ (trước khi có result_version) dùng finished_at / created_at
+        return self.result_version or self.finished_at or self.created_at
+
     def __repr__(self):
         status_val = self.status.value if isinstance(self.status, enum.Enum) else self.status
         return f"<SchedulingJob(id={self.id}, name='{self.name}', status='{status_val}')>"
\ No newline at end of file
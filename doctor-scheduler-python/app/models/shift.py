@@ -18,8 +18,9 @@ class Shift(Base):
     start_time: Mapped[datetime.time] = mapped_column(Time)
     end_time: Mapped[datetime.time] = mapped_column(Time)
     
-    assignments: Mapped[List["Assignment"]] = relationship(back_populates="shift", lazy="selectin")
-    preferences: Mapped[List["SchedulePreference"]] = relationship(back_populates="shift", lazy="selectin")
+    # Collection không tự tải (lazy="raise"), route cần thì khai báo loader option
+    assignments: Mapped[List["Assignment"]] = relationship(back_populates="shift", lazy="raise")
+    preferences: Mapped[List["SchedulePreference"]] = relationship(back_populates="shift", lazy="raise")
 
     def __repr__(self) -> str:
         return f"<Shift(id={self.id}, name='{self.name}')>"
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""
+Đếm truy vấn SQL theo từng request (phát hiện N+1).
+
+Dựa trên sự kiện engine của SQLAlchemy (before/after_cursor_execute) và `flask.g`:
+    - Header phản hồi: X-DB-Query-Count, X-DB-Time-ms
+    - Cảnh báo (in ra console) khi 1 mẫu câu lệnh chạy quá QUERY_REPEAT_THRESHOLD lần
+      trong cùng request - dấu hiệu N+1 (vd. truy cập quan hệ trong vòng lặp template)
+    - Bảng debug (QUERY_DEBUG_PANEL=1): chèn danh sách câu lệnh vào cuối trang HTML
+Câu lệnh đã dùng tham số ràng buộc (bound parameters) nên chuỗi SQL chính là "mẫu".
+"""
+import html
+import os
+import time
+from collections import Counter
+
+DEFAULT_REPEAT_THRESHOLD = 10
+PANEL_TOP = 15
+
+
+class RequestQueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = Counter()
+        self.statement_time = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        self.statements[statement] += 1
+        self.statement_time[statement] += elapsed
+
+    def repeated(self, threshold: int):
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n > threshold]
+
+
+def _current_stats():
+    from flask import g, has_request_context
+    if not has_request_context():
+        return None
+    return g.get('_query_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    starts = conn.info.get('_query_start')
+    if stats is None or not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+def _render_panel(stats: RequestQueryStats) -> str:
+    rows = "".join(
+        f"<tr><td class='text-end'>{n}</td><td class='text-end'>{stats.statement_time[stmt] * 1000:.1f}</td>"
+        f"<td><code>{html.escape(' '.join(stmt.split())[:300])}</code></td></tr>"
+        for stmt, n in stats.statements.most_common(PANEL_TOP)
+    )
+    return (
+        "<div id='query-debug-panel' class='container my-3'><details class='border rounded p-2 small bg-light'>"
+        f"<summary>SQL: {stats.count} truy vấn, {stats.total_time * 1000:.1f} ms</summary>"
+        "<table class='table table-sm mb-0'><thead><tr><th>Số lần</th><th>ms</th><th>Câu lệnh</th></tr></thead>"
+        f"<tbody>{rows}</tbody></table></details></div>"
+    )
+
+
+def register_query_counter(app):
+    """Gắn bộ đếm truy vấn vào ứng dụng Flask (mọi engine SQLAlchemy trong tiến trình)."""
+    from flask import g, request
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    app.config.setdefault('QUERY_REPEAT_THRESHOLD',
+                          int(os.environ.get('QUERY_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)))
+    app.config.setdefault('QUERY_DEBUG_PANEL', os.environ.get('QUERY_DEBUG_PANEL') == '1')
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _start_query_stats():
+        g._query_stats = RequestQueryStats()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.pop('_query_stats', None)
+        if stats is None:
+            return response
+
+        response.headers['X-DB-Query-Count'] = str(stats.count)
+        response.headers['X-DB-Time-ms'] = f"{stats.total_time * 1000:.1f}"
+
+        threshold = app.config['QUERY_REPEAT_THRESHOLD']
+        for stmt, n in stats.repeated(threshold):
+            print(f"[SQL] CẢNH BÁO N+1: {request.method} {request.path} chạy {n} lần "
+                  f"(ngưỡng {threshold}): {' '.join(stmt.split())[:200]}")
+
+        if (app.config['QUERY_DEBUG_PANEL'] and response.mimetype == 'text/html'
+                and not response.direct_passthrough and not response.is_streamed):
+            body = response.get_data(as_text=True)
+            if '</body>' in body:
+                response.set_data(body.replace('</body>', _render_panel(stats) + '</body>', 1))
+        return response
@@ -1,13 +1,16 @@
 from flask import (
     Blueprint, render_template, request,
-    redirect, url_for, flash, current_app
+    redirect, url_for, flash, current_app, session, make_response,
+    Response, stream_with_context, jsonify
 )
+from werkzeug.http import is_resource_modified
 from sqlalchemy import select, func
-from sqlalchemy.orm import joinedload
-from app import db, create_app
+from sqlalchemy.orm import joinedload, load_only
+from app import db
 import datetime
+import io
+import json
 import multiprocessing
-from collections import defaultdict
 import calendar
 
 # Import Models
@@ -18,6 +21,17 @@ from app.models import (
 from app.models.scheduling_job import JobStatus 
 from app.models.base import Base
 from app.services.scheduling_service import SchedulingService
+from app.services.calendar_service import CalendarService, VIEW_MODES
+from app.services.result_cache import result_cache
+from app.services.report_service import ReportService, VIOLATION_LABELS
+from app.services.dashboard_service import DashboardService
+from app.services.export_service import ExportService, EXPORT_FORMATS
+from app.services.import_service import BulkImportService, IMPORT_KINDS
+from app.services.profiling import PROFILE_MODES
+from app.services.solver_service import DEFAULT_FAIRNESS_WEIGHT
+from app.services.availability_service import AvailabilityService, availability_indexes
+from app.services.diff_service import ScheduleDiffService
+from app.worker import run_job_in_worker
 
 # Tạo Blueprint
 main_bp = Blueprint('main', __name__)
@@ -31,7 +45,8 @@ def index():
         shift_count = db.session.scalar(select(func.count(Shift.id)))
         
         recent_doctors = db.session.scalars(
-            select(Doctor).order_by(Doctor.id.desc()).limit(5)
+            select(Doctor).options(load_only(Doctor.id, Doctor.name, Doctor.specialty))
+            .order_by(Doctor.id.desc()).limit(5)
         ).all()
         
     except Exception as e:
@@ -68,7 +83,9 @@ def manage_doctors():
             db.session.rollback()
             flash(f"Lỗi: {e}", "danger")
 
-    doctors_list = db.session.scalars(select(Doctor).order_by(Doctor.id)).all()
+    doctors_list = db.session.scalars(
+        select(Doctor).options(load_only(Doctor.id, Doctor.name, Doctor.specialty, Doctor.total_shifts_worked)).order_by(Doctor.id)
+    ).all()
     return render_template("doctors.html", doctors=doctors_list, title="Quản lý Bác sĩ")
 
 # --- Quản lý Phòng khám ---
@@ -114,6 +131,43 @@ def manage_shifts():
     shifts_list = db.session.scalars(select(Shift).order_by(Shift.start_time)).all()
     return render_template("shifts.html", shifts=shifts_list, title="Quản lý Ca trực")
 
+# --- Nhập hàng loạt từ CSV (Bác sĩ / Đơn nghỉ / Nguyện vọng) ---
+IMPORT_REDIRECTS = {
+    'doctors': 'main.manage_doctors',
+    'leave_requests': 'main.manage_leave_requests',
+    'preferences': 'main.manage_preferences',
+}
+
+@main_bp.route('/import/<kind>', methods=['POST'])
+def bulk_import(kind):
+    if kind not in IMPORT_KINDS:
+        flash("Loại dữ liệu không hỗ trợ.", "danger")
+        return redirect(url_for('main.index'))
+
+    upload = request.files.get('csv_file')
+    if not upload or not upload.filename:
+        flash("Vui lòng chọn file CSV.", "warning")
+        return redirect(url_for(IMPORT_REDIRECTS[kind]))
+
+    # Đọc file dạng luồng, không nạp toàn bộ vào bộ nhớ
+    text_stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        report = BulkImportService(db.session).import_csv(kind, text_stream)
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Lỗi: {e}", "danger")
+        return redirect(url_for(IMPORT_REDIRECTS[kind]))
+
+    category = "success" if not report.error_count else ("warning" if report.inserted else "danger")
+    flash(f"Đã nhập {report.inserted}/{report.total_rows} dòng, {report.error_count} lỗi.", category)
+    for line_no, message in report.errors[:5]:
+        flash(f"Dòng {line_no}: {message}", "danger")
+    return redirect(url_for(IMPORT_REDIRECTS[kind]))
+
+def _doctor_options_stmt():
+    """Danh sách bác sĩ cho dropdown: chỉ các cột hiển thị, không tải quan hệ."""
+    return select(Doctor).options(load_only(Doctor.id, Doctor.name, Doctor.specialty)).order_by(Doctor.name)
+
 # --- Quản lý Đơn nghỉ ---
 @main_bp.route('/leave_requests', methods=['GET', 'POST'])
 def manage_leave_requests():
@@ -127,16 +181,37 @@ def manage_leave_requests():
             new_leave = LeaveRequest(doctor_id=doc_id, date=l_date, reason=reason, status="Approved")
             db.session.add(new_leave)
             db.session.commit()
+            # Chỉ mục "ai trực thay được" giữ bản sao đơn nghỉ -> dựng lại ở lần tra cứu sau
+            availability_indexes.clear()
             flash("Đã thêm đơn nghỉ!", "success")
             return redirect(url_for('main.manage_leave_requests'))
         except Exception as e:
             db.session.rollback()
             flash(f"Lỗi: {e}", "danger")
 
-    leaves = db.session.scalars(select(LeaveRequest).options(joinedload(LeaveRequest.doctor)).order_by(LeaveRequest.date.desc())).all()
-    doctors = db.session.scalars(select(Doctor).order_by(Doctor.name)).all()
+    leaves = db.session.scalars(
+        select(LeaveRequest)
+        .options(joinedload(LeaveRequest.doctor).load_only(Doctor.id, Doctor.name, Doctor.specialty))
+        .order_by(LeaveRequest.date.desc())
+    ).all()
+    doctors = db.session.scalars(_doctor_options_stmt()).all()
     return render_template("leave_requests.html", leaves=leaves, doctors=doctors, title="Quản lý Đơn nghỉ")
 
+@main_bp.route('/leave_requests/preview')
+def preview_leave_request():
+    """Xem trước (JSON) tác động của đơn nghỉ lên lịch đang công bố: ?doctor_id=&leave_date=YYYY-MM-DD"""
+    try:
+        doctor_id = request.args.get('doctor_id', type=int)
+        l_date = _parse_date_arg('leave_date')
+        if not doctor_id or not l_date:
+            raise ValueError("Cần doctor_id và leave_date.")
+        result = AvailabilityService(db.session).preview_leave(doctor_id, l_date)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if result is None:
+        return jsonify(job_id=None, affected=[], message="Chưa có lịch đã công bố cho ngày này.")
+    return jsonify(result)
+
 # --- Quản lý Nguyện vọng ---
 @main_bp.route('/preferences', methods=['GET', 'POST'])
 def manage_preferences():
@@ -156,16 +231,28 @@ def manage_preferences():
             db.session.rollback()
             flash(f"Lỗi: {e}", "danger")
 
-    prefs = db.session.scalars(select(SchedulePreference).options(joinedload(SchedulePreference.doctor), joinedload(SchedulePreference.shift))).all()
-    doctors = db.session.scalars(select(Doctor).order_by(Doctor.name)).all()
+    prefs = db.session.scalars(
+        select(SchedulePreference).options(
+            joinedload(SchedulePreference.doctor).load_only(Doctor.id, Doctor.name),
+            joinedload(SchedulePreference.shift)
+        )
+    ).all()
+    doctors = db.session.scalars(_doctor_options_stmt()).all()
     shifts = db.session.scalars(select(Shift).order_by(Shift.name)).all()
     return render_template("preferences.html", preferences=prefs, doctors=doctors, shifts=shifts, title="Nguyện vọng")
 
 # --- Dashboard Xếp lịch ---
 @main_bp.route('/scheduling', methods=['GET'])
 def schedule_dashboard():
-    jobs = db.session.scalars(select(SchedulingJob).order_by(SchedulingJob.created_at.desc())).all()
-    return render_template('schedule_dashboard.html', jobs=jobs)
+    # Phân trang keyset (?after= / ?before=) + lọc trạng thái (?status=Completed ...)
+    status_arg = request.args.get('status')
+    status = next((st for st in JobStatus if st.value == status_arg), None)
+    page = DashboardService(db.session).list_jobs(
+        status=status, after=request.args.get('after'), before=request.args.get('before')
+    )
+    return render_template('schedule_dashboard.html', statuses=list(JobStatus), violation_labels=VIOLATION_LABELS,
+                           default_fairness_weight=DEFAULT_FAIRNESS_WEIGHT,
+                           current_status=status.value if status else None, **page)
 
 @main_bp.route('/scheduling/create', methods=['POST'])
 def create_scheduling_job():
@@ -176,7 +263,22 @@ def create_scheduling_job():
         
         if start > end: raise ValueError("Ngày bắt đầu phải trước ngày kết thúc")
         
-        job = SchedulingJob(name=name, start_date=start, end_date=end)
+        profile_mode = request.form.get('profile_mode') or None
+        if profile_mode not in (None, *PROFILE_MODES):
+            raise ValueError(f"Chế độ đo hiệu năng không hợp lệ: {profile_mode}")
+
+        window_days = request.form.get('window_days', type=int)
+        overlap_days = request.form.get('overlap_days', type=int) or 0
+        if window_days is not None and (window_days < 1 or not 0 <= overlap_days < window_days):
+            raise ValueError("Cửa sổ cuốn chiếu phải >= 1 ngày và số ngày gối nằm trong [0, cửa sổ)")
+
+        fairness_weight = request.form.get('fairness_weight', type=float)
+        if fairness_weight is not None and fairness_weight < 0:
+            raise ValueError("Trọng số công bằng phải >= 0")
+
+        job = SchedulingJob(name=name, start_date=start, end_date=end, profile_mode=profile_mode,
+                            window_days=window_days, overlap_days=overlap_days if window_days else None,
+                            fairness_weight=fairness_weight)
         db.session.add(job)
         db.session.commit()
         flash(f"Đã tạo tác vụ '{name}'", "success")
@@ -186,27 +288,7 @@ def create_scheduling_job():
     return redirect(url_for('main.schedule_dashboard'))
 
 # --- Chạy AI (Background Process) ---
-def run_ai_in_background_process(app_config, job_id):
-    app = create_app()
-    with app.app_context():
-        try:
-            print(f"--- [AI] Bắt đầu chạy Job {job_id} ---")
-            service = SchedulingService(db.session)
-            service.run_scheduling_job(job_id)
-            print(f"--- [AI] Hoàn tất Job {job_id} ---")
-        except Exception as e:
-            print(f"--- [AI] Lỗi Job {job_id}: {e} ---")
-            # Cập nhật trạng thái lỗi
-            try:
-                job = db.session.get(SchedulingJob, job_id)
-                if job: 
-                    job.status = JobStatus.FAILED
-                    job.status_message = str(e)[:500]
-                    db.session.commit()
-            except: pass
-        finally:
-            db.session.remove()
-
+# Tiến trình con dùng entry point gọn nhẹ app.worker (không gọi create_app()).
 @main_bp.route('/scheduling/run/<int:job_id>', methods=['POST'])
 def run_scheduling_job(job_id):
     job = db.session.get(SchedulingJob, job_id)
@@ -214,28 +296,223 @@ def run_scheduling_job(job_id):
         flash("Tác vụ không hợp lệ để chạy.", "warning")
         return redirect(url_for('main.schedule_dashboard'))
     
+    # Kết quả cũ (nếu có) sắp bị ghi lại -> bỏ các trang đã đệm
+    result_cache.invalidate_job(job_id)
+
     # Chạy process
-    p = multiprocessing.Process(target=run_ai_in_background_process, args=(None, job_id))
-    p.daemon = True
+    db_uri = current_app.config['SQLALCHEMY_DATABASE_URI']
+    # KHÔNG daemon: tiến trình daemon không được tạo tiến trình con, mà engine 'kernel' chạy nhiều
+    # chuỗi (SCHEDULER_KERNEL_CHAINS > 1) bằng 1 Pool riêng. Web app khi tắt sẽ chờ Job đang chạy xong.
+    p = multiprocessing.Process(target=run_job_in_worker, args=(job_id, db_uri))
+    p.daemon = False
     p.start()
     
     flash(f"Đã gửi yêu cầu chạy tác vụ ID {job_id}. Vui lòng chờ...", "info")
     return redirect(url_for('main.schedule_dashboard'))
 
+# --- Cache cho trang kết quả của Job đã hoàn thành ---
+def _cached_job_page(job: SchedulingJob, key_parts: tuple, render, last_modified=None):
+    """
+    Trả về trang của Job COMPLETED qua bộ đệm LRU, kèm ETag mạnh + Last-Modified.
+    `render` chỉ được gọi khi trình duyệt chưa có bản mới nhất VÀ cache chưa có trang.
+    Dữ liệu KHÔNG thuộc Job mà trang hiển thị (danh sách khoa, Job khác...) phải nằm trong
+    `key_parts`; `last_modified` (tùy chọn) là thời điểm đổi mới nhất của dữ liệu đó.
+    """
+    # Trang có flash message đang chờ thì không đệm (flash sẽ bị "đóng băng" vào HTML)
+    if session.get('_flashes'):
+        return render()
+
+    version = job.cache_version
+    if last_modified is not None and last_modified > version:
+        version = last_modified
+    key = (request.endpoint, job.id, version.isoformat(), *key_parts)
+    etag = result_cache.make_etag(key)
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=version):
+        response = make_response('', 304)
+    else:
+        page = result_cache.get(key)
+        if page is None:
+            page = result_cache.put(key, render(), last_modified=version)
+        response = make_response(page.body)
+
+    response.set_etag(etag)
+    response.last_modified = version
+    # Luôn hỏi lại máy chủ (rẻ: 304) thay vì dùng bản lưu mà không kiểm tra
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
 @main_bp.route('/scheduling/results/<int:job_id>')
 def view_schedule_results(job_id):
     job = db.session.get(SchedulingJob, job_id)
     if not job or job.status != JobStatus.COMPLETED:
         flash("Tác vụ chưa hoàn thành.", "warning")
         return redirect(url_for('main.schedule_dashboard'))
-    
-    assignments = db.session.scalars(
-        select(Assignment).where(Assignment.job_id==job_id)
-        .options(joinedload(Assignment.doctor), joinedload(Assignment.clinic), joinedload(Assignment.shift))
-        .join(Assignment.shift).order_by(Assignment.assignment_date, Shift.start_time)
+
+    # Các Job đã hoàn thành khác có kỳ giao nhau -> chọn để so sánh. Truy vấn ngoài phần đệm:
+    # Job hoàn thành sau phải làm đổi khóa/ETag của trang (tối đa 20 dòng nhỏ)
+    compare_jobs = db.session.execute(
+        select(SchedulingJob.id, SchedulingJob.name, SchedulingJob.start_date, SchedulingJob.end_date,
+               SchedulingJob.finished_at)
+        .where(SchedulingJob.status == JobStatus.COMPLETED, SchedulingJob.id != job_id,
+               SchedulingJob.start_date <= job.end_date, SchedulingJob.end_date >= job.start_date)
+        .order_by(SchedulingJob.created_at.desc())
+        .limit(20)
     ).all()
-    
-    return render_template("schedule_results.html", job=job, assignments=assignments, title="Kết quả chi tiết")
+    compare_key = tuple((row.id, row.name, row.start_date, row.end_date) for row in compare_jobs)
+    compare_finished = max((row.finished_at for row in compare_jobs if row.finished_at), default=None)
+
+    def render():
+        assignments = db.session.scalars(
+            select(Assignment).where(Assignment.job_id==job_id)
+            .options(joinedload(Assignment.doctor), joinedload(Assignment.clinic), joinedload(Assignment.shift))
+            .join(Assignment.shift).order_by(Assignment.assignment_date, Shift.start_time)
+        ).all()
+        # Số liệu tổng hợp đã được tính sẵn lúc lưu kết quả
+        reports = ReportService(db.session)
+        return render_template(
+            "schedule_results.html", job=job, assignments=assignments, title="Kết quả chi tiết",
+            doctor_totals=reports.doctor_totals(job_id),
+            coverage_gaps=reports.coverage_gaps(job_id),
+            coverage_gap_count=reports.coverage_gap_count(job),
+            compare_jobs=compare_jobs,
+            violations=reports.violation_rows(job),
+            violation_flags=reports.violation_flags(job),
+            violation_counts=json.loads(job.violation_counts) if job.violation_counts else {},
+            violation_labels=VIOLATION_LABELS,
+            profile=json.loads(job.profile_data) if job.profile_data else None
+        )
+
+    return _cached_job_page(job, (compare_key,), render, last_modified=compare_finished)
+
+# --- So sánh 2 Job (A = cũ, B = mới) ---
+@main_bp.route('/scheduling/diff')
+def schedule_diff():
+    job_a = db.session.get(SchedulingJob, request.args.get('a', type=int) or 0)
+    job_b = db.session.get(SchedulingJob, request.args.get('b', type=int) or 0)
+    if (not job_a or not job_b or job_a.id == job_b.id
+            or job_a.status != JobStatus.COMPLETED or job_b.status != JobStatus.COMPLETED):
+        flash("Cần chọn 2 tác vụ khác nhau đã hoàn thành để so sánh.", "warning")
+        return redirect(url_for('main.schedule_dashboard'))
+
+    try:
+        date_from = _parse_date_arg('from')
+    except ValueError:
+        date_from = None
+
+    def render():
+        return render_template("schedule_diff.html", job_a=job_a, job_b=job_b, title="So sánh lịch",
+                               **ScheduleDiffService(db.session).diff(job_a, job_b, date_from=date_from))
+
+    # Phiên bản của cả 2 Job nằm trong khóa -> chạy lại/đổi ca ở Job nào cũng làm khóa mới
+    version_a = job_a.cache_version.isoformat()
+    return _cached_job_page(job_b, (job_a.id, version_a, date_from), render)
+
+# --- Kết quả đo hiệu năng của Job (JSON thô, kể cả Job lỗi) ---
+@main_bp.route('/scheduling/profile/<int:job_id>')
+def job_profile(job_id):
+    job = db.session.get(SchedulingJob, job_id)
+    if not job or not job.profile_data:
+        return Response('{"error": "Không có dữ liệu đo hiệu năng."}', status=404, mimetype='application/json')
+    return Response(job.profile_data, mimetype='application/json')
+
+# --- Xuất dữ liệu (CSV / NDJSON / iCalendar) dạng luồng ---
+@main_bp.route('/scheduling/export/<int:job_id>/<fmt>')
+def export_assignments(job_id, fmt):
+    """
+    Xuất assignments của Job. Bộ lọc (query string): clinic_id, doctor_id, from, to (YYYY-MM-DD).
+    Định dạng 'ics' bắt buộc có doctor_id (lịch cá nhân của 1 bác sĩ).
+    """
+    job = db.session.get(SchedulingJob, job_id)
+    if not job or job.status != JobStatus.COMPLETED or fmt not in EXPORT_FORMATS:
+        return Response("Tác vụ chưa hoàn thành hoặc định dạng không hỗ trợ.\n", status=404,
+                        mimetype='text/plain')
+
+    try:
+        filters = {
+            'clinic_id': request.args.get('clinic_id', type=int),
+            'date_from': _parse_date_arg('from'),
+            'date_to': _parse_date_arg('to'),
+        }
+    except ValueError:
+        return Response("Ngày không hợp lệ (định dạng YYYY-MM-DD).\n", status=400, mimetype='text/plain')
+    doctor_id = request.args.get('doctor_id', type=int)
+
+    service = ExportService(db.session)
+    filename = f"job_{job_id}"
+    if fmt == 'ics':
+        if not doctor_id:
+            return Response("Định dạng ics cần tham số doctor_id.\n", status=400, mimetype='text/plain')
+        chunks = service.iter_ics(job_id, doctor_id, **filters)
+        filename += f"_doctor_{doctor_id}"
+    elif fmt == 'csv':
+        chunks = service.iter_csv(job_id, doctor_id=doctor_id, **filters)
+    else:
+        chunks = service.iter_ndjson(job_id, doctor_id=doctor_id, **filters)
+
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+# --- Tra cứu người trực thay / xác nhận đổi ca (JSON) ---
+def _completed_job_or_404(job_id):
+    job = db.session.get(SchedulingJob, job_id)
+    if not job or job.status != JobStatus.COMPLETED:
+        return None, (jsonify(error="Tác vụ chưa hoàn thành hoặc không tồn tại."), 404)
+    return job, None
+
+def _parse_role(value):
+    """'main'/'MAIN'/'Chính' -> 'main', 'sub'/'SUB'/'Phụ' -> 'sub', rỗng -> None (cả hai)."""
+    if not value:
+        return None
+    for role, key in ((DoctorRole.MAIN, 'main'), (DoctorRole.SUB, 'sub')):
+        if value.lower() in (key, role.value.lower()):
+            return key
+    raise ValueError(f"Vai trò không hợp lệ: {value}")
+
+@main_bp.route('/api/jobs/<int:job_id>/availability')
+def slot_availability(job_id):
+    """?date=YYYY-MM-DD&clinic_id=&shift_id=[&out_doctor_id=][&role=main|sub][&limit=10]"""
+    job, error = _completed_job_or_404(job_id)
+    if error:
+        return error
+    try:
+        date = _parse_date_arg('date')
+        clinic_id = request.args.get('clinic_id', type=int)
+        shift_id = request.args.get('shift_id', type=int)
+        if not date or not clinic_id or not shift_id:
+            raise ValueError("Cần các tham số date, clinic_id, shift_id.")
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+        result = AvailabilityService(db.session).find_candidates(
+            job, date, clinic_id, shift_id, _parse_role(request.args.get('role')), limit,
+            out_doc=request.args.get('out_doctor_id', type=int)
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(result)
+
+@main_bp.route('/api/jobs/<int:job_id>/swap', methods=['POST'])
+def confirm_swap(job_id):
+    """Body JSON (hoặc form): date, clinic_id, shift_id, out_doctor_id, in_doctor_id."""
+    job, error = _completed_job_or_404(job_id)
+    if error:
+        return error
+    data = request.get_json(silent=True) or request.form
+    try:
+        date = datetime.datetime.strptime(str(data.get('date')), '%Y-%m-%d').date()
+        fields = [int(data.get(name)) for name in ('clinic_id', 'shift_id', 'out_doctor_id', 'in_doctor_id')]
+    except (TypeError, ValueError):
+        return jsonify(error="Thiếu hoặc sai tham số (date, clinic_id, shift_id, out_doctor_id, in_doctor_id)."), 400
+    try:
+        result = AvailabilityService(db.session).swap(job, date, *fields)
+    except ValueError as e:
+        return jsonify(error=str(e)), 409
+    return jsonify(result)
+
+def _parse_date_arg(name):
+    value = request.args.get(name)
+    return datetime.datetime.strptime(value, '%Y-%m-%d').date() if value else None
 
 # =================================================================
 # TRANG HIỂN THỊ LỊCH (CALENDAR VIEW) - LỌC THEO KHOA
@@ -264,100 +541,47 @@ def view_calendar(job_id):
             .limit(1)
         )
 
-    # Lấy danh sách khoa để tạo bộ lọc
-    all_clinics = db.session.scalars(select(Clinic).order_by(Clinic.name)).all()
+    calendar_service = CalendarService(db.session)
 
     if not current_job:
         today = datetime.date.today()
         return render_template(
             "calendar_view.html", 
             job=None, year=today.year, month=today.month,
-            date_range=[], doctors_list=[], assignments_map={}, clinics=all_clinics
+            date_range=[], doctors_list=[], shift_rows=[], grid={}, badge_count=0,
+            doctor_flags={}, cell_flags={},
+            clinics=calendar_service.list_clinics()
         )
 
-    # --- XỬ LÝ LỌC THỜI GIAN (View Mode) ---
+    # --- XỬ LÝ LỌC (View Mode, Khoa, Trang) ---
     view_mode = request.args.get('view_mode', 'all') # 'all', 'week', 'day'
+    if view_mode not in VIEW_MODES:
+        view_mode = 'all'
     date_str = request.args.get('date')
-    
-    job_start = current_job.start_date
-    job_end = current_job.end_date
-    
+    clinic_id = request.args.get('clinic_id', type=int)
+    page = request.args.get('page', 1, type=int)
+
     # Ngày mốc để lọc (mặc định là ngày bắt đầu job nếu không chọn)
     try:
-        target_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else job_start
-    except:
-        target_date = job_start
-
-    final_start = job_start
-    final_end = job_end
-
-    if view_mode == 'day':
-        final_start = target_date
-        final_end = target_date
-    elif view_mode == 'week':
-        # Tính thứ 2 đầu tuần
-        start_of_week = target_date - datetime.timedelta(days=target_date.weekday())
-        end_of_week = start_of_week + datetime.timedelta(days=6)
-        final_start = max(job_start, start_of_week)
-        final_end = min(job_end, end_of_week)
-    
-    # Đảm bảo không vượt quá phạm vi job
-    if final_start < job_start: final_start = job_start
-    if final_end > job_end: final_end = job_end
-
-    # Tạo danh sách ngày hiển thị
-    date_range = []
-    curr = final_start
-    while curr <= final_end:
-        date_range.append(curr)
-        curr += datetime.timedelta(days=1)
-
-    # 3. Lấy dữ liệu phân công
-    stmt = (
-        select(Assignment)
-        .where(Assignment.job_id == current_job.id)
-        .options(
-            joinedload(Assignment.doctor).joinedload(Doctor.clinic),
-            joinedload(Assignment.clinic),
-            joinedload(Assignment.shift) 
-        )
-    )
-    all_assignments = db.session.scalars(stmt).all()
+        target_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else current_job.start_date
+    except ValueError:
+        target_date = current_job.start_date
 
-    # --- [SỬA ĐỔI] Dùng list để chứa nhiều ca trong 1 ngày ---
-    assignments_map = defaultdict(lambda: defaultdict(list)) 
-    doctors_in_schedule = {} 
+    # Bộ lọc khoa không thuộc Job: đọc ngoài phần đệm và đưa vào khóa, thêm/đổi tên khoa -> trang mới
+    clinics = calendar_service.list_clinics()
 
-    for assign in all_assignments:
-        color = ['primary', 'success', 'danger', 'secondary'][assign.shift_id % 4]
-        
-        # --- [SỬA ĐỔI] Append vào list thay vì gán đè ---
-        assignments_map[assign.doctor_id][assign.assignment_date].append({
-            "shift_name": assign.shift.name,
-            "clinic_name": assign.clinic.name,
-            "color": color
-        })
-        
-        if assign.doctor_id not in doctors_in_schedule:
-            doctors_in_schedule[assign.doctor_id] = assign.doctor
-
-    # --- SẮP XẾP DANH SÁCH BÁC SĨ (Logic Mới) ---
-    doctors_list = sorted(
-        doctors_in_schedule.values(), 
-        key=lambda doc: (
-            doc.clinic.name if doc.clinic else "zz_Khac", # Gom theo Khoa
-            0 if doc.role == DoctorRole.MAIN else 1,      # Chính lên trước
-            doc.name                                      # Tên A-Z
+    def render():
+        # Lọc ngày/khoa + phân trang bác sĩ được thực hiện trong SQL
+        data = calendar_service.load_calendar(current_job, view_mode, target_date, clinic_id, page)
+        return render_template(
+            "calendar_view.html",
+            job=current_job, 
+            clinics=clinics,
+            current_view=view_mode,
+            current_date=target_date.strftime('%Y-%m-%d'),
+            current_clinic=clinic_id,
+            **data
         )
-    )
-    
-    return render_template(
-        "calendar_view.html",
-        job=current_job, 
-        date_range=date_range,
-        doctors_list=doctors_list,
-        assignments_map=assignments_map,
-        clinics=all_clinics,
-        current_view=view_mode,
-        current_date=target_date.strftime('%Y-%m-%d')
-    )
\ No newline at end of file
+
+    clinics_key = tuple((row.id, row.name) for row in clinics)
+    return _cached_job_page(current_job, (view_mode, target_date.isoformat(), clinic_id, page, clinics_key), render)
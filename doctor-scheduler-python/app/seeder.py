@@ -1,11 +1,14 @@
 import traceback
+import time
 import click
 from app import db
 from app.models import (
     Doctor, Clinic, Shift, LeaveRequest, SchedulePreference,
-    SchedulingJob, Assignment
+    SchedulingJob, Assignment, JobDoctorSummary, JobSlotSummary
 )
 from app.models.doctor import DoctorRole
+from app.services.import_service import bulk_insert_rows
+from app.services.synthetic_data import generate_hospital
 from sqlalchemy import select
 import random
 import datetime
@@ -25,6 +28,13 @@ LAST_NAMES = [
     "Bùi", "Đỗ", "Hồ", "Ngô", "Dương", "Lý"
 ]
 
+def _clear_all_data():
+    """Xóa toàn bộ dữ liệu (theo thứ tự khóa ngoại)."""
+    for model in (JobDoctorSummary, JobSlotSummary, Assignment, SchedulePreference,
+                  LeaveRequest, SchedulingJob, Doctor, Clinic, Shift):
+        db.session.query(model).delete()
+    db.session.commit()
+
 def register_seeder(app):
     """Đăng ký các lệnh seed với ứng dụng Flask."""
     
@@ -40,14 +50,7 @@ def register_seeder(app):
         try:
             # === BƯỚC 1: XÓA DỮ LIỆU CŨ ===
             print("1/5: Xóa dữ liệu cũ...")
-            db.session.query(Assignment).delete()
-            db.session.query(SchedulePreference).delete()
-            db.session.query(LeaveRequest).delete()
-            db.session.query(SchedulingJob).delete()
-            db.session.query(Doctor).delete()
-            db.session.query(Clinic).delete()
-            db.session.query(Shift).delete()
-            db.session.commit() 
+            _clear_all_data()
             print("...Đã xóa xong dữ liệu cũ.")
 
             # === BƯỚC 2: TẠO 3 CA TRỰC CHUẨN (24h) ===
@@ -154,4 +157,74 @@ def register_seeder(app):
             print(f"Lỗi: {str(e)}")
             traceback.print_exc()
         finally:
-            db.session.close()
\ No newline at end of file
+            db.session.close()
+
+    @seed_cli.command(name='scale')
+    @click.option('--clinics', default=10, show_default=True, help='Số khoa.')
+    @click.option('--doctors-per-clinic', default=3, show_default=True,
+                  help='Số bác sĩ tối thiểu mỗi khoa (khoa thiếu bác sĩ Chính để phủ định biên được thêm).')
+    @click.option('--main-ratio', default=0.67, show_default=True, help='Tỷ lệ bác sĩ Chính.')
+    @click.option('--ratio-247', default=0.3, show_default=True, help='Tỷ lệ khoa trực 24/7.')
+    @click.option('--leave-density', default=0.05, show_default=True, help='Tỷ lệ (bác sĩ, ngày) có đơn nghỉ.')
+    @click.option('--pref-density', default=0.2, show_default=True, help='Tỷ lệ ô (bác sĩ, ca, thứ) có nguyện vọng.')
+    @click.option('--days', default=31, show_default=True, help='Độ dài kỳ xếp lịch (ngày).')
+    @click.option('--start-date', default='2025-12-01', show_default=True, help='Ngày bắt đầu kỳ (YYYY-MM-DD).')
+    @click.option('--seed', default=42, show_default=True, help='Seed sinh số ngẫu nhiên (tất định).')
+    def seed_scale(clinics, doctors_per_clinic, main_ratio, ratio_247, leave_density,
+                   pref_density, days, start_date, seed):
+        """Sinh bệnh viện tổng hợp quy mô lớn (INSERT hàng loạt) để đo tải / benchmark."""
+        t0 = time.perf_counter()
+        try:
+            data = generate_hospital(
+                clinics=clinics, doctors_per_clinic=doctors_per_clinic, main_ratio=main_ratio,
+                ratio_247=ratio_247, leave_density=leave_density, preference_density=pref_density,
+                horizon_days=days, start_date=datetime.date.fromisoformat(start_date), seed=seed
+            )
+            print(f"--- Seed scale: {len(data['clinics'])} khoa, {len(data['doctors'])} bác sĩ, "
+                  f"{len(data['leaves'])} đơn nghỉ, {len(data['preferences'])} nguyện vọng "
+                  f"(sinh trong {time.perf_counter() - t0:.2f}s) ---")
+
+            print("1/4: Xóa dữ liệu cũ...")
+            _clear_all_data()
+
+            # Ca và Khoa ít dòng -> ORM + flush để lấy id
+            print("2/4: Tạo Ca trực và Khoa...")
+            shifts = [Shift(**row) for row in data["shifts"]]
+            clinic_objs = [Clinic(**row) for row in data["clinics"]]
+            db.session.add_all(shifts + clinic_objs)
+            db.session.commit()
+            shift_ids = [s.id for s in shifts]
+            clinic_ids = [c.id for c in clinic_objs]
+
+            # Bác sĩ: INSERT hàng loạt, rồi đọc lại id theo thứ tự chèn (bảng vừa được xóa sạch)
+            print("3/4: Tạo Bác sĩ...")
+            bulk_insert_rows(db.session, Doctor, [{
+                "name": d["name"], "specialty": d["specialty"], "role": DoctorRole[d["role"]],
+                "clinic_id": clinic_ids[d["clinic_index"]], "total_shifts_worked": 0,
+            } for d in data["doctors"]])
+            doctor_ids = db.session.scalars(select(Doctor.id).order_by(Doctor.id)).all()
+
+            print("4/4: Tạo Đơn nghỉ, Nguyện vọng và Job chờ chạy...")
+            bulk_insert_rows(db.session, LeaveRequest, [{
+                "doctor_id": doctor_ids[l["doctor_index"]], "date": l["date"],
+                "reason": l["reason"], "status": l["status"],
+            } for l in data["leaves"]])
+            bulk_insert_rows(db.session, SchedulePreference, [{
+                "doctor_id": doctor_ids[p["doctor_index"]], "shift_id": shift_ids[p["shift_index"]],
+                "day_of_week": p["day_of_week"], "preference_score": p["preference_score"],
+            } for p in data["preferences"]])
+
+            db.session.add(SchedulingJob(
+                name=f"Scale {len(doctor_ids)} bác sĩ x {days} ngày (seed {seed})",
+                start_date=data["start_date"], end_date=data["end_date"]
+            ))
+            db.session.commit()
+            print(f"HOÀN THÀNH trong {time.perf_counter() - t0:.2f}s.")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"!!! LỖI KHI ĐANG GIEO DỮ LIỆU !!!")
+            print(f"Lỗi: {str(e)}")
+            traceback.print_exc()
+        finally:
+            db.session.close()
@@ -0,0 +1,131 @@
+import random
+import time
+from simanneal import Annealer
+from .solver_service import IncrementalCost
+
+# =================================================================
+# 4. ANNEALER (Bộ giải thuật toán)
+# =================================================================
+# Tách riêng khỏi solver_service.py để simanneal chỉ được import khi thật sự chạy.
+class ScheduleAnnealer(Annealer):
+    def __init__(self, initial_state, cost_function):
+        self.cost_function = cost_function
+        super(ScheduleAnnealer, self).__init__(initial_state)
+        
+        # --- CÁC BIẾN THEO DÕI NÂNG CAO ---
+        self.prev_best_energy = float('inf') 
+        self.step_of_last_best = 0           
+        self.last_move_vars = 0              
+
+        # Chi phí giữ qua các bước: move() trả về dE thay vì để simanneal gọi energy() mỗi bước.
+        # simanneal quyết định nhận/bỏ SAU move() và khi bỏ thì gán self.state = bản sao của state cũ,
+        # nên bước trước được coi là đã nhận khi self.state vẫn là đúng đối tượng đã bị thay đổi.
+        self.incremental = None
+        self._pending = None
+        # Số giây từ lúc bắt đầu tới khi chi phí cứng của state đang giữ đầu tiên về 0 (None: chưa khả thi)
+        self.time_to_feasible = None
+
+    def move(self):
+        """Hàm biến đổi trạng thái (Mutation). Trả về dE (0 nếu không đổi gì)."""
+        ctx = self.cost_function.ctx
+        self.last_move_vars = 0 # Reset đếm
+        self._commit_pending()
+        
+        # 1. Chọn ngày, khoa, ca ngẫu nhiên
+        if not ctx.date_range or not ctx.clinics or not ctx.shifts: return 0
+        date = random.choice(ctx.date_range)
+        clinic_id = random.choice(list(ctx.clinics_map.keys()))
+        
+        existing_shifts = list(self.state.assignments[date][clinic_id].keys())
+        if not existing_shifts: return 0
+        shift_id = random.choice(existing_shifts)
+        
+        current_docs = self.state.assignments[date][clinic_id][shift_id]
+        if not current_docs: return 0
+        
+        # 2. Chọn người để thay ra (OUT)
+        doc_out_id = random.choice(current_docs)
+        role_key = ctx.doctor_role_key.get(doc_out_id)
+        if not role_key: return 0
+
+        # 3. Chọn người thay thế (IN)
+        candidates = ctx.doctors_by_clinic[clinic_id][role_key]
+        
+        if not candidates: return 0
+        doc_in_id = random.choice(candidates)
+        
+        if doc_in_id in current_docs: return 0
+
+        # Hoán đổi
+        swap = (date, clinic_id, shift_id, doc_out_id, doc_in_id)
+        delta = self.incremental.swap_delta(*swap)
+        current_docs.remove(doc_out_id)
+        current_docs.append(doc_in_id)
+        
+        self.last_move_vars = 1 
+        self._pending = (self.state, swap, delta)
+        return delta[0] * self.cost_function.W_HARD + delta[1] * self.cost_function.W_SOFT
+
+    def _commit_pending(self):
+        """Cập nhật bộ đếm theo bước trước nếu simanneal đã nhận nó (state không bị thay bằng bản sao)."""
+        if self._pending is not None:
+            state, swap, delta = self._pending
+            if state is self.state:
+                self.incremental.apply_swap(*swap, delta)
+                self._track_feasible()
+            self._pending = None
+
+    def _track_feasible(self):
+        if self.time_to_feasible is None and self.incremental.hard <= 0:
+            self.time_to_feasible = time.time() - self.start
+
+    def anneal(self):
+        result = super().anneal()
+        # Bước cuối cùng chưa có move() sau nó để ghi nhận
+        self._commit_pending()
+        return result
+
+    def energy(self):
+        # Chỉ được simanneal gọi 1 lần lúc bắt đầu (các bước sau dùng dE của move())
+        self.incremental = IncrementalCost(self.cost_function, self.state)
+        self._pending = None
+        self._track_feasible()
+        hard, soft = self.incremental.energy
+        return hard * self.cost_function.W_HARD + soft * self.cost_function.W_SOFT
+    
+    def update(self, step, T, E, acceptance, improvement):
+        elapsed = time.time() - self.start
+
+        if acceptance is None: acceptance = 0.0
+        if improvement is None: improvement = 0.0
+        
+        # Tính toán chỉ số Dashboard
+        accept_rate_pct = acceptance * 100
+        good_rate_pct = improvement * 100
+        bad_rate_pct = (acceptance - improvement) * 100
+        
+        current_best = self.best_energy
+        if current_best < self.prev_best_energy:
+            self.prev_best_energy = current_best
+            self.step_of_last_best = step
+            
+        steps_since_imp = step - self.step_of_last_best
+        avg_time_ms = (elapsed / step) * 1000 if step > 0 else 0
+        # Số liệu của state đang giữ (đánh giá lại ~`updates` lần mỗi lượt giải)
+        self.cost_function.evaluate(self.state)
+        stats = self.cost_function.current_stats
+        
+        # HIỂN THỊ LOG FORMAT ĐẸP
+        print("-" * 100)
+        print(f" BƯỚC: {step:6d} / {self.steps}  |  Nhiệt độ (T): {T:10.2f}  |  Thời gian: {elapsed:.1f}s")
+        print(f"   ➤ Cost Hiện tại: {E:10.0f}  |   Best Cost: {current_best:10.0f} (Cập nhật cách đây {steps_since_imp} bước)")
+        
+        print(f"   ➤ Trạng thái bước đi:")
+        print(f"     • Thay đổi: {self.last_move_vars} vị trí (ca trực)")
+        print(f"     • Tỷ lệ Chấp nhận: {accept_rate_pct:5.1f}%  ( Tốt: {good_rate_pct:4.1f}% |  Rủi ro: {bad_rate_pct:4.1f}%)")
+        print(f"     • Tốc độ xử lý:    {avg_time_ms:5.2f} ms/bước")
+        
+        print(f"   ➤ Phân tích Lỗi (Ràng buộc):")
+        print(f"     [CỨNG] Thiếu người: {stats['missing_staff']:3d}  |  Quá 48h: {stats['over_48h']:3d}  |  Nghỉ ít/Trùng: {stats['bad_rest']:3d}")
+        print(f"     [MỀM ] Nguyện vọng: {stats['preference_bad']:3d}")
+        print("-" * 100)
\ No newline at end of file
@@ -0,0 +1,542 @@
+from __future__ import annotations
+import bisect
+import datetime
+import json
+import os
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from app.models import SchedulingJob, Assignment, Doctor, JobDoctorSummary
+from app.models.scheduling_job import JobStatus
+from .solver_service import (
+    ScheduleState, ScheduleContextData, rest_penalty, MIN_REST_HOURS, SAME_DAY_PENALTY, MAX_VIOLATION_ROWS,
+)
+from .result_cache import result_cache
+
+ROLE_KEYS = ('main', 'sub')
+
+
+# =================================================================
+# CHỈ MỤC TRONG BỘ NHỚ CHO 1 JOB ĐÃ HOÀN THÀNH
+# =================================================================
+class JobAvailabilityIndex:
+    """
+    Lịch đã công bố của 1 Job, dựng sẵn để trả lời "ai trực thay được ca này?" trong vài ms:
+        - state     : ScheduleState (ngày -> khoa -> ca -> [bác sĩ]) như lúc solver lưu
+        - timelines : doc_id -> danh sách ca ĐÃ SẮP XẾP (bắt đầu, kết thúc, ngày, khoa, ca),
+                      gồm cả đuôi lịch đã chốt trước kỳ (khoa = 0)
+        - tracker   : giờ làm theo tuần lịch của mọi bác sĩ
+        - fairness  : tổng/tổng bình phương khối lượng việc theo nhóm (khoa, vai trò)
+    Chi phí biên của 1 bác sĩ chỉ cần 2 ca kề bên (bisect) + giờ làm của 1 tuần,
+    tính đúng như CostFunction.evaluate nhưng không quét lại cả lịch.
+    """
+
+    def __init__(self, job: SchedulingJob, ctx: ScheduleContextData, rows):
+        self.job_id = job.id
+        self.version = job.cache_version
+        self.ctx = ctx
+        self.lock = threading.Lock()
+
+        assignments = {date: {} for date in ctx.date_range}
+        self.timelines = defaultdict(list)
+        self.tracker = ctx.new_hours_tracker()
+        self.fairness = ctx.new_fairness_tracker()
+        self.workload = defaultdict(int)
+        for date, clinic_id, shift_id, doc_id in rows:
+            assignments.setdefault(date, {}).setdefault(clinic_id, {}).setdefault(shift_id, []).append(doc_id)
+            self.timelines[doc_id].append((*ctx.shift_span(date, shift_id), date, clinic_id, shift_id))
+            self.tracker.add(doc_id, ctx.day_index(date), ctx.shift_hours[shift_id])
+            self.fairness.add(doc_id, ctx.workload_vector(date, shift_id))
+            self.workload[doc_id] += 1
+        for doc_id, items in ctx.fixed_shifts.items():
+            for date, shift_id in items:
+                self.timelines[doc_id].append((*ctx.shift_span(date, shift_id), date, 0, shift_id))
+        for timeline in self.timelines.values():
+            timeline.sort()
+        self.state = ScheduleState(assignments)
+
+    @classmethod
+    def build(cls, db_session: Session, job: SchedulingJob) -> "JobAvailabilityIndex":
+        from .scheduling_service import SchedulingService  # tránh import vòng
+        ctx = SchedulingService(db_session)._build_context(job.start_date, job.end_date, job.id, job.fairness_weight)
+        rows = db_session.execute(
+            select(Assignment.assignment_date, Assignment.clinic_id, Assignment.shift_id, Assignment.doctor_id)
+            .where(Assignment.job_id == job.id)
+        ).all()
+        return cls(job, ctx, rows)
+
+    def slot_doctors(self, date, clinic_id, shift_id) -> list:
+        return self.state.assignments.get(date, {}).get(clinic_id, {}).get(shift_id, [])
+
+    # --- Chi phí biên ---
+    def marginal_cost(self, doc_id, date, shift_id):
+        """(Δhard, Δsoft, lý do) khi THÊM 1 ca (date, shift_id) cho doc_id vào lịch hiện tại."""
+        ctx = self.ctx
+        hard = 0
+        soft = 0
+        reasons = []
+
+        if ctx.leaves_map.get((doc_id, date), False):
+            hard += 1
+            reasons.append("leave")
+
+        pref_score = ctx.preferences_map.get((doc_id, shift_id, date.weekday()), 0)
+        if pref_score < 0:
+            soft += abs(pref_score)
+            reasons.append("preference")
+
+        # Luật nghỉ ngơi/trùng ca chỉ phụ thuộc 2 ca liền kề trên dòng thời gian
+        span = ctx.shift_span(date, shift_id)
+        timeline = self.timelines.get(doc_id, ())
+        i = bisect.bisect_left(timeline, span)
+        prev = timeline[i - 1] if i > 0 else None
+        nxt = timeline[i] if i < len(timeline) else None
+        rest = 0
+        if prev is not None:
+            rest += rest_penalty(prev, span)
+        if nxt is not None:
+            rest += rest_penalty(span, nxt)
+        if prev is not None and nxt is not None:
+            rest -= rest_penalty(prev, nxt)
+        if rest > 0:
+            reasons.append("rest")
+        hard += rest
+
+        over = self.tracker.add_delta(doc_id, ctx.day_index(date), ctx.shift_hours[shift_id])
+        if over > 0:
+            reasons.append("over_48h")
+        hard += over
+
+        if ctx.fairness_weight:
+            fair = ctx.fairness_weight * self.fairness.delta(doc_id, ctx.workload_vector(date, shift_id))
+            if fair > 0:
+                reasons.append("fairness")
+            soft += fair
+
+        return hard, soft, reasons
+
+    def removal_cost(self, doc_id, entry):
+        """(Δhard, Δsoft) khi BỎ 1 ca (entry trên dòng thời gian) khỏi doc_id - thường âm."""
+        ctx = self.ctx
+        start, end, date, clinic_id, shift_id = entry
+        hard = -1 if ctx.leaves_map.get((doc_id, date), False) else 0
+        soft = min(0, ctx.preferences_map.get((doc_id, shift_id, date.weekday()), 0))
+
+        timeline = self.timelines[doc_id]
+        i = timeline.index(entry)
+        prev = timeline[i - 1] if i > 0 else None
+        nxt = timeline[i + 1] if i + 1 < len(timeline) else None
+        if prev is not None:
+            hard -= rest_penalty(prev, entry)
+        if nxt is not None:
+            hard -= rest_penalty(entry, nxt)
+        if prev is not None and nxt is not None:
+            hard += rest_penalty(prev, nxt)
+
+        hard += self.tracker.add_delta(doc_id, ctx.day_index(date), -ctx.shift_hours[shift_id])
+        if ctx.fairness_weight:
+            soft += ctx.fairness_weight * self.fairness.delta(doc_id, ctx.workload_vector(date, shift_id), -1)
+        return hard, soft
+
+    def leave_impact(self, doc_id, date) -> dict:
+        """
+        Xem trước tác động của 1 đơn nghỉ MỚI (doc_id, date) lên lịch đã công bố, không chạy solver:
+            - delta_hard/soft : thay đổi chi phí nếu giữ nguyên lịch (mỗi ca trong ngày nghỉ +1 cứng)
+            - affected[]      : từng ca bị ảnh hưởng + người thay rẻ nhất (cùng khoa, cùng vai trò)
+            - repaired_*      : thay đổi chi phí nếu áp dụng mọi phương án thay thế đó
+        Mỗi ca được sửa độc lập (tương tác giữa 2 ca cùng ngày của cùng bác sĩ bị bỏ qua).
+        Chỉ đọc dòng thời gian của bác sĩ nghỉ và của các ứng viên.
+        """
+        ctx = self.ctx
+        already_on_leave = ctx.leaves_map.get((doc_id, date), False)
+        entries = [e for e in self.timelines.get(doc_id, ()) if e[2] == date and e[3]]
+        leave_hard = 0 if already_on_leave else 1
+
+        affected = []
+        repaired_hard = repaired_soft = 0
+        for entry in entries:
+            _, _, _, clinic_id, shift_id = entry
+            out_hard, out_soft = self.removal_cost(doc_id, entry)
+            if not already_on_leave:
+                out_hard -= 1  # bỏ ca thì cũng bỏ luôn vi phạm đơn nghỉ mới
+            best = self.candidates(date, clinic_id, shift_id, out_doc=doc_id, limit=1)
+            substitute = best[0] if best else None
+            fix_hard = fix_soft = 0
+            if substitute:
+                fix_hard = out_hard + substitute["delta_hard"]
+                fix_soft = out_soft + substitute["delta_soft"]
+                if ctx.fairness_weight:
+                    fix_soft += ctx.fairness_weight * self.fairness.swap_correction(
+                        doc_id, substitute["doctor_id"], ctx.workload_vector(date, shift_id))
+            # Thay người chỉ được đề xuất khi rẻ hơn giữ nguyên (thiếu định biên còn đắt hơn)
+            recommended = substitute is not None and (fix_hard, fix_soft) < (0, 0)
+            if recommended:
+                repaired_hard += fix_hard
+                repaired_soft += fix_soft
+            affected.append({
+                "date": date.isoformat(),
+                "clinic_id": clinic_id,
+                "clinic_name": ctx.clinics_map[clinic_id].name,
+                "shift_id": shift_id,
+                "shift_name": ctx.shifts_map[shift_id].name,
+                "substitute": substitute,
+                "recommended": recommended,
+                "repair_delta_hard": fix_hard,
+                "repair_delta_soft": fix_soft,
+            })
+
+        delta_hard = leave_hard * len(entries)
+        return {
+            "job_id": self.job_id,
+            "doctor_id": doc_id,
+            "date": date.isoformat(),
+            "already_on_leave": already_on_leave,
+            "delta_hard": delta_hard,
+            "delta_soft": 0,
+            "affected": affected,
+            "repaired_delta_hard": delta_hard + repaired_hard,
+            "repaired_delta_soft": repaired_soft,
+        }
+
+    def is_eligible(self, doc_id, date, clinic_id, role: str) -> bool:
+        """Có thể nhận 1 ca của khoa vào ngày `date`: thuộc khoa + vai trò, không nghỉ, chưa có ca trong ngày."""
+        ctx = self.ctx
+        if doc_id not in ctx.doctors_by_clinic.get(clinic_id, {}).get(role, ()):
+            return False
+        if ctx.leaves_map.get((doc_id, date), False):
+            return False
+        return not any(e[2] == date and e[3] for e in self.timelines.get(doc_id, ()))
+
+    def candidates(self, date, clinic_id, shift_id, role: str | None = None, limit: int = 10,
+                   out_doc: int | None = None) -> list:
+        """
+        Bác sĩ của khoa có thể nhận ca (xem is_eligible), xếp theo chi phí biên tăng dần.
+        Vai trò mặc định = vai trò của người cần thay (out_doc) để không đưa bác sĩ Phụ vào chỗ Chính;
+        không có cả hai thì xét mọi vai trò.
+        """
+        ctx = self.ctx
+        if role is None and out_doc is not None:
+            role = ctx.doctor_role_key.get(out_doc)
+        pool = ctx.doctors_by_clinic.get(clinic_id, {})
+        ranked = []
+        for role_key in ((role,) if role else ROLE_KEYS):
+            for doc_id in pool.get(role_key, ()):
+                if not self.is_eligible(doc_id, date, clinic_id, role_key):
+                    continue
+                hard, soft, reasons = self.marginal_cost(doc_id, date, shift_id)
+                doc = ctx.doctors_map[doc_id]
+                ranked.append({
+                    "doctor_id": doc_id,
+                    "name": doc.name,
+                    "role": role_key,
+                    "delta_hard": round(hard, 3),
+                    "delta_soft": round(soft, 3),
+                    "available": hard == 0,
+                    "reasons": reasons,
+                    "shifts_in_job": self.workload.get(doc_id, 0),
+                })
+        ranked.sort(key=lambda c: (c["delta_hard"], c["delta_soft"], c["shifts_in_job"], c["name"]))
+        return ranked[:limit]
+
+    def swap_cost(self, date, clinic_id, shift_id, out_doc, in_doc):
+        """(Δhard, Δsoft, lý do) khi thay out_doc bằng in_doc: bỏ ca của người cũ + thêm ca cho người mới."""
+        ctx = self.ctx
+        entry = (*ctx.shift_span(date, shift_id), date, clinic_id, shift_id)
+        out_hard, out_soft = self.removal_cost(out_doc, entry)
+        in_hard, in_soft, reasons = self.marginal_cost(in_doc, date, shift_id)
+        soft = out_soft + in_soft
+        if ctx.fairness_weight:
+            soft += ctx.fairness_weight * self.fairness.swap_correction(
+                out_doc, in_doc, ctx.workload_vector(date, shift_id))
+        return out_hard + in_hard, soft, reasons
+
+    def doctor_summary(self, doc_id):
+        """
+        (dòng JobDoctorSummary, [vi phạm]) của 1 bác sĩ, tính lại từ dòng thời gian + giờ làm như
+        CostFunction.evaluate(summary=...) - chỉ đọc các ca của bác sĩ đó.
+        """
+        ctx = self.ctx
+        totals = {"shift_count": 0, "total_hours": 0.0, "night_shifts": 0, "preference_hits": 0, "violations": 0}
+        violations = []
+        timeline = self.timelines.get(doc_id, ())
+        n_fixed = 0
+        for start, end, date, clinic_id, shift_id in timeline:
+            if not clinic_id:
+                n_fixed += 1
+                continue
+            totals["shift_count"] += 1
+            totals["total_hours"] += ctx.shift_hours[shift_id]
+            if shift_id in ctx.night_shift_ids:
+                totals["night_shifts"] += 1
+            pref_score = ctx.preferences_map.get((doc_id, shift_id, date.weekday()), 0)
+            if pref_score > 0:
+                totals["preference_hits"] += 1
+            if ctx.leaves_map.get((doc_id, date), False):
+                totals["violations"] += 1
+                violations.append(('leave', doc_id, date, clinic_id, shift_id, 1))
+            if pref_score < 0:
+                violations.append(('preference', doc_id, date, clinic_id, shift_id, -pref_score))
+        if not totals["shift_count"]:
+            return None, []
+
+        if self.tracker.doc_overage.get(doc_id, 0) > 0:
+            totals["violations"] += 1
+            for w, over in self.tracker.week_overage(doc_id):
+                violations.append(('over_48h', doc_id, ctx.week_start(w), 0, 0, over))
+        # Ca đã chốt (khoa = 0) đứng đầu dòng thời gian; chỉ xét các cặp có ca trong kỳ
+        for i in range(max(0, n_fixed - 1), len(timeline) - 1):
+            current, nxt = timeline[i], timeline[i + 1]
+            _, _, date, clinic_id, shift_id = nxt
+            if (nxt[0] - current[1]).total_seconds() / 3600 < MIN_REST_HOURS:
+                totals["violations"] += 1
+                violations.append(('rest', doc_id, date, clinic_id, shift_id, 1))
+            if current[0].date() == nxt[0].date():
+                totals["violations"] += 1
+                violations.append(('same_day', doc_id, date, clinic_id, shift_id, SAME_DAY_PENALTY))
+        return totals, violations
+
+    # --- Cập nhật tăng dần ---
+    def apply_swap(self, date, clinic_id, shift_id, out_doc, in_doc):
+        """Thay out_doc bằng in_doc trong 1 ca: cập nhật state, dòng thời gian và giờ làm."""
+        ctx = self.ctx
+        docs = self.slot_doctors(date, clinic_id, shift_id)
+        docs[docs.index(out_doc)] = in_doc
+
+        entry = (*ctx.shift_span(date, shift_id), date, clinic_id, shift_id)
+        self.timelines[out_doc].remove(entry)
+        bisect.insort(self.timelines[in_doc], entry)
+
+        day, hours = ctx.day_index(date), ctx.shift_hours[shift_id]
+        self.tracker.remove(out_doc, day, hours)
+        self.tracker.add(in_doc, day, hours)
+        vector = ctx.workload_vector(date, shift_id)
+        self.fairness.remove(out_doc, vector)
+        self.fairness.add(in_doc, vector)
+        self.workload[out_doc] -= 1
+        self.workload[in_doc] += 1
+
+
+# =================================================================
+# BỘ ĐỆM CHỈ MỤC (LRU, theo phiên bản kết quả của Job)
+# =================================================================
+class AvailabilityIndexCache:
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job: SchedulingJob):
+        with self._lock:
+            index = self._entries.get(job.id)
+            if index is None or index.version != job.cache_version:
+                return None
+            self._entries.move_to_end(job.id)
+            return index
+
+    def put(self, index: JobAvailabilityIndex):
+        with self._lock:
+            self._entries[index.job_id] = index
+            self._entries.move_to_end(index.job_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_job(self, job_id: int):
+        with self._lock:
+            self._entries.pop(job_id, None)
+
+    def clear(self):
+        """Dữ liệu đầu vào (vd. đơn nghỉ) thay đổi -> dựng lại mọi chỉ mục khi cần."""
+        with self._lock:
+            self._entries.clear()
+
+
+availability_indexes = AvailabilityIndexCache(int(os.environ.get('AVAILABILITY_INDEX_MAX_ENTRIES', 8)))
+
+
+# =================================================================
+# DỊCH VỤ
+# =================================================================
+class AvailabilityService:
+    """Tra cứu người trực thay và xác nhận đổi ca trên lịch đã công bố (Job COMPLETED)."""
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def index_for(self, job: SchedulingJob) -> JobAvailabilityIndex:
+        index = availability_indexes.get(job)
+        if index is None:
+            index = JobAvailabilityIndex.build(self.db, job)
+            availability_indexes.put(index)
+        return index
+
+    def find_candidates(self, job: SchedulingJob, date: datetime.date, clinic_id: int, shift_id: int,
+                        role: str | None = None, limit: int = 10, out_doc: int | None = None) -> dict:
+        index = self.index_for(job)
+        if shift_id not in index.ctx.shifts_map or clinic_id not in index.ctx.clinics_map:
+            raise ValueError("Khoa hoặc ca không tồn tại.")
+        with index.lock:
+            return {
+                "job_id": job.id,
+                "date": date.isoformat(),
+                "clinic_id": clinic_id,
+                "shift_id": shift_id,
+                "assigned": index.slot_doctors(date, clinic_id, shift_id),
+                "candidates": index.candidates(date, clinic_id, shift_id, role, limit, out_doc=out_doc),
+            }
+
+    def active_job_for(self, date: datetime.date) -> SchedulingJob | None:
+        """Lịch đang công bố cho 1 ngày: Job COMPLETED phủ ngày đó, hoàn thành muộn nhất."""
+        return self.db.scalar(
+            select(SchedulingJob)
+            .where(SchedulingJob.status == JobStatus.COMPLETED,
+                   SchedulingJob.start_date <= date, SchedulingJob.end_date >= date)
+            .order_by(SchedulingJob.finished_at.desc(), SchedulingJob.id.desc())
+            .limit(1)
+        )
+
+    def preview_leave(self, doctor_id: int, date: datetime.date) -> dict | None:
+        """Tác động của đơn nghỉ (chưa lưu) lên lịch đang công bố; None nếu ngày chưa có lịch."""
+        job = self.active_job_for(date)
+        if job is None:
+            return None
+        index = self.index_for(job)
+        if doctor_id not in index.ctx.doctors_map:
+            raise ValueError("Bác sĩ không tồn tại.")
+        with index.lock:
+            result = index.leave_impact(doctor_id, date)
+        result["job_name"] = job.name
+        return result
+
+    def swap(self, job: SchedulingJob, date: datetime.date, clinic_id: int, shift_id: int,
+             out_doc: int, in_doc: int) -> dict:
+        """
+        Ghi 1 lần đổi ca: cập nhật đúng 1 dòng Assignment, chỉ mục (tăng dần), dòng tổng hợp của
+        2 bác sĩ liên quan và chi phí cuối của Job (cộng delta). result_version được đặt lại ->
+        trang kết quả/lịch đã đệm hết hạn; finished_at giữ nguyên (không đổi lịch đang công bố).
+        """
+        index = self.index_for(job)
+        ctx = index.ctx
+        if in_doc not in ctx.doctors_map:
+            raise ValueError("Bác sĩ thay thế không tồn tại.")
+        role = ctx.doctor_role_key.get(out_doc)
+        if ctx.doctor_role_key.get(in_doc) != role:
+            raise ValueError("Bác sĩ thay thế phải cùng vai trò (Chính/Phụ) để giữ định biên.")
+        if in_doc not in ctx.doctors_by_clinic.get(clinic_id, {}).get(role, ()):
+            raise ValueError("Bác sĩ thay thế không thuộc khoa của ca này.")
+        if ctx.leaves_map.get((in_doc, date), False):
+            raise ValueError("Bác sĩ thay thế có đơn nghỉ vào ngày này.")
+
+        with index.lock:
+            docs = index.slot_doctors(date, clinic_id, shift_id)
+            if out_doc not in docs:
+                raise ValueError("Bác sĩ cần thay không có trong ca này.")
+            if not index.is_eligible(in_doc, date, clinic_id, role):
+                raise ValueError("Bác sĩ thay thế đã có ca trong ngày này.")
+
+            assignment = self.db.scalar(
+                select(Assignment).where(
+                    Assignment.job_id == job.id,
+                    Assignment.assignment_date == date,
+                    Assignment.clinic_id == clinic_id,
+                    Assignment.shift_id == shift_id,
+                    Assignment.doctor_id == out_doc,
+                ).limit(1)
+            )
+            if assignment is None:
+                availability_indexes.invalidate_job(job.id)
+                raise ValueError("Lịch đã thay đổi, vui lòng tải lại.")
+
+            delta_hard, delta_soft, reasons = index.swap_cost(date, clinic_id, shift_id, out_doc, in_doc)
+            before = {doc_id: index.doctor_summary(doc_id) for doc_id in (out_doc, in_doc)}
+            try:
+                assignment.doctor_id = in_doc
+                index.apply_swap(date, clinic_id, shift_id, out_doc, in_doc)
+                after = {doc_id: index.doctor_summary(doc_id) for doc_id in (out_doc, in_doc)}
+                self._update_doctor_summaries(job, date, before, after)
+                self._update_violation_report(job, before, after)
+                job.final_hard_cost = (job.final_hard_cost or 0) + delta_hard
+                job.final_soft_cost = (job.final_soft_cost or 0) + delta_soft
+                job.result_version = datetime.datetime.now(datetime.timezone.utc)
+                self.db.commit()
+            except Exception:
+                self.db.rollback()
+                availability_indexes.invalidate_job(job.id)
+                raise
+            # Giá trị đọc lại từ CSDL (độ chính xác của cột) là phiên bản mới của chỉ mục
+            index.version = job.cache_version
+
+        result_cache.invalidate_job(job.id)
+        print(f"Service: Job {job.id} đổi ca {date} khoa {clinic_id} ca {shift_id}: {out_doc} -> {in_doc}")
+        return {
+            "job_id": job.id,
+            "assigned": list(index.slot_doctors(date, clinic_id, shift_id)),
+            "delta_hard": delta_hard,
+            "delta_soft": delta_soft,
+            "reasons": reasons,
+            "final_hard_cost": job.final_hard_cost,
+            "final_soft_cost": job.final_soft_cost,
+        }
+
+    def _update_doctor_summaries(self, job: SchedulingJob, date: datetime.date, before: dict, after: dict):
+        """
+        Ghi lại JobDoctorSummary của các bác sĩ bị đổi ca (xóa dòng khi không còn ca nào) và cộng
+        chênh lệch số ca vào Doctor.total_shifts_worked - chỉ khi Job là lịch đang công bố của ngày
+        `date` (bộ đếm theo lịch công bố, xem SchedulingService.save_summary).
+        JobSlotSummary không đổi: đổi người cùng vai trò.
+        """
+        from .scheduling_service import SchedulingService  # tránh import vòng
+        published = SchedulingService(self.db).published_jobs_by_date(date, date).get(date) == job.id
+        rows = {row.doctor_id: row for row in self.db.scalars(
+            select(JobDoctorSummary).where(JobDoctorSummary.job_id == job.id,
+                                           JobDoctorSummary.doctor_id.in_(list(after)))
+        )}
+        for doc_id, (totals, _) in after.items():
+            row = rows.get(doc_id)
+            if totals is None:
+                if row is not None:
+                    self.db.delete(row)
+            elif row is None:
+                self.db.add(JobDoctorSummary(job_id=job.id, doctor_id=doc_id, **totals))
+            else:
+                for name, value in totals.items():
+                    setattr(row, name, value)
+
+            shift_delta = (totals or {}).get("shift_count", 0) - (before[doc_id][0] or {}).get("shift_count", 0)
+            if shift_delta and published:
+                self.db.execute(
+                    update(Doctor).where(Doctor.id == doc_id)
+                    .values(total_shifts_worked=func.coalesce(Doctor.total_shifts_worked, 0) + shift_delta)
+                )
+
+    @staticmethod
+    def _update_violation_report(job: SchedulingJob, before: dict, after: dict):
+        """Thay các vi phạm của 2 bác sĩ trong báo cáo JSON đã lưu (cùng dạng ScheduleSummary.violation_report)."""
+        if not job.violation_report:
+            return
+        report = json.loads(job.violation_report)
+        kinds = report["kinds"]
+
+        def encode(kind, doc_id, date, clinic_id, shift_id, cost):
+            return [kinds.index(kind), doc_id, date.isoformat(), clinic_id, shift_id,
+                    round(cost, 2) if isinstance(cost, float) else cost]
+
+        counts = Counter(report["counts"])
+        rows = report["rows"]
+        for _, violations in before.values():
+            for violation in violations:
+                counts[violation[0]] -= 1
+                row = encode(*violation)
+                if row in rows:
+                    rows.remove(row)
+        for _, violations in after.values():
+            for violation in violations:
+                counts[violation[0]] += 1
+                rows.append(encode(*violation))
+        rows.sort(key=lambda r: (r[2], r[3], r[4], r[1], kinds[r[0]]))
+
+        report["counts"] = {kind: counts[kind] for kind in kinds if counts[kind] > 0}
+        report["rows"] = rows[:MAX_VIOLATION_ROWS]
+        report["truncated"] = max(0, sum(report["counts"].values()) - len(report["rows"]))
+        job.violation_report = json.dumps(report, separators=(',', ':'))
+        job.violation_counts = json.dumps(report["counts"], separators=(',', ':'))
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import datetime
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, case
+from app.models import Doctor, Clinic, Shift, Assignment, SchedulingJob
+from app.models.doctor import DoctorRole
+from .report_service import ReportService, VIOLATION_LABELS
+
+VIEW_MODES = ('all', 'week', 'day')
+
+
+def _shift_style(start_time: datetime.time) -> dict:
+    """Màu/biểu tượng của hàng ca theo giờ bắt đầu: Sáng / Chiều / Đêm."""
+    if 4 <= start_time.hour < 12:
+        return {"color_class": "text-warning", "icon": "bi-brightness-alt-high-fill"}
+    if 12 <= start_time.hour < 18:
+        return {"color_class": "text-info", "icon": "bi-sunset-fill"}
+    return {"color_class": "text-secondary", "icon": "bi-moon-stars-fill"}
+
+
+class CalendarService:
+    """
+    Lấy dữ liệu cho trang Xem Lịch (calendar_view).
+    Mọi bộ lọc (Ngày/Tuần, Khoa) và phân trang bác sĩ đều được đẩy xuống mệnh đề
+    WHERE/LIMIT của SQL; chỉ SELECT các cột vô hướng mà template thực sự dùng.
+    """
+    DOCTORS_PER_PAGE = 40
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    @staticmethod
+    def resolve_window(job: SchedulingJob, view_mode: str, target_date: datetime.date):
+        """Trả về (ngày bắt đầu, ngày kết thúc) hiển thị, luôn nằm trong phạm vi job."""
+        final_start, final_end = job.start_date, job.end_date
+
+        if view_mode == 'day':
+            final_start = final_end = target_date
+        elif view_mode == 'week':
+            # Tính thứ 2 đầu tuần
+            start_of_week = target_date - datetime.timedelta(days=target_date.weekday())
+            final_start = start_of_week
+            final_end = start_of_week + datetime.timedelta(days=6)
+
+        # Đảm bảo không vượt quá phạm vi job
+        return max(final_start, job.start_date), min(final_end, job.end_date)
+
+    def list_shift_rows(self):
+        """Các hàng CA TRỰC của lịch, lấy từ bảng shifts (sắp theo giờ bắt đầu)."""
+        rows = self.db.execute(
+            select(Shift.id, Shift.name, Shift.start_time, Shift.end_time).order_by(Shift.start_time, Shift.id)
+        ).all()
+        return [{
+            "id": row.id,
+            "label": row.name,
+            "hours": f"{row.start_time.strftime('%H:%M')} - {row.end_time.strftime('%H:%M')}",
+            **_shift_style(row.start_time),
+        } for row in rows]
+
+    def list_clinics(self):
+        """Danh sách (id, name) cho bộ lọc - không tải entity Clinic."""
+        return self.db.execute(select(Clinic.id, Clinic.name).order_by(Clinic.name)).all()
+
+    def load_calendar(self, job: SchedulingJob, view_mode: str, target_date: datetime.date,
+                      clinic_id: int | None = None, page: int = 1) -> dict:
+        start, end = self.resolve_window(job, view_mode, target_date)
+
+        date_range = []
+        curr = start
+        while curr <= end:
+            date_range.append(curr)
+            curr += datetime.timedelta(days=1)
+
+        filters = [
+            Assignment.job_id == job.id,
+            Assignment.assignment_date.between(start, end),
+        ]
+        if clinic_id:
+            filters.append(Assignment.clinic_id == clinic_id)
+
+        # 1. Đếm số bác sĩ có lịch trong cửa sổ lọc (để phân trang)
+        doctor_ids_in_window = select(Assignment.doctor_id).where(*filters).distinct()
+        total_doctors = self.db.scalar(
+            select(func.count()).select_from(doctor_ids_in_window.subquery())
+        ) or 0
+        total_pages = max(1, -(-total_doctors // self.DOCTORS_PER_PAGE))
+        page = min(max(1, page), total_pages)
+
+        # 2. Trang bác sĩ hiện tại - sắp xếp: Khoa -> Chính trước -> Tên A-Z
+        doctors_stmt = (
+            select(Doctor.id, Doctor.name, Doctor.role, Doctor.clinic_id)
+            .outerjoin(Clinic, Doctor.clinic_id == Clinic.id)
+            .where(Doctor.id.in_(doctor_ids_in_window))
+            .order_by(
+                func.coalesce(Clinic.name, 'zz_Khac'),
+                case((Doctor.role == DoctorRole.MAIN, 0), else_=1),
+                Doctor.name,
+                Doctor.id,
+            )
+            .limit(self.DOCTORS_PER_PAGE)
+            .offset((page - 1) * self.DOCTORS_PER_PAGE)
+        )
+        doctors_list = self.db.execute(doctors_stmt).all()
+        page_doctor_ids = [doc.id for doc in doctors_list]
+
+        # 3. Phân công của trang bác sĩ này -> lưới (shift_id, ngày) với danh sách bác sĩ
+        #    đã sắp theo thứ tự trang; template chỉ cần 1 lượt mỗi ô
+        grid = defaultdict(list)
+        if page_doctor_ids:
+            assign_stmt = (
+                select(Assignment.doctor_id, Assignment.assignment_date, Assignment.shift_id)
+                .where(*filters, Assignment.doctor_id.in_(page_doctor_ids))
+            )
+            for row in self.db.execute(assign_stmt):
+                grid[(row.shift_id, row.assignment_date)].append(row.doctor_id)
+
+            rank = {doc.id: i for i, doc in enumerate(doctors_list)}
+            doctors_by_id = {doc.id: doc for doc in doctors_list}
+            for key, doc_ids in grid.items():
+                doc_ids.sort(key=rank.__getitem__)
+                grid[key] = [doctors_by_id[doc_id] for doc_id in doc_ids]
+
+        # 4. Vi phạm đã lưu cùng Job -> đánh dấu ô (thiếu người) và bác sĩ vi phạm trong ô
+        doctor_flags = defaultdict(list)
+        cell_flags = defaultdict(list)
+        for v in ReportService.decode_violations(job):
+            if not v["shift_id"] or not start <= v["date"] <= end or (clinic_id and v["clinic_id"] != clinic_id):
+                continue
+            label = VIOLATION_LABELS[v["kind"]]
+            if v["doctor_id"]:
+                doctor_flags[(v["shift_id"], v["date"], v["doctor_id"])].append(label)
+            else:
+                cell_flags[(v["shift_id"], v["date"])].append(f"{label} ({v['cost']})")
+
+        return {
+            "date_range": date_range,
+            "doctor_flags": dict(doctor_flags),
+            "cell_flags": dict(cell_flags),
+            "doctors_list": doctors_list,
+            "shift_rows": self.list_shift_rows(),
+            "grid": dict(grid),
+            "badge_count": sum(len(cell) for cell in grid.values()),
+            "page": page,
+            "total_pages": total_pages,
+            "total_doctors": total_doctors,
+        }
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import datetime
+import json
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, and_, or_
+from app.models import SchedulingJob, Assignment
+from app.models.scheduling_job import JobStatus
+
+
+class DashboardService:
+    """
+    Danh sách Job cho Bảng điều khiển: phân trang KEYSET trên (created_at, id) và lọc trạng thái.
+    Mỗi trang là 1 truy vấn gộp (GROUP BY) chỉ lấy các cột hiển thị + số assignments,
+    nên chi phí không tăng theo số Job lịch sử.
+    """
+    JOBS_PER_PAGE = 20
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    @staticmethod
+    def encode_cursor(row) -> str:
+        return f"{row.created_at.isoformat()}~{row.id}"
+
+    @staticmethod
+    def decode_cursor(cursor: str | None):
+        """'<created_at ISO>~<id>' -> (datetime, id); chuỗi sai định dạng -> None."""
+        if not cursor:
+            return None
+        try:
+            created_at, job_id = cursor.rsplit('~', 1)
+            return datetime.datetime.fromisoformat(created_at), int(job_id)
+        except ValueError:
+            return None
+
+    def list_jobs(self, status: JobStatus | None = None, after: str | None = None,
+                  before: str | None = None) -> dict:
+        """
+        after : trang CŨ HƠN, bắt đầu sau con trỏ (mặc định: trang mới nhất)
+        before: trang MỚI HƠN, kết thúc trước con trỏ
+        """
+        conditions = []
+        if status:
+            conditions.append(SchedulingJob.status == status)
+
+        newer = self.decode_cursor(before)
+        older = self.decode_cursor(after) if not newer else None
+        if newer:
+            created_at, job_id = newer
+            conditions.append(or_(SchedulingJob.created_at > created_at,
+                                  and_(SchedulingJob.created_at == created_at, SchedulingJob.id > job_id)))
+            order = (SchedulingJob.created_at.asc(), SchedulingJob.id.asc())
+        else:
+            if older:
+                created_at, job_id = older
+                conditions.append(or_(SchedulingJob.created_at < created_at,
+                                      and_(SchedulingJob.created_at == created_at, SchedulingJob.id < job_id)))
+            order = (SchedulingJob.created_at.desc(), SchedulingJob.id.desc())
+
+        # Lấy dư 1 dòng để biết còn trang tiếp theo theo chiều đang đi
+        page_jobs = (
+            select(SchedulingJob.id)
+            .where(*conditions)
+            .order_by(*order)
+            .limit(self.JOBS_PER_PAGE + 1)
+            .subquery()
+        )
+        stmt = (
+            select(
+                SchedulingJob.id, SchedulingJob.name, SchedulingJob.start_date, SchedulingJob.end_date,
+                SchedulingJob.status, SchedulingJob.status_message, SchedulingJob.created_at,
+                SchedulingJob.final_hard_cost, SchedulingJob.final_soft_cost, SchedulingJob.violation_counts,
+                func.count(Assignment.id).label('assignment_count'),
+            )
+            .join(page_jobs, page_jobs.c.id == SchedulingJob.id)
+            .outerjoin(Assignment, Assignment.job_id == SchedulingJob.id)
+            .group_by(
+                SchedulingJob.id, SchedulingJob.name, SchedulingJob.start_date, SchedulingJob.end_date,
+                SchedulingJob.status, SchedulingJob.status_message, SchedulingJob.created_at,
+                SchedulingJob.final_hard_cost, SchedulingJob.final_soft_cost, SchedulingJob.violation_counts,
+            )
+            .order_by(*order)
+        )
+        rows = self.db.execute(stmt).all()
+
+        has_more = len(rows) > self.JOBS_PER_PAGE
+        rows = rows[:self.JOBS_PER_PAGE]
+        if newer:
+            rows.reverse()
+            has_newer, has_older = has_more, True
+        else:
+            has_newer, has_older = older is not None, has_more
+
+        return {
+            "jobs": rows,
+            "violation_counts": {row.id: json.loads(row.violation_counts)
+                                 for row in rows if row.violation_counts},
+            "newer_cursor": self.encode_cursor(rows[0]) if rows and has_newer else None,
+            "older_cursor": self.encode_cursor(rows[-1]) if rows and has_older else None,
+        }
@@ -0,0 +1,148 @@
+from __future__ import annotations
+from collections import Counter, defaultdict
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from app.models import Doctor, Clinic, Shift, Assignment, SchedulingJob
+
+STREAM_BATCH = 2000
+# Số thay đổi tối đa hiển thị trên 1 trang so sánh (luôn trọn ngày)
+DIFF_PAGE_CHANGES = 500
+
+
+class ScheduleDiffService:
+    """
+    So sánh assignments của 2 Job (A = cũ, B = mới).
+
+    Mỗi Job được đọc thành luồng bộ số nguyên (ngày, khoa, ca, bác sĩ) ĐÃ SẮP XẾP theo index
+    ix_assignments_job_slot_doctor rồi trộn (merge-join) như hợp nhất 2 danh sách đã sắp xếp:
+    bộ nhớ chỉ giữ các thay đổi của NGÀY đang xét, không phụ thuộc độ dài kỳ.
+        - removed: có ở A, không có ở B
+        - added  : có ở B, không có ở A
+        - moved  : cùng bác sĩ, cùng ngày, bị bỏ khỏi 1 ca và thêm vào ca khác (gộp 1 removed + 1 added)
+    diff() phân trang theo ngày: chỉ giữ chi tiết của 1 trang, phần còn lại chỉ cộng vào bộ đếm.
+    """
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def _stream(self, job_id: int):
+        stmt = (
+            select(Assignment.assignment_date, Assignment.clinic_id, Assignment.shift_id, Assignment.doctor_id)
+            .where(Assignment.job_id == job_id)
+            .order_by(Assignment.assignment_date, Assignment.clinic_id, Assignment.shift_id, Assignment.doctor_id)
+        )
+        # Mỗi luồng 1 kết nối riêng: MSSQL không cho 2 con trỏ cùng mở trên 1 kết nối (khi không bật MARS)
+        with self.db.get_bind().connect() as conn:
+            for row in conn.execution_options(yield_per=STREAM_BATCH).execute(stmt):
+                yield tuple(row)
+
+    @staticmethod
+    def _merge(stream_a, stream_b):
+        """Trộn 2 luồng đã sắp xếp -> ('removed' | 'added', bộ) cho từng dòng khác nhau."""
+        a = next(stream_a, None)
+        b = next(stream_b, None)
+        while a is not None or b is not None:
+            if b is None or (a is not None and a < b):
+                yield 'removed', a
+                a = next(stream_a, None)
+            elif a is None or b < a:
+                yield 'added', b
+                b = next(stream_b, None)
+            else:
+                a = next(stream_a, None)
+                b = next(stream_b, None)
+
+    @staticmethod
+    def _pair_moves(date, removed: list, added: list) -> list:
+        """Ghép removed/added của cùng bác sĩ trong 1 ngày thành 'moved'."""
+        added_by_doc = defaultdict(list)
+        for row in added:
+            added_by_doc[row[3]].append(row)
+        changes = []
+        for row in removed:
+            targets = added_by_doc.get(row[3])
+            if targets:
+                changes.append({"kind": "moved", "date": date, "doctor_id": row[3],
+                                "from": (row[1], row[2]), "to": targets.pop(0)[1:3]})
+            else:
+                changes.append({"kind": "removed", "date": date, "doctor_id": row[3], "from": (row[1], row[2])})
+        for rows in added_by_doc.values():
+            for row in rows:
+                changes.append({"kind": "added", "date": date, "doctor_id": row[3], "to": (row[1], row[2])})
+        return changes
+
+    def iter_days(self, job_a_id: int, job_b_id: int):
+        """(ngày, [thay đổi]) theo thứ tự ngày - chỉ các ngày có thay đổi."""
+        current = None
+        removed, added = [], []
+        for kind, row in self._merge(self._stream(job_a_id), self._stream(job_b_id)):
+            if row[0] != current:
+                if current is not None:
+                    yield current, self._pair_moves(current, removed, added)
+                current, removed, added = row[0], [], []
+            (removed if kind == 'removed' else added).append(row)
+        if current is not None:
+            yield current, self._pair_moves(current, removed, added)
+
+    def diff(self, job_a: SchedulingJob, job_b: SchedulingJob, date_from=None,
+             page_changes: int = DIFF_PAGE_CHANGES) -> dict:
+        """
+        1 lượt trộn toàn kỳ: tổng số + biến động theo bác sĩ tính trên MỌI ngày, còn chi tiết chỉ giữ
+        các ngày từ `date_from` cho tới khi đủ `page_changes` thay đổi (trọn ngày).
+        Bộ nhớ ~ số bác sĩ + 1 trang, không phụ thuộc tổng số thay đổi.
+        `next_from`: ngày có thay đổi đầu tiên của trang sau (None = trang cuối).
+        """
+        doctors = {row.id: row for row in self.db.execute(select(Doctor.id, Doctor.name, Doctor.role))}
+        clinics = dict(self.db.execute(select(Clinic.id, Clinic.name)).all())
+        shifts = dict(self.db.execute(select(Shift.id, Shift.name)).all())
+
+        def slot_label(slot):
+            clinic_id, shift_id = slot
+            return f"{shifts.get(shift_id, shift_id)} - {clinics.get(clinic_id, clinic_id)}"
+
+        totals = Counter()
+        churn = defaultdict(Counter)
+        days = []
+        page_size = 0
+        next_from = None
+        for date, changes in self.iter_days(job_a.id, job_b.id):
+            for change in changes:
+                totals[change["kind"]] += 1
+                churn[change["doctor_id"]][change["kind"]] += 1
+            if (date_from and date < date_from) or next_from is not None:
+                continue
+            if days and page_size + len(changes) > page_changes:
+                next_from = date
+                continue
+            for change in changes:
+                doc = doctors.get(change["doctor_id"])
+                change["doctor_name"] = doc.name if doc else f"ID:{change['doctor_id']}"
+                if "from" in change:
+                    change["from_label"] = slot_label(change["from"])
+                if "to" in change:
+                    change["to_label"] = slot_label(change["to"])
+            changes.sort(key=lambda c: (c["doctor_name"], c["kind"]))
+            days.append({"date": date, "changes": changes})
+            page_size += len(changes)
+
+        churn_rows = []
+        for doc_id, counts in churn.items():
+            doc = doctors.get(doc_id)
+            churn_rows.append({
+                "doctor_id": doc_id,
+                "doctor_name": doc.name if doc else f"ID:{doc_id}",
+                "role": doc.role if doc else None,
+                "added": counts["added"],
+                "removed": counts["removed"],
+                "moved": counts["moved"],
+                "total": counts["added"] + counts["removed"] + counts["moved"],
+            })
+        churn_rows.sort(key=lambda r: (-r["total"], r["doctor_name"]))
+
+        return {
+            "days": days,
+            "date_from": date_from,
+            "next_from": next_from,
+            "churn": churn_rows,
+            "totals": {kind: totals[kind] for kind in ("added", "removed", "moved")},
+        }
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import csv
+import datetime
+import io
+import json
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from app.models import Doctor, Clinic, Shift, Assignment
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'ics': 'text/calendar; charset=utf-8',
+}
+
+CSV_COLUMNS = [
+    'date', 'doctor_id', 'doctor_name', 'role', 'clinic_id', 'clinic_name',
+    'shift_id', 'shift_name', 'start', 'end',
+]
+
+
+class ExportService:
+    """
+    Xuất assignments của một Job dưới dạng luồng (generator) CSV / NDJSON / iCalendar.
+
+    Dữ liệu được đọc bằng server-side cursor (`yield_per`) và đẩy ra theo từng lô
+    CHUNK_ROWS dòng, nên bộ nhớ không tăng theo kích thước lịch.
+    """
+    CHUNK_ROWS = 1000
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def _iter_chunks(self, job_id: int, clinic_id: int | None = None, doctor_id: int | None = None,
+                     date_from: datetime.date | None = None, date_to: datetime.date | None = None):
+        filters = [Assignment.job_id == job_id]
+        if clinic_id:
+            filters.append(Assignment.clinic_id == clinic_id)
+        if doctor_id:
+            filters.append(Assignment.doctor_id == doctor_id)
+        if date_from:
+            filters.append(Assignment.assignment_date >= date_from)
+        if date_to:
+            filters.append(Assignment.assignment_date <= date_to)
+
+        stmt = (
+            select(
+                Assignment.assignment_date,
+                Assignment.doctor_id,
+                Doctor.name.label('doctor_name'),
+                Doctor.role,
+                Assignment.clinic_id,
+                Clinic.name.label('clinic_name'),
+                Assignment.shift_id,
+                Shift.name.label('shift_name'),
+                Shift.start_time,
+                Shift.end_time,
+            )
+            .join(Doctor, Assignment.doctor_id == Doctor.id)
+            .join(Clinic, Assignment.clinic_id == Clinic.id)
+            .join(Shift, Assignment.shift_id == Shift.id)
+            .where(*filters)
+            .order_by(Assignment.assignment_date, Shift.start_time, Clinic.name, Doctor.name)
+            .execution_options(yield_per=self.CHUNK_ROWS)
+        )
+        yield from self.db.execute(stmt).partitions()
+
+    @staticmethod
+    def _shift_bounds(row):
+        """(bắt đầu, kết thúc) dạng datetime; ca qua đêm kết thúc vào ngày hôm sau."""
+        start = datetime.datetime.combine(row.assignment_date, row.start_time)
+        end = datetime.datetime.combine(row.assignment_date, row.end_time)
+        if end <= start:
+            end += datetime.timedelta(days=1)
+        return start, end
+
+    def _record(self, row) -> list:
+        start, end = self._shift_bounds(row)
+        return [
+            row.assignment_date.isoformat(), row.doctor_id, row.doctor_name, row.role.value,
+            row.clinic_id, row.clinic_name, row.shift_id, row.shift_name,
+            start.isoformat(timespec='minutes'), end.isoformat(timespec='minutes'),
+        ]
+
+    # --- CSV ---
+    def iter_csv(self, job_id: int, **filters):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM để Excel đọc đúng tiếng Việt
+        buffer.write('\ufeff')
+        writer.writerow(CSV_COLUMNS)
+        for chunk in self._iter_chunks(job_id, **filters):
+            for row in chunk:
+                writer.writerow(self._record(row))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    # --- NDJSON ---
+    def iter_ndjson(self, job_id: int, **filters):
+        for chunk in self._iter_chunks(job_id, **filters):
+            yield ''.join(
+                json.dumps(dict(zip(CSV_COLUMNS, self._record(row))), ensure_ascii=False) + '\n'
+                for row in chunk
+            )
+
+    # --- iCalendar (.ics) cho 1 bác sĩ ---
+    def iter_ics(self, job_id: int, doctor_id: int, **filters):
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        yield _ics_lines([
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//HospitalScheduler//Lich truc//VI',
+            'CALSCALE:GREGORIAN',
+        ])
+        for chunk in self._iter_chunks(job_id, doctor_id=doctor_id, **filters):
+            lines = []
+            for row in chunk:
+                start, end = self._shift_bounds(row)
+                lines += [
+                    'BEGIN:VEVENT',
+                    f'UID:job{job_id}-{row.assignment_date:%Y%m%d}-c{row.clinic_id}-s{row.shift_id}-d{row.doctor_id}@hospital-scheduler',
+                    f'DTSTAMP:{stamp}',
+                    f'DTSTART:{start:%Y%m%dT%H%M%S}',
+                    f'DTEND:{end:%Y%m%dT%H%M%S}',
+                    f'SUMMARY:{_ics_escape(row.shift_name)} - {_ics_escape(row.clinic_name)}',
+                    f'LOCATION:{_ics_escape(row.clinic_name)}',
+                    'END:VEVENT',
+                ]
+            yield _ics_lines(lines)
+        yield _ics_lines(['END:VCALENDAR'])
+
+
+def _ics_escape(text: str) -> str:
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_lines(lines: list) -> str:
+    """Nối các dòng theo RFC 5545: kết thúc CRLF, gập dòng dài quá 75 octet."""
+    out = []
+    for line in lines:
+        encoded = line.encode('utf-8')
+        while len(encoded) > 75:
+            cut = 75
+            # Không cắt giữa một ký tự UTF-8 nhiều byte
+            while cut > 0 and (encoded[cut] & 0xC0) == 0x80:
+                cut -= 1
+            out.append(encoded[:cut].decode('utf-8'))
+            encoded = b' ' + encoded[cut:]
+        out.append(encoded.decode('utf-8'))
+    return '\r\n'.join(out) + '\r\n'
@@ -0,0 +1,194 @@
+from __future__ import annotations
+import csv
+import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert
+from app.models import Doctor, Clinic, Shift, LeaveRequest, SchedulePreference, DoctorRole
+
+# Cột bắt buộc của từng loại file CSV
+IMPORT_KINDS = {
+    'doctors': ('name', 'specialty', 'role'),            # + clinic_id HOẶC clinic_name (không bắt buộc)
+    'leave_requests': ('doctor_id', 'date'),             # + reason, status (không bắt buộc)
+    'preferences': ('doctor_id', 'shift_id', 'day_of_week', 'preference_score'),
+}
+
+_ROLE_ALIASES = {
+    'main': DoctorRole.MAIN, 'chính': DoctorRole.MAIN, 'chinh': DoctorRole.MAIN,
+    'sub': DoctorRole.SUB, 'phụ': DoctorRole.SUB, 'phu': DoctorRole.SUB,
+}
+
+
+class ImportReport:
+    """Kết quả nhập 1 file: số dòng đã ghi + lỗi theo từng dòng (không dừng cả file)."""
+    MAX_ERRORS = 200
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.total_rows = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []  # [(số dòng trong file, thông báo)] - tối đa MAX_ERRORS
+
+    def add_error(self, line_no: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((line_no, message))
+
+    def __repr__(self):
+        return f"<ImportReport({self.kind}: {self.inserted}/{self.total_rows} dòng, {self.error_count} lỗi)>"
+
+
+def bulk_insert_rows(session: Session, model, rows: list, batch_size: int = 1000) -> int:
+    """INSERT nhiều dòng theo lô (executemany), commit sau mỗi lô. Trả về số dòng đã ghi."""
+    for i in range(0, len(rows), batch_size):
+        session.execute(insert(model), rows[i:i + batch_size])
+        session.commit()
+    return len(rows)
+
+
+class BulkImportService:
+    """
+    Nhập hàng loạt Bác sĩ / Đơn nghỉ / Nguyện vọng từ CSV.
+        - Đọc file dạng luồng (csv.DictReader), không nạp cả file vào bộ nhớ.
+        - Khóa ngoại được kiểm tra với tập id nạp sẵn 1 lần (không truy vấn theo từng dòng).
+        - Ghi theo lô BATCH_SIZE dòng bằng executemany, mỗi lô 1 giao dịch.
+        - Dòng lỗi được ghi vào báo cáo, các dòng hợp lệ vẫn được nhập.
+    """
+    BATCH_SIZE = 1000
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def import_csv(self, kind: str, text_stream) -> ImportReport:
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Loại dữ liệu không hỗ trợ: {kind}")
+
+        report = ImportReport(kind)
+        reader = csv.DictReader(text_stream)
+        missing = [col for col in IMPORT_KINDS[kind] if col not in (reader.fieldnames or [])]
+        if missing:
+            report.add_error(1, f"Thiếu cột bắt buộc: {', '.join(missing)}")
+            return report
+
+        model, parse_row = {
+            'doctors': (Doctor, self._doctor_parser()),
+            'leave_requests': (LeaveRequest, self._leave_parser()),
+            'preferences': (SchedulePreference, self._preference_parser()),
+        }[kind]
+
+        batch = []  # [(số dòng, dict)]
+        for line_no, raw in enumerate(reader, start=2):  # dòng 1 là header
+            report.total_rows += 1
+            try:
+                batch.append((line_no, parse_row(raw)))
+            except ValueError as e:
+                report.add_error(line_no, str(e))
+                continue
+            if len(batch) >= self.BATCH_SIZE:
+                self._flush(model, batch, report)
+                batch = []
+        if batch:
+            self._flush(model, batch, report)
+        return report
+
+    def _flush(self, model, batch: list, report: ImportReport):
+        try:
+            self.db.execute(insert(model), [row for _, row in batch])
+            self.db.commit()
+            report.inserted += len(batch)
+        except Exception:
+            # Lô lỗi ở CSDL (hiếm, vì khóa ngoại đã được kiểm tra) -> ghi từng dòng để tìm dòng hỏng
+            self.db.rollback()
+            for line_no, row in batch:
+                try:
+                    self.db.execute(insert(model), [row])
+                    self.db.commit()
+                    report.inserted += 1
+                except Exception as e:
+                    self.db.rollback()
+                    report.add_error(line_no, f"Lỗi CSDL: {str(e).splitlines()[0][:200]}")
+
+    # --- Bộ phân tích từng loại dòng (nạp sẵn tập id để kiểm tra khóa ngoại) ---
+    def _doctor_parser(self):
+        clinic_ids = set(self.db.scalars(select(Clinic.id)))
+        clinic_by_name = {name.strip().lower(): cid for cid, name in self.db.execute(select(Clinic.id, Clinic.name))}
+
+        def parse(raw: dict) -> dict:
+            name = (raw.get('name') or '').strip()
+            if not name:
+                raise ValueError("Tên bác sĩ trống")
+            role = _ROLE_ALIASES.get((raw.get('role') or '').strip().lower())
+            if role is None:
+                raise ValueError(f"Vai trò không hợp lệ: {raw.get('role')!r} (MAIN/SUB hoặc Chính/Phụ)")
+
+            clinic_id = None
+            if (raw.get('clinic_id') or '').strip():
+                clinic_id = _parse_int(raw, 'clinic_id')
+                if clinic_id not in clinic_ids:
+                    raise ValueError(f"Không tồn tại khoa id={clinic_id}")
+            elif (raw.get('clinic_name') or '').strip():
+                clinic_id = clinic_by_name.get(raw['clinic_name'].strip().lower())
+                if clinic_id is None:
+                    raise ValueError(f"Không tồn tại khoa '{raw['clinic_name']}'")
+
+            return {
+                "name": name,
+                "specialty": (raw.get('specialty') or '').strip(),
+                "role": role,
+                "clinic_id": clinic_id,
+                "total_shifts_worked": 0,
+            }
+        return parse
+
+    def _leave_parser(self):
+        doctor_ids = set(self.db.scalars(select(Doctor.id)))
+        seen = set()
+
+        def parse(raw: dict) -> dict:
+            doctor_id = _parse_int(raw, 'doctor_id')
+            if doctor_id not in doctor_ids:
+                raise ValueError(f"Không tồn tại bác sĩ id={doctor_id}")
+            try:
+                leave_date = datetime.date.fromisoformat((raw.get('date') or '').strip())
+            except ValueError:
+                raise ValueError(f"Ngày không hợp lệ: {raw.get('date')!r} (YYYY-MM-DD)")
+            if (doctor_id, leave_date) in seen:
+                raise ValueError(f"Trùng đơn nghỉ trong file: bác sĩ {doctor_id} ngày {leave_date}")
+            seen.add((doctor_id, leave_date))
+            return {
+                "doctor_id": doctor_id,
+                "date": leave_date,
+                "reason": (raw.get('reason') or '').strip() or None,
+                "status": (raw.get('status') or '').strip() or "Approved",
+            }
+        return parse
+
+    def _preference_parser(self):
+        doctor_ids = set(self.db.scalars(select(Doctor.id)))
+        shift_ids = set(self.db.scalars(select(Shift.id)))
+
+        def parse(raw: dict) -> dict:
+            doctor_id = _parse_int(raw, 'doctor_id')
+            if doctor_id not in doctor_ids:
+                raise ValueError(f"Không tồn tại bác sĩ id={doctor_id}")
+            shift_id = _parse_int(raw, 'shift_id')
+            if shift_id not in shift_ids:
+                raise ValueError(f"Không tồn tại ca trực id={shift_id}")
+            day = _parse_int(raw, 'day_of_week')
+            if not 0 <= day <= 6:
+                raise ValueError(f"day_of_week phải từ 0 (Thứ 2) đến 6 (CN), nhận {day}")
+            return {
+                "doctor_id": doctor_id,
+                "shift_id": shift_id,
+                "day_of_week": day,
+                "preference_score": _parse_int(raw, 'preference_score'),
+            }
+        return parse
+
+
+def _parse_int(raw: dict, column: str) -> int:
+    value = (raw.get(column) or '').strip()
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Cột {column} phải là số nguyên, nhận {value!r}")
@@ -0,0 +1,180 @@
+import math
+import random
+import time
+from .solver_service import ScheduleState, CostFunction, IncrementalCost
+
+# =================================================================
+# BỘ GIẢI 2 PHA THEO THỨ TỰ TỪ ĐIỂN (hard trước, soft sau)
+# =================================================================
+# Không dùng W_HARD / W_SOFT: năng lượng là cặp (hard, soft) so sánh theo thứ tự từ điển,
+# nên không cần chỉnh tay trọng số để chi phí mềm không bao giờ "lấn" 1 vi phạm cứng.
+#   - Pha 1 (khả thi)  : chỉ tính phần cứng (evaluate_hard - bỏ nguyện vọng, công bằng),
+#                        Metropolis trên hard, dừng khi hard == 0 hoặc hết ngân sách pha 1
+#   - Pha 2 (tối ưu mềm): chỉ nhận bước KHÔNG làm tăng hard (giữ khả thi nếu đã đạt),
+#                        hard giảm -> luôn nhận; hard bằng -> Metropolis trên soft
+# Nhiệt độ giảm theo hàm mũ như simanneal, nhưng tính theo đơn vị của từng pha.
+# Chi phí mỗi bước là DELTA (IncrementalCost), không đánh giá lại cả lịch.
+
+class LexicographicAnnealer:
+    def __init__(self, initial_state: ScheduleState, cost_function: CostFunction):
+        self.state = initial_state
+        self.cost_function = cost_function
+
+        self.steps = 50000
+        # Pha 1 dùng tối đa tỉ lệ này của tổng số bước; phần còn lại (và mọi bước thừa) cho pha 2
+        self.feasibility_fraction = 0.7
+        # Nhiệt độ theo đơn vị vi phạm cứng (pha 1) và điểm phạt mềm (pha 2)
+        self.hard_Tmax = 2.5
+        self.hard_Tmin = 0.01
+        self.soft_Tmax = 10.0
+        self.soft_Tmin = 0.1
+        self.updates = 10
+
+        self.phase1_steps = 0
+        # Số giây từ lúc bắt đầu tới khi chi phí cứng ĐANG GIỮ đầu tiên về 0 (None: chưa khả thi)
+        self.time_to_feasible = None
+        self.best_state = None
+        self.best_energy = None
+
+    # --- Bước đi: thay 1 bác sĩ trong 1 ca bằng người cùng khoa, cùng vai trò ---
+    def _prepare_moves(self):
+        ctx = self.cost_function.ctx
+        self._dates = list(ctx.date_range)
+        self._clinic_ids = list(ctx.clinics_map.keys())
+
+    def move(self):
+        """
+        Thực hiện 1 bước; trả về (danh sách bác sĩ của ca, vị trí, người cũ, người mới, ngày, khoa, ca)
+        để tính delta / hoàn tác, hoặc None.
+        """
+        ctx = self.cost_function.ctx
+        if not self._dates or not self._clinic_ids:
+            return None
+        date = random.choice(self._dates)
+        clinic_id = random.choice(self._clinic_ids)
+
+        clinic_shifts = self.state.assignments[date].get(clinic_id)
+        if not clinic_shifts:
+            return None
+        shift_id = random.choice(list(clinic_shifts.keys()))
+        current_docs = clinic_shifts[shift_id]
+        if not current_docs:
+            return None
+
+        i = random.randrange(len(current_docs))
+        doc_out_id = current_docs[i]
+        role_key = ctx.doctor_role_key.get(doc_out_id)
+        if not role_key:
+            return None
+        candidates = ctx.doctors_by_clinic[clinic_id][role_key]
+        if not candidates:
+            return None
+        doc_in_id = random.choice(candidates)
+        if doc_in_id in current_docs:
+            return None
+
+        current_docs[i] = doc_in_id
+        return current_docs, i, doc_out_id, doc_in_id, date, clinic_id, shift_id
+
+    @staticmethod
+    def undo(change):
+        docs, i, doc_out_id = change[:3]
+        docs[i] = doc_out_id
+
+    @staticmethod
+    def _swap(change):
+        """(ngày, khoa, ca, người cũ, người mới) của 1 bước."""
+        return change[4], change[5], change[6], change[2], change[3]
+
+    # --- Vòng lặp chính ---
+    def anneal(self):
+        """Trả về (state tốt nhất, (hard, soft) tốt nhất)."""
+        self._prepare_moves()
+        self.start = time.time()
+        cost = self.cost_function
+
+        # PHA 1: tìm lời giải khả thi
+        budget = int(self.steps * self.feasibility_fraction)
+        incremental = IncrementalCost(cost, self.state, hard_only=True)
+        hard = incremental.hard
+        self._track_feasible(hard)
+        best_hard, best = hard, self.state.copy()
+        step = 0
+        if hard > 0 and budget > 0:
+            t_factor = -math.log(self.hard_Tmax / self.hard_Tmin)
+            while step < budget and hard > 0:
+                T = self.hard_Tmax * math.exp(t_factor * step / budget)
+                step += 1
+                change = self.move()
+                if change is None:
+                    continue
+                swap = self._swap(change)
+                delta = incremental.swap_delta(*swap)
+                dE = delta[0]
+                if dE <= 0 or math.exp(-dE / T) > random.random():
+                    incremental.apply_swap(*swap, delta)
+                    hard = incremental.hard
+                    self._track_feasible(hard)
+                    if hard < best_hard:
+                        best_hard, best = hard, self.state.copy()
+                else:
+                    self.undo(change)
+                self._report(step, T, 1, (hard, None), (best_hard, None))
+        self.phase1_steps = step
+
+        # PHA 2: tối ưu mềm, không bao giờ làm tăng hard (bắt đầu từ lời giải cứng tốt nhất)
+        self.state = best
+        incremental = IncrementalCost(cost, self.state)
+        energy = incremental.energy
+        best_energy, best = energy, self.state.copy()
+        remaining = self.steps - step
+        if remaining > 0:
+            t_factor = -math.log(self.soft_Tmax / self.soft_Tmin)
+            for k in range(remaining):
+                T = self.soft_Tmax * math.exp(t_factor * k / remaining)
+                step += 1
+                change = self.move()
+                if change is None:
+                    continue
+                swap = self._swap(change)
+                delta = incremental.swap_delta(*swap)
+                if delta[0] < 0:
+                    accept = True
+                elif delta[0] > 0:
+                    accept = False
+                else:
+                    accept = delta[1] <= 0 or math.exp(-delta[1] / T) > random.random()
+                if accept:
+                    incremental.apply_swap(*swap, delta)
+                    energy = incremental.energy
+                    self._track_feasible(energy[0])
+                    if energy < best_energy:
+                        best_energy, best = energy, self.state.copy()
+                else:
+                    self.undo(change)
+                self._report(step, T, 2, energy, best_energy)
+
+        self.state = best
+        self.best_state, self.best_energy = best, best_energy
+        return best, best_energy
+
+    def _track_feasible(self, hard):
+        if hard <= 0 and self.time_to_feasible is None:
+            self.time_to_feasible = time.time() - self.start
+
+    def _report(self, step, T, phase, energy, best_energy):
+        if not self.updates or step % max(1, self.steps // self.updates):
+            return
+        elapsed = time.time() - self.start
+        # current_stats của lần đánh giá gần nhất có thể là của bước vừa bị từ chối (đã hoàn tác):
+        # đánh giá lại state đang giữ (chỉ ~`updates` lần mỗi lượt giải) để số liệu khớp `energy`
+        self.cost_function.evaluate(self.state, hard_only=phase == 1)
+        stats = self.cost_function.current_stats
+        soft = '-' if energy[1] is None else f"{energy[1]:.1f}"
+        best_soft = '-' if best_energy[1] is None else f"{best_energy[1]:.1f}"
+        print("-" * 100)
+        print(f" PHA {phase} | BƯỚC: {step:6d} / {self.steps}  |  Nhiệt độ (T): {T:8.3f}  |  Thời gian: {elapsed:.1f}s")
+        print(f"   ➤ Hiện tại: cứng {energy[0]:.1f} / mềm {soft}  |  Tốt nhất: cứng {best_energy[0]:.1f} / mềm {best_soft}")
+        print(f"   ➤ [CỨNG] Thiếu người: {stats['missing_staff']:3d}  |  Quá 48h: {stats['over_48h']:3d}  |  "
+              f"Nghỉ ít/Trùng: {stats['bad_rest']:3d}  |  [MỀM] Nguyện vọng: {stats['preference_bad']:3d}")
+        print("-" * 100)
@@ -0,0 +1,111 @@
+"""
+Đo hiệu năng (profiling) TÙY CHỌN cho một lần chạy solver.
+
+Bật theo từng Job (cột `SchedulingJob.profile_mode`) hoặc cho mọi Job bằng biến môi trường
+`SCHEDULER_PROFILE`:
+    - 'phases'  : thời gian thực (wall) + CPU của từng giai đoạn, và thời gian LẤY MẪU
+                  của từng thành phần hàm mục tiêu (giai đoạn 1: quét ca / giai đoạn 2: luật lao động)
+    - 'cprofile': như 'phases' + chụp cProfile của cả lần chạy (top hàm theo cumtime)
+Kết quả (dict JSON) được ghi vào `SchedulingJob.profile_data` để so sánh giữa các lần chạy.
+Khi tắt, mọi hook chỉ tốn 1 phép kiểm tra thuộc tính.
+"""
+from __future__ import annotations
+import contextlib
+import io
+import os
+import time
+
+PROFILE_MODES = ('phases', 'cprofile')
+
+# Hàm mục tiêu được gọi hàng chục nghìn lần -> chỉ bấm giờ 1/N lần đánh giá
+DEFAULT_SAMPLE_EVERY = 100
+PSTATS_TOP = 40
+
+
+def resolve_profile_mode(job_mode: str | None) -> str | None:
+    """Chế độ của Job được ưu tiên; nếu không có thì lấy từ SCHEDULER_PROFILE."""
+    mode = (job_mode or os.environ.get('SCHEDULER_PROFILE') or '').strip().lower()
+    if mode in ('1', 'true', 'yes', 'on'):
+        mode = 'phases'
+    return mode if mode in PROFILE_MODES else None
+
+
+class PhaseProfiler:
+    def __init__(self, mode: str = 'phases', sample_every: int = DEFAULT_SAMPLE_EVERY):
+        self.mode = mode
+        self.sample_every = max(1, sample_every)
+        self.phases = {}
+        self.components = {}
+        self.meta = {}
+        self._counter = 0
+        self._cprofile = None
+        self._pstats_text = None
+
+    # --- Giai đoạn (phase) ---
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+            entry["wall_s"] += time.perf_counter() - wall0
+            entry["cpu_s"] += time.process_time() - cpu0
+            entry["calls"] += 1
+
+    # --- Thành phần hàm mục tiêu (lấy mẫu) ---
+    def should_sample(self) -> bool:
+        self._counter += 1
+        return self._counter % self.sample_every == 0
+
+    def record_component(self, name: str, seconds: float):
+        entry = self.components.setdefault(name, {"samples": 0, "total_s": 0.0, "max_s": 0.0})
+        entry["samples"] += 1
+        entry["total_s"] += seconds
+        entry["max_s"] = max(entry["max_s"], seconds)
+
+    # --- cProfile ---
+    def start_cprofile(self):
+        if self.mode != 'cprofile':
+            return
+        import cProfile
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def stop_cprofile(self, label: str = 'job'):
+        if self._cprofile is None:
+            return
+        import pstats
+        self._cprofile.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(self._cprofile, stream=out)
+        stats.sort_stats('cumulative').print_stats(PSTATS_TOP)
+        self._pstats_text = out.getvalue()
+
+        dump_dir = os.environ.get('SCHEDULER_PROFILE_DIR')
+        if dump_dir:
+            os.makedirs(dump_dir, exist_ok=True)
+            stats.dump_stats(os.path.join(dump_dir, f"{label}-{int(time.time())}.pstats"))
+        self._cprofile = None
+
+    def to_dict(self) -> dict:
+        components = {}
+        for name, entry in self.components.items():
+            components[name] = {
+                "samples": entry["samples"],
+                "avg_ms": round(entry["total_s"] / entry["samples"] * 1000, 3),
+                "max_ms": round(entry["max_s"] * 1000, 3),
+            }
+        data = {
+            "mode": self.mode,
+            "sample_every": self.sample_every,
+            "phases": {
+                name: {"wall_s": round(e["wall_s"], 4), "cpu_s": round(e["cpu_s"], 4), "calls": e["calls"]}
+                for name, e in self.phases.items()
+            },
+            "cost_components": components,
+            "meta": self.meta,
+        }
+        if self._pstats_text:
+            data["pstats"] = self._pstats_text
+        return data
@@ -0,0 +1,131 @@
+import datetime
+import json
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy import select, func
+from app.models import Doctor, Clinic, Shift, SchedulingJob, JobDoctorSummary, JobSlotSummary
+
+VIOLATION_LABELS = {
+    'understaffed': 'Thiếu người',
+    'leave': 'Trùng đơn nghỉ',
+    'rest': 'Nghỉ < 12h',
+    'same_day': 'Trùng ca trong ngày',
+    'over_48h': 'Quá 48h/tuần',
+    'preference': 'Trái nguyện vọng',
+}
+
+
+class ReportService:
+    """
+    Đọc các bảng tổng hợp đã được tính sẵn lúc lưu kết quả Job.
+    Chi phí mỗi truy vấn tỉ lệ với số dòng hiển thị, không phải với số assignments.
+    """
+
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def doctor_totals(self, job_id: int):
+        """Tổng số ca / giờ / ca đêm / nguyện vọng / vi phạm của từng bác sĩ."""
+        stmt = (
+            select(
+                JobDoctorSummary.doctor_id,
+                Doctor.name.label('doctor_name'),
+                Doctor.role,
+                JobDoctorSummary.shift_count,
+                JobDoctorSummary.total_hours,
+                JobDoctorSummary.night_shifts,
+                JobDoctorSummary.preference_hits,
+                JobDoctorSummary.violations,
+            )
+            .join(Doctor, JobDoctorSummary.doctor_id == Doctor.id)
+            .where(JobDoctorSummary.job_id == job_id)
+            .order_by(JobDoctorSummary.violations.desc(), Doctor.name)
+        )
+        return self.db.execute(stmt).all()
+
+    def coverage_gaps(self, job_id: int, limit: int = 200):
+        """Các ca (ngày, khoa, ca) bị thiếu người so với định biên."""
+        stmt = (
+            select(
+                JobSlotSummary.slot_date,
+                Clinic.name.label('clinic_name'),
+                Shift.name.label('shift_name'),
+                JobSlotSummary.assigned_main,
+                JobSlotSummary.required_main,
+                JobSlotSummary.assigned_sub,
+                JobSlotSummary.required_sub,
+                JobSlotSummary.missing,
+            )
+            .join(Clinic, JobSlotSummary.clinic_id == Clinic.id)
+            .join(Shift, JobSlotSummary.shift_id == Shift.id)
+            .where(JobSlotSummary.job_id == job_id, JobSlotSummary.missing > 0)
+            .order_by(JobSlotSummary.slot_date, Clinic.name, Shift.start_time)
+            .limit(limit)
+        )
+        return self.db.execute(stmt).all()
+
+    def coverage_gap_count(self, job: SchedulingJob) -> int:
+        """Số ca thiếu người: lấy từ violation_counts đã lưu (1 vi phạm 'understaffed' / ca), Job cũ thì đếm."""
+        if job.violation_counts:
+            return json.loads(job.violation_counts).get('understaffed', 0)
+        return self.db.scalar(
+            select(func.count(JobSlotSummary.id))
+            .where(JobSlotSummary.job_id == job.id, JobSlotSummary.missing > 0)
+        ) or 0
+
+    # --- Báo cáo vi phạm (JSON gọn lưu cùng Job, không tính lại) ---
+    @staticmethod
+    def decode_violations(job: SchedulingJob) -> list:
+        if not job.violation_report:
+            return []
+        report = json.loads(job.violation_report)
+        kinds = report["kinds"]
+        return [{
+            "kind": kinds[kind],
+            "doctor_id": doctor_id,
+            "date": datetime.date.fromisoformat(date),
+            "clinic_id": clinic_id,
+            "shift_id": shift_id,
+            "cost": cost,
+        } for kind, doctor_id, date, clinic_id, shift_id, cost in report["rows"]]
+
+    def violation_rows(self, job: SchedulingJob, limit: int = 300) -> list:
+        """
+        Các vi phạm đầu tiên (theo ngày) kèm tên bác sĩ / khoa / ca.
+        Tên lấy từ identity map: bác sĩ/khoa/ca của lịch vừa nạp (joinedload) đã có sẵn nên
+        không phát sinh truy vấn; các id chưa nạp được đọc bằng 1 truy vấn / bảng.
+        """
+        rows = self.decode_violations(job)[:limit]
+
+        def names(model, ids):
+            found, missing = {}, []
+            for obj_id in ids:
+                if not obj_id:
+                    continue
+                obj = self.db.identity_map.get(identity_key(model, obj_id))
+                if obj is not None:
+                    found[obj_id] = obj.name
+                else:
+                    missing.append(obj_id)
+            if missing:
+                found.update(self.db.execute(select(model.id, model.name).where(model.id.in_(missing))).all())
+            return found
+
+        doctors = names(Doctor, {r["doctor_id"] for r in rows})
+        clinics = names(Clinic, {r["clinic_id"] for r in rows})
+        shifts = names(Shift, {r["shift_id"] for r in rows})
+        for r in rows:
+            r["label"] = VIOLATION_LABELS[r["kind"]]
+            r["doctor_name"] = doctors.get(r["doctor_id"], '')
+            r["clinic_name"] = clinics.get(r["clinic_id"], '')
+            r["shift_name"] = shifts.get(r["shift_id"], '')
+        return rows
+
+    def violation_flags(self, job: SchedulingJob) -> dict:
+        """(ngày, khoa, ca, bác sĩ) -> [nhãn vi phạm]; bác sĩ = 0 với ca thiếu người."""
+        flags = defaultdict(list)
+        for r in self.decode_violations(job):
+            if r["shift_id"]:
+                flags[(r["date"], r["clinic_id"], r["shift_id"], r["doctor_id"])].append(VIOLATION_LABELS[r["kind"]])
+        return dict(flags)
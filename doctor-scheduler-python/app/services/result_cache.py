@@ -0,0 +1,64 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class CachedPage:
+    __slots__ = ('body', 'etag', 'last_modified')
+
+    def __init__(self, body, etag, last_modified):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class CompletedJobCache:
+    """
+    Bộ đệm LRU (giới hạn số phần tử) cho các trang kết quả của Job đã COMPLETED.
+
+    Khóa luôn chứa `job.id` và "phiên bản" kết quả (result_version) nên khi Job chạy lại
+    / đổi ca / ghi lại assignments thì khóa mới không bao giờ trùng khóa cũ - kể cả khi việc
+    ghi diễn ra ở tiến trình worker khác. Các khóa cũ sẽ tự bị đẩy ra theo LRU, hoặc
+    bị xóa ngay bằng invalidate_job().
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_etag(key: tuple) -> str:
+        # Nội dung của một khóa là bất biến -> ETag mạnh suy ra trực tiếp từ khóa,
+        # cho phép trả 304 mà không cần render lại (kể cả ở tiến trình web khác).
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def get(self, key: tuple):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+            return page
+
+    def put(self, key: tuple, body: str, last_modified) -> CachedPage:
+        page = CachedPage(body, self.make_etag(key), last_modified)
+        with self._lock:
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return page
+
+    def invalidate_job(self, job_id: int):
+        """Xóa mọi trang đã đệm của một Job (khóa dạng (endpoint, job_id, ...))."""
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == job_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+result_cache = CompletedJobCache(int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 128)))
@@ -1,19 +1,40 @@
+from __future__ import annotations
+import contextlib
 import datetime
+import json
+import multiprocessing
+import os
 import random
-from sqlalchemy.orm import Session, joinedload, selectinload
-from sqlalchemy import select 
-from app import db 
+import time
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, insert, update, bindparam, func, and_, or_
 from app.models import (
     Doctor, Clinic, Shift, LeaveRequest, SchedulePreference, 
-    SchedulingJob, Assignment
+    SchedulingJob, Assignment, JobDoctorSummary, JobSlotSummary
 )
 from app.models.doctor import DoctorRole
 from app.models.scheduling_job import JobStatus 
-from .solver_service import ScheduleState, CostFunction, ScheduleAnnealer, ScheduleContextData
+from .solver_service import (
+    ScheduleState, CostFunction, ScheduleContextData, ScheduleSummary, DEFAULT_FAIRNESS_WEIGHT,
+)
+from .result_cache import result_cache
+from .profiling import PhaseProfiler, resolve_profile_mode
+from app.metrics import registry as metrics
 from collections import defaultdict
-import math 
 import traceback 
 
+# Số ngày lịch đã chốt trước ranh giới cần đưa vào ngữ cảnh (luật nghỉ ngơi / giờ làm theo tuần)
+BOUNDARY_LOOKBACK_DAYS = 7
+
+# Bộ giải: 'lexicographic' (mặc định, 2 pha hard -> soft), 'kernel' (cùng lịch trình 2 pha trên mảng
+# số nguyên, Numba nếu có) hoặc 'simanneal' (chi phí gộp có trọng số)
+SOLVER_ENGINES = ('lexicographic', 'kernel', 'simanneal')
+DEFAULT_ENGINE = 'lexicographic'
+
+def resolve_engine() -> str:
+    engine = (os.environ.get('SCHEDULER_ENGINE') or DEFAULT_ENGINE).strip().lower()
+    return engine if engine in SOLVER_ENGINES else DEFAULT_ENGINE
+
 class SchedulingService:
     """
     Lớp dịch vụ cấp cao để xử lý logic xếp lịch.
@@ -21,6 +42,17 @@ class SchedulingService:
 
     def __init__(self, db_session: Session):
         self.db = db_session
+        self.profiler = None
+        # Pool worker của engine 'kernel' nhiều chuỗi: tạo 1 lần / Job, dùng lại cho mọi cửa sổ
+        self.chain_pool = None
+
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+        """Bấm giờ 1 giai đoạn cho /metrics, và chi tiết hơn nếu Job bật profiling."""
+        t0 = time.perf_counter()
+        with (self.profiler.phase(name) if self.profiler else contextlib.nullcontext()):
+            yield
+        metrics.observe('scheduler_phase_duration_seconds', time.perf_counter() - t0, phase=name)
 
     def run_scheduling_job(self, job_id: int):
         print(f"--- Service: Bắt đầu xử lý Tác vụ Xếp lịch ID: {job_id} ---")
@@ -34,67 +66,70 @@ class SchedulingService:
             print(f"Service Info: Tác vụ {job_id} không ở trạng thái 'Pending'. Bỏ qua.")
             return
 
+        t_job = time.perf_counter()
         try:
             print(f"Service: Cập nhật Job {job_id} sang 'Running'.")
             job.status = JobStatus.RUNNING
             job.status_message = None 
+            job.finished_at = None
+            job.result_version = None
+            job.profile_data = None
             self.db.commit() 
+            result_cache.invalidate_job(job_id)
+
+            profile_mode = resolve_profile_mode(job.profile_mode)
+            if profile_mode:
+                print(f"Service: Bật đo hiệu năng ({profile_mode}) cho Job {job_id}.")
+                self.profiler = PhaseProfiler(profile_mode)
+                self.profiler.start_cprofile()
 
             print(f"Service: Chuẩn bị dữ liệu ngữ cảnh cho Job {job_id}...")
-            context_data: ScheduleContextData = self._build_context(job.start_date, job.end_date)
+            with self._phase("build_context"):
+                context_data: ScheduleContextData = self._build_context(
+                    job.start_date, job.end_date, job.id, job.fairness_weight)
             
             if not context_data.doctors or not context_data.clinics or not context_data.shifts:
                  raise ValueError("Dữ liệu đầu vào (Bác sĩ/Phòng khám/Ca trực) không đủ.")
             
-            print(f"Service: Tạo giải pháp ban đầu THÔNG MINH (Đúng định biên)...")
-            initial_assignments = self._create_smart_initial_solution(context_data)
-            
-            initial_state = ScheduleState(initial_assignments) 
+            rolling = 0 < (job.window_days or 0) < len(context_data.date_range)
+            if rolling:
+                print(f"Service: Chế độ CUỐN CHIẾU: cửa sổ {job.window_days} ngày, gối {job.overlap_days or 0} ngày.")
+                with self._phase("anneal"):
+                    best_state, steps_run = self._solve_rolling(context_data, job.window_days, job.overlap_days or 0)
+            else:
+                print(f"Service: Tạo giải pháp ban đầu THÔNG MINH (Đúng định biên)...")
+                with self._phase("initial_solution"):
+                    initial_state = ScheduleState(self._create_smart_initial_solution(context_data))
+
+                print(f"Service: Bắt đầu chạy Annealer cho Job {job_id}...")
+                with self._phase("anneal"):
+                    best_state, steps_run = self._anneal(context_data, initial_state)
 
-            print(f"Service: Khởi tạo Annealer...")
             cost_function = CostFunction(context_data)
-            annealer = ScheduleAnnealer(initial_state, cost_function) 
-
-            # ============================================================
-            # CẤU HÌNH THAM SỐ CHO THUẬT TOÁN SIMULATED ANNEALING (AI)
-            # ============================================================
-            
-            # 1. Tmax (Nhiệt độ đầu): Độ "nóng" ban đầu.
-            # - Ý nghĩa: Nhiệt độ càng cao, thuật toán càng dễ chấp nhận các phương án xấu hơn tạm thời.
-            # - Tác dụng: Giúp thuật toán "nhảy" ra khỏi các hố sâu cục bộ (local minima) để tìm vùng đất mới tốt hơn.
-            annealer.Tmax = 25000.0  
-
-            # 2. Tmin (Nhiệt độ cuối): Độ "lạnh" kết thúc.
-            # - Ý nghĩa: Khi nhiệt độ giảm dần về Tmin, thuật toán trở nên khắt khe.
-            # - Tác dụng: Giai đoạn này giúp thuật toán "tinh chỉnh" (fine-tune) để hội tụ về kết quả tốt nhất có thể.
-            annealer.Tmin = 2.5      
-
-            # 3. Steps (Tổng số bước lặp):
-            # - Ý nghĩa: Tổng số lần thuật toán thử thay đổi lịch để tìm phương án tốt hơn.
-            # - Tác dụng: Số bước càng lớn -> khả năng tìm ra lịch tối ưu càng cao, nhưng thời gian chạy càng lâu.
-            annealer.steps = 50000   
-
-            # 4. Updates (Tần suất báo cáo):
-            # - Ý nghĩa: Chia tổng số bước (steps) cho số này để quyết định bao lâu in log ra console một lần.
-            # - Ví dụ: steps=100.000, updates=10 => Cứ mỗi 10.000 bước sẽ in ra 1 dòng log.
-            # - Tác dụng: Giúp theo dõi "sức khỏe" thuật toán chạy theo thời gian thực mà không làm tràn màn hình console.
-            annealer.updates = 10   
-            
-            # ============================================================
-
-            print(f"Service: Bắt đầu chạy Annealer cho Job {job_id}...")
-            best_state, best_cost = annealer.anneal() 
+            best_cost = cost_function.calculate_cost(best_state)
+            if self.profiler:
+                self.profiler.meta.update(steps=steps_run, best_cost=best_cost, rolling=rolling,
+                                          doctors=len(context_data.doctors), days=len(context_data.date_range))
             print(f"Service: Hoàn thành. Chi phí tốt nhất: {best_cost}")
 
             print(f"Service: Đang phân tích chi tiết kết quả...")
-            cost_function.print_detailed_report(best_state) 
+            with self._phase("summary"):
+                summary = cost_function.build_summary(best_state)
+            cost_function.print_detailed_report(best_state, summary) 
 
             print(f"Service: Lưu kết quả cho Job {job_id}...")
-            self._save_results(job, best_state, context_data) 
+            with self._phase("save_results"):
+                self._save_results(job, best_state, context_data, summary) 
+                self.db.flush()
+            self._store_profile(job)
 
             job.status = JobStatus.COMPLETED
             job.status_message = f"Hoàn thành với chi phí: {best_cost:.2f}"
+            job.finished_at = job.result_version = datetime.datetime.now(datetime.timezone.utc)
             self.db.commit() 
+            metrics.set_gauge('scheduler_job_final_cost', summary.hard_cost, kind='hard')
+            metrics.set_gauge('scheduler_job_final_cost', summary.soft_cost, kind='soft')
+            self._record_job_metrics(t_job, JobStatus.COMPLETED)
 
         except Exception as e:
             print(f"!!! Service Error: Lỗi khi xử lý Job {job_id}: {str(e)} !!!") 
@@ -106,9 +141,169 @@ class SchedulingService:
                 job.status = JobStatus.FAILED
                 error_message = str(e)[:900]
                 job.status_message = f"Lỗi: {error_message}" 
+                self._store_profile(job)
                 self.db.commit() 
+            self._record_job_metrics(t_job, JobStatus.FAILED)
+        finally:
+            if self.chain_pool:
+                self.chain_pool.close()
+                self.chain_pool = None
+
+    def _anneal(self, ctx: ScheduleContextData, initial_state: ScheduleState):
+        """Giải 1 ngữ cảnh (cả kỳ hoặc 1 cửa sổ) bằng bộ giải đã chọn. Trả về (state tốt nhất, số bước)."""
+        cost_function = CostFunction(ctx)
+        cost_function.profiler = self.profiler
+        engine = resolve_engine()
+        t0 = time.perf_counter()
+        if engine == 'simanneal':
+            best_state, steps = self._run_simanneal(initial_state, cost_function)
+        elif engine == 'kernel':
+            best_state, steps = self._run_kernel(initial_state, cost_function)
+        else:
+            best_state, steps = self._run_lexicographic(initial_state, cost_function)
+        elapsed = time.perf_counter() - t0
+        if elapsed > 0:
+            metrics.observe('scheduler_anneal_steps_per_second', steps / elapsed)
+        if self.profiler:
+            self.profiler.meta["engine"] = engine
+        return best_state, steps
+
+    def _run_lexicographic(self, initial_state: ScheduleState, cost_function: CostFunction):
+        """Bộ giải mặc định: 2 pha (hard trước, soft sau), xem lexicographic_annealer.py."""
+        from .lexicographic_annealer import LexicographicAnnealer
+        annealer = LexicographicAnnealer(initial_state, cost_function)
+        annealer.steps = 50000
+        annealer.updates = 10
+        best_state, (hard, soft) = annealer.anneal()
+        print(f"Service: Pha 1 (khả thi) dùng {annealer.phase1_steps} bước; tốt nhất cứng {hard:.1f} / mềm {soft:.1f}")
+        return best_state, annealer.steps
+
+    def _run_kernel(self, initial_state: ScheduleState, cost_function: CostFunction):
+        """Cùng lịch trình 2 pha, chi phí delta trên mảng số nguyên (xem solver_kernel.py)."""
+        from .solver_kernel import KernelAnnealer
+        from .shared_instance import ChainPool, ParallelKernelAnnealer, resolve_kernel_chains
+        chains = resolve_kernel_chains()
+        if chains > 1 and multiprocessing.current_process().daemon:
+            # Tiến trình daemon không tạo được worker: nhiều chuỗi sẽ chỉ chạy lần lượt (chậm gấp `chains` lần)
+            print(f"Service: Tiến trình daemon không chạy song song được, bỏ qua {chains} chuỗi -> 1 chuỗi")
+            chains = 1
+        if chains > 1:
+            # Nhiều chuỗi trên dữ liệu dùng chung (shared memory), lấy chuỗi tốt nhất
+            if self.chain_pool is None:
+                self.chain_pool = ChainPool(min(chains, os.cpu_count() or 1))
+            annealer = ParallelKernelAnnealer(initial_state, cost_function, chains=chains, pool=self.chain_pool)
+        else:
+            annealer = KernelAnnealer(initial_state, cost_function)
+        annealer.steps = 50000
+        best_state, (hard, soft) = annealer.anneal()
+        mode = "Numba" if annealer.use_jit else "Python"
+        print(f"Service: Kernel ({mode}, {chains} chuỗi) pha 1 dùng {annealer.phase1_steps} bước; "
+              f"tốt nhất cứng {hard:.1f} / mềm {soft:.1f} trong {annealer.elapsed:.2f}s")
+        return best_state, annealer.steps * chains
+
+    def _run_simanneal(self, initial_state: ScheduleState, cost_function: CostFunction):
+        """Bộ giải cũ: simanneal trên chi phí gộp hard * W_HARD + soft * W_SOFT."""
+        from .annealer import ScheduleAnnealer # Import muộn: simanneal chỉ cần khi chạy
+        annealer = ScheduleAnnealer(initial_state, cost_function) 
+
+        # ============================================================
+        # CẤU HÌNH THAM SỐ CHO THUẬT TOÁN SIMULATED ANNEALING (AI)
+        # ============================================================
+        
+        # 1. Tmax (Nhiệt độ đầu): Độ "nóng" ban đầu.
+        # - Ý nghĩa: Nhiệt độ càng cao, thuật toán càng dễ chấp nhận các phương án xấu hơn tạm thời.
+        # - Tác dụng: Giúp thuật toán "nhảy" ra khỏi các hố sâu cục bộ (local minima) để tìm vùng đất mới tốt hơn.
+        annealer.Tmax = 25000.0  
+
+        # 2. Tmin (Nhiệt độ cuối): Độ "lạnh" kết thúc.
+        # - Ý nghĩa: Khi nhiệt độ giảm dần về Tmin, thuật toán trở nên khắt khe.
+        # - Tác dụng: Giai đoạn này giúp thuật toán "tinh chỉnh" (fine-tune) để hội tụ về kết quả tốt nhất có thể.
+        annealer.Tmin = 2.5      
+
+        # 3. Steps (Tổng số bước lặp):
+        # - Ý nghĩa: Tổng số lần thuật toán thử thay đổi lịch để tìm phương án tốt hơn.
+        # - Tác dụng: Số bước càng lớn -> khả năng tìm ra lịch tối ưu càng cao, nhưng thời gian chạy càng lâu.
+        annealer.steps = 50000   
+
+        # 4. Updates (Tần suất báo cáo):
+        # - Ý nghĩa: Chia tổng số bước (steps) cho số này để quyết định bao lâu in log ra console một lần.
+        # - Ví dụ: steps=100.000, updates=10 => Cứ mỗi 10.000 bước sẽ in ra 1 dòng log.
+        # - Tác dụng: Giúp theo dõi "sức khỏe" thuật toán chạy theo thời gian thực mà không làm tràn màn hình console.
+        annealer.updates = 10   
+        
+        # ============================================================
 
-    def _build_context(self, start_date: datetime.date, end_date: datetime.date) -> ScheduleContextData:
+        best_state, _ = annealer.anneal()
+        return best_state, annealer.steps
+
+    def _solve_rolling(self, ctx: ScheduleContextData, window_days: int, overlap_days: int):
+        """
+        Giải theo CỬA SỔ CUỐN CHIẾU (rolling horizon): mỗi cửa sổ `window_days` ngày,
+        gối lên cửa sổ sau `overlap_days` ngày. Chỉ (window - overlap) ngày đầu được CHỐT;
+        các ngày gối được giải lại ở cửa sổ sau, khởi tạo từ kết quả của cửa sổ trước.
+        Ca đã chốt ngay trước cửa sổ được đưa vào ngữ cảnh (fixed_shifts) để luật nghỉ ngơi,
+        trùng ca và giờ làm/tuần vẫn được kiểm tra qua ranh giới. Chi phí mỗi bước chỉ
+        phụ thuộc độ dài cửa sổ, không phụ thuộc độ dài cả kỳ.
+        """
+        overlap_days = max(0, min(overlap_days, window_days - 1))
+        stride = window_days - overlap_days
+        dates = ctx.date_range
+        committed = {}
+        carry = {}
+        total_steps = 0
+
+        for start in range(0, len(dates), stride):
+            window = dates[start:start + window_days]
+            last = start + window_days >= len(dates)
+            fixed = self._fixed_shifts(committed, window[0])
+            lookback_start = window[0] - datetime.timedelta(days=BOUNDARY_LOOKBACK_DAYS)
+            for doc_id, items in ctx.fixed_shifts.items():
+                # Đuôi lịch trước kỳ (chỉ còn tác dụng với các cửa sổ đầu)
+                prior = [(d, sid) for d, sid in items if d >= lookback_start]
+                if prior:
+                    fixed.setdefault(doc_id, []).extend(prior)
+            window_ctx = ctx.window(window, fixed)
+
+            initial = self._create_smart_initial_solution(window_ctx)
+            initial.update(carry)
+            print(f"Service: Cửa sổ {window[0]} -> {window[-1]} ({len(fixed)} bác sĩ có ca đã chốt trước đó)")
+            best_state, steps = self._anneal(window_ctx, ScheduleState(initial))
+            total_steps += steps
+
+            for date in (window if last else window[:stride]):
+                committed[date] = best_state.assignments[date]
+            if last:
+                break
+            carry = {date: best_state.assignments[date] for date in window[stride:]}
+
+        return ScheduleState(committed), total_steps
+
+    @staticmethod
+    def _fixed_shifts(committed: dict, window_start: datetime.date) -> dict:
+        """Ca đã chốt trong BOUNDARY_LOOKBACK_DAYS ngày trước cửa sổ: doc_id -> [(ngày, shift_id)]."""
+        fixed = defaultdict(list)
+        for offset in range(BOUNDARY_LOOKBACK_DAYS, 0, -1):
+            date = window_start - datetime.timedelta(days=offset)
+            for shift_data in committed.get(date, {}).values():
+                for shift_id, doc_ids in shift_data.items():
+                    for doc_id in doc_ids:
+                        fixed[doc_id].append((date, shift_id))
+        return dict(fixed)
+
+    def _record_job_metrics(self, t_job: float, status: JobStatus):
+        metrics.observe('scheduler_job_duration_seconds', time.perf_counter() - t_job, status=status.value)
+        metrics.inc('scheduler_jobs_finished_total', status=status.value)
+
+    def _store_profile(self, job: SchedulingJob):
+        """Gắn kết quả đo hiệu năng (JSON) vào Job - commit do caller."""
+        if not self.profiler:
+            return
+        self.profiler.stop_cprofile(f"job-{job.id}")
+        job.profile_data = json.dumps(self.profiler.to_dict(), ensure_ascii=False)
+        self.profiler = None
+
+    def _build_context(self, start_date: datetime.date, end_date: datetime.date,
+                       job_id: int | None = None, fairness_weight: float | None = None) -> ScheduleContextData:
         # Load dữ liệu kèm quan hệ nếu cần thiết
         doctors = self.db.scalars(select(Doctor)).all()
         clinics = self.db.scalars(select(Clinic)).all()
@@ -135,14 +330,98 @@ class SchedulingService:
 
         date_range = list(self._daterange(start_date, end_date)) 
 
+        # Lịch đã công bố ngay trước kỳ -> luật nghỉ ngơi / giờ làm được kiểm tra qua ranh giới
+        prior_tail = self._load_prior_tail(start_date, job_id)
+        print(f"Service: Nạp đuôi lịch trước kỳ cho {len(prior_tail)} bác sĩ ({BOUNDARY_LOOKBACK_DAYS} ngày).")
+
         context = ScheduleContextData(
             doctors=doctors, clinics=clinics, shifts=shifts,
             leaves_map=leaves_map, preferences_map=preferences_map,
             date_range=date_range,
-            doctors_map=doctors_map, clinics_map=clinics_map, shifts_map=shifts_map
+            doctors_map=doctors_map, clinics_map=clinics_map, shifts_map=shifts_map,
+            fixed_shifts=prior_tail,
+            fairness_weight=DEFAULT_FAIRNESS_WEIGHT if fairness_weight is None else fairness_weight,
         )
         return context
 
+    def _load_prior_tail(self, start_date: datetime.date, exclude_job_id: int | None = None) -> dict:
+        """
+        Đuôi lịch của các Job ĐÃ HOÀN THÀNH trong BOUNDARY_LOOKBACK_DAYS ngày trước start_date:
+        doc_id -> [(ngày, shift_id)]. Một truy vấn theo khoảng ngày (index ix_assignments_date_doctor).
+        Nếu nhiều Job cùng phủ 1 ngày, lấy Job hoàn thành muộn nhất (bản được công bố sau cùng).
+        """
+        conditions = [
+            Assignment.assignment_date >= start_date - datetime.timedelta(days=BOUNDARY_LOOKBACK_DAYS),
+            Assignment.assignment_date < start_date,
+            SchedulingJob.status == JobStatus.COMPLETED,
+        ]
+        if exclude_job_id is not None:
+            conditions.append(SchedulingJob.id != exclude_job_id)
+        rows = self.db.execute(
+            select(Assignment.assignment_date, Assignment.doctor_id, Assignment.shift_id,
+                   Assignment.job_id, SchedulingJob.finished_at)
+            .join(SchedulingJob, Assignment.job_id == SchedulingJob.id)
+            .where(*conditions)
+        ).all()
+
+        def version(row):
+            return (row.finished_at.timestamp() if row.finished_at else 0, row.job_id)
+
+        latest = {}
+        for row in rows:
+            if row.assignment_date not in latest or version(row) > latest[row.assignment_date]:
+                latest[row.assignment_date] = version(row)
+
+        tail = defaultdict(list)
+        for row in rows:
+            if version(row) == latest[row.assignment_date]:
+                tail[row.doctor_id].append((row.assignment_date, row.shift_id))
+        return dict(tail)
+
+    def published_jobs_by_date(self, start_date: datetime.date, end_date: datetime.date,
+                               exclude_job_id: int | None = None) -> dict:
+        """
+        ngày -> id Job đang công bố: Job COMPLETED phủ ngày đó, hoàn thành muộn nhất
+        (cùng quy tắc với _load_prior_tail và AvailabilityService.active_job_for).
+        """
+        conditions = [
+            SchedulingJob.status == JobStatus.COMPLETED,
+            SchedulingJob.start_date <= end_date,
+            SchedulingJob.end_date >= start_date,
+        ]
+        if exclude_job_id is not None:
+            conditions.append(SchedulingJob.id != exclude_job_id)
+        jobs = self.db.execute(
+            select(SchedulingJob.id, SchedulingJob.start_date, SchedulingJob.end_date, SchedulingJob.finished_at)
+            .where(*conditions)
+        ).all()
+
+        published = {}
+        # Cũ trước, mới sau: Job hoàn thành muộn hơn ghi đè các ngày trùng
+        for job in sorted(jobs, key=lambda j: (j.finished_at.timestamp() if j.finished_at else 0, j.id)):
+            for date in self._daterange(max(start_date, job.start_date), min(end_date, job.end_date)):
+                published[date] = job.id
+        return published
+
+    def published_shift_counts(self, start_date: datetime.date, end_date: datetime.date,
+                               exclude_job_id: int | None = None) -> dict:
+        """doc_id -> số ca trong [start_date, end_date] theo lịch đang công bố của từng ngày. 2 truy vấn."""
+        # Gộp các ngày liên tiếp cùng Job thành 1 khoảng -> 1 điều kiện / khoảng
+        segments = []
+        for date, job_id in sorted(self.published_jobs_by_date(start_date, end_date, exclude_job_id).items()):
+            if segments and segments[-1][0] == job_id and segments[-1][2] == date - datetime.timedelta(days=1):
+                segments[-1][2] = date
+            else:
+                segments.append([job_id, date, date])
+        if not segments:
+            return {}
+        return dict(self.db.execute(
+            select(Assignment.doctor_id, func.count())
+            .where(or_(*(and_(Assignment.job_id == job_id, Assignment.assignment_date.between(first, last))
+                         for job_id, first, last in segments)))
+            .group_by(Assignment.doctor_id)
+        ).all())
+
     def _create_smart_initial_solution(self, ctx: ScheduleContextData) -> dict:
         """
         Tạo lịch ban đầu ĐÚNG ĐỊNH BIÊN (Correct by Construction):
@@ -192,26 +471,77 @@ class SchedulingService:
         
         return assignments 
 
-    def _save_results(self, job: SchedulingJob, state: ScheduleState, context: ScheduleContextData):
+    def _save_results(self, job: SchedulingJob, state: ScheduleState, context: ScheduleContextData,
+                      summary: ScheduleSummary):
+        """
+        Ghi assignments + các bảng tổng hợp trong CÙNG một giao dịch (commit do caller),
+        dùng INSERT nhiều dòng (executemany) thay vì tạo từng đối tượng ORM.
+        """
+        # Số ca của lịch đang công bố trong kỳ - lịch mà Job này sắp thay thế (đọc TRƯỚC khi xóa cũ)
+        superseded = self.published_shift_counts(job.start_date, job.end_date)
+
         # Xóa cũ
-        self.db.query(Assignment).filter(Assignment.job_id == job.id).delete(synchronize_session=False)
+        self.db.execute(delete(Assignment).where(Assignment.job_id == job.id))
         
         new_assignments = []
         for date, clinic_data in state.assignments.items():
             for clinic_id, shift_data in clinic_data.items():
                 for shift_id, doctor_ids in shift_data.items():
                     for doc_id in doctor_ids:
-                        assign = Assignment(
-                            assignment_date=date, 
-                            doctor_id=doc_id,
-                            clinic_id=clinic_id,
-                            shift_id=shift_id,
-                            job_id=job.id
-                        )
-                        new_assignments.append(assign)
-        
+                        new_assignments.append({
+                            "assignment_date": date,
+                            "doctor_id": doc_id,
+                            "clinic_id": clinic_id,
+                            "shift_id": shift_id,
+                            "job_id": job.id,
+                        })
         if new_assignments:
-            self.db.add_all(new_assignments)
+            self.db.execute(insert(Assignment), new_assignments)
+
+        self.save_summary(job, summary, superseded)
+
+    def save_summary(self, job: SchedulingJob, summary: ScheduleSummary, superseded: dict | None = None):
+        """
+        Ghi lại bảng tổng hợp của Job, chi phí cuối và Doctor.total_shifts_worked (commit do caller).
+        Job vừa giải xong trở thành lịch công bố của MỌI ngày trong kỳ (hoàn thành muộn nhất), nên
+        total_shifts_worked = tổng số ca theo lịch công bố từng ngày: cộng số ca của Job, trừ số ca
+        của lịch bị thay thế `superseded` (doc_id -> số ca; None: đọc từ CSDL, không tính Job này).
+        Job thử nghiệm / chạy lại cùng kỳ vì vậy không bị cộng 2 lần.
+        """
+        if superseded is None:
+            superseded = self.published_shift_counts(job.start_date, job.end_date, exclude_job_id=job.id)
+        shift_delta = defaultdict(int)
+        for doc_id, count in superseded.items():
+            shift_delta[doc_id] -= count
+
+        for model in (JobDoctorSummary, JobSlotSummary):
+            self.db.execute(delete(model).where(model.job_id == job.id))
+
+        doctor_rows = [{"job_id": job.id, **row} for row in summary.doctor_rows()]
+        slot_rows = [{"job_id": job.id, **row} for row in summary.slots]
+
+        for model, rows in ((JobDoctorSummary, doctor_rows),
+                            (JobSlotSummary, slot_rows)):
+            if rows:
+                self.db.execute(insert(model), rows)
+
+        # Bộ đếm khối lượng công việc: 1 lệnh UPDATE executemany cho mọi bác sĩ thay đổi
+        for row in doctor_rows:
+            shift_delta[row["doctor_id"]] += row["shift_count"]
+        delta_rows = [{"b_id": doc_id, "b_delta": delta} for doc_id, delta in shift_delta.items() if delta]
+        if delta_rows:
+            doctors = Doctor.__table__
+            self.db.execute(
+                update(doctors)
+                .where(doctors.c.id == bindparam("b_id"))
+                .values(total_shifts_worked=func.coalesce(doctors.c.total_shifts_worked, 0) + bindparam("b_delta")),
+                delta_rows,
+            )
+
+        job.final_hard_cost = summary.hard_cost
+        job.final_soft_cost = summary.soft_cost
+        job.violation_report = json.dumps(summary.violation_report(), separators=(',', ':'))
+        job.violation_counts = json.dumps(summary.violation_counts(), separators=(',', ':'))
 
     def _daterange(self, start_date, end_date):
         for n in range(int((end_date - start_date).days) + 1):
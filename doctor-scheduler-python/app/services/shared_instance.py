@@ -0,0 +1,223 @@
+"""
+Dữ liệu bài toán dùng chung giữa các tiến trình solver (multiprocessing.shared_memory).
+
+Tiến trình cha mã hóa ngữ cảnh 1 lần (KernelInstance) rồi ghi toàn bộ mảng số nguyên vào 1 vùng
+nhớ dùng chung; worker chỉ nhận TÊN vùng nhớ và gắn vào (attach) - không pickle ScheduleContextData
+hay đối tượng ORM, không sao chép dữ liệu: mỗi mảng là 1 memoryview int64 (hoặc mảng numpy trỏ vào
+cùng bộ nhớ khi chạy Numba). Bộ nhớ riêng của worker chỉ còn trạng thái đang giải (docs, bộ đếm).
+
+Bố cục vùng nhớ:
+    header    : (little-endian) magic 'DSKI', phiên bản, số mảng, S, ND, NT, D, NW, limit_minutes, missing_units, fairness_weight
+    thư mục   : (offset byte, độ dài) cho từng mảng theo thứ tự KernelInstance.INT_ARRAYS
+    dữ liệu   : các mảng int64 (thứ tự byte của máy) nối tiếp
+"""
+from __future__ import annotations
+import multiprocessing
+import os
+import random
+import struct
+import time
+from array import array
+from multiprocessing import shared_memory
+from .solver_kernel import KernelAnnealer, KernelInstance, feasible_time, run_chain
+
+MAGIC = b'DSKI'
+LAYOUT_VERSION = 2
+HEADER = struct.Struct('<4sHH7qd')
+DIRECTORY_ENTRY = struct.Struct('<2q')
+ITEM_SIZE = 8
+
+# Số chuỗi annealing song song mặc định của engine 'kernel' (1 = không song song)
+DEFAULT_KERNEL_CHAINS = 1
+
+
+def resolve_kernel_chains() -> int:
+    try:
+        return max(1, int(os.environ.get('SCHEDULER_KERNEL_CHAINS') or DEFAULT_KERNEL_CHAINS))
+    except ValueError:
+        return DEFAULT_KERNEL_CHAINS
+
+
+class SharedInstance:
+    """
+    1 vùng nhớ chứa KernelInstance đã mã hóa.
+        - publish(inst): tạo vùng nhớ (tiến trình cha sở hữu, close() sẽ unlink)
+        - attach(name) : gắn vào vùng nhớ đã có (worker, close() chỉ đóng)
+    Dùng như context manager; `ints` / `meta` có cùng dạng với KernelInstance để truyền thẳng vào run_chain.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        magic, version, n_arrays, S, ND, NT, D, NW, limit_minutes, missing_units, fairness_weight = \
+            HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION or n_arrays != len(KernelInstance.INT_ARRAYS):
+            shm.close()
+            raise ValueError(f"Vùng nhớ '{shm.name}' không phải dữ liệu solver (phiên bản {LAYOUT_VERSION})")
+        self.meta = {'S': S, 'ND': ND, 'NT': NT, 'D': D, 'NW': NW, 'limit_minutes': limit_minutes,
+                     'missing_units': missing_units, 'fairness_weight': fairness_weight}
+
+        self._views = []
+        self.ints = {}
+        for k, name in enumerate(KernelInstance.INT_ARRAYS):
+            offset, length = DIRECTORY_ENTRY.unpack_from(shm.buf, HEADER.size + k * DIRECTORY_ENTRY.size)
+            view = shm.buf[offset:offset + length * ITEM_SIZE].cast('q')
+            self._views.append(view)
+            self.ints[name] = view
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def publish(cls, inst: KernelInstance) -> "SharedInstance":
+        arrays = [inst.ints[name] for name in KernelInstance.INT_ARRAYS]
+        offset = HEADER.size + DIRECTORY_ENTRY.size * len(arrays)
+        offset += -offset % ITEM_SIZE
+        data_start = offset
+        size = data_start + ITEM_SIZE * sum(len(values) for values in arrays)
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            meta = inst.meta
+            HEADER.pack_into(shm.buf, 0, MAGIC, LAYOUT_VERSION, len(arrays),
+                             *(meta[name] for name in KernelInstance.META_INTS), meta['fairness_weight'])
+            for k, values in enumerate(arrays):
+                DIRECTORY_ENTRY.pack_into(shm.buf, HEADER.size + k * DIRECTORY_ENTRY.size, offset, len(values))
+                view = shm.buf[offset:offset + ITEM_SIZE * len(values)].cast('q')
+                view[:] = array('q', values)
+                view.release()
+                offset += ITEM_SIZE * len(values)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedInstance":
+        try:
+            # Python 3.13+: worker không đăng ký vùng nhớ với resource_tracker (cha chịu trách nhiệm unlink)
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    def close(self):
+        # Phải giải phóng mọi memoryview trước khi đóng vùng nhớ
+        self.ints = {}
+        for view in self._views:
+            view.release()
+        self._views = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _warm_up_worker(shm_name: str, use_jit: bool):
+    """Initializer của pool: biên dịch kernel (Numba) 1 lần khi worker khởi động, trước mọi chuỗi."""
+    if use_jit:
+        with SharedInstance.attach(shm_name) as shared:
+            run_chain(shared.ints, shared.meta, (0, 0, 1.0, 1.0, 1.0, 1.0), 1, use_jit)
+
+
+def _chain_worker(shm_name: str, schedule: tuple, seed: int, use_jit: bool):
+    """Chạy trong tiến trình con: gắn vào vùng nhớ, giải 1 chuỗi, trả về kết quả nhỏ gọn."""
+    t0 = time.perf_counter()
+    with SharedInstance.attach(shm_name) as shared:
+        result = run_chain(shared.ints, shared.meta, schedule, seed, use_jit)
+    return result + (time.perf_counter() - t0,)
+
+
+# =================================================================
+# NHIỀU CHUỖI SONG SONG
+# =================================================================
+class ChainPool:
+    """
+    Pool worker (spawn) dùng lại cho mọi lần anneal của 1 Job (mọi cửa sổ khi giải cuốn chiếu):
+    tạo ở lần dùng đầu, worker biên dịch kernel 1 lần trong initializer. Gọi close() khi Job xong.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self.use_jit = None
+        self._pool = None
+
+    def starmap(self, shm_name: str, use_jit: bool, args: list):
+        if self._pool is None or self.use_jit != use_jit:
+            self.close()
+            # spawn: worker không kế thừa kết nối CSDL / trạng thái Flask của tiến trình cha
+            self._pool = multiprocessing.get_context('spawn').Pool(
+                self.processes, initializer=_warm_up_worker, initargs=(shm_name, use_jit))
+            self.use_jit = use_jit
+        return self._pool.starmap(_chain_worker, args)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParallelKernelAnnealer(KernelAnnealer):
+    """
+    Chạy `chains` chuỗi annealing (seed khác nhau) trên CÙNG 1 vùng nhớ dùng chung, lấy kết quả tốt
+    nhất theo (hard, soft). Với cùng seed gốc, kết quả không phụ thuộc số tiến trình.
+    Cần chạy trong tiến trình KHÔNG daemon (worker chạy Job được khởi động với daemon=False);
+    SchedulingService không dùng lớp này khi tiến trình hiện tại là daemon.
+    `pool` (tùy chọn): ChainPool dùng chung giữa các lần anneal; không có thì tạo pool tạm cho 1 lần.
+    """
+
+    def __init__(self, initial_state, cost_function, chains: int = 2, processes: int | None = None,
+                 use_jit: bool | None = None, pool: ChainPool | None = None):
+        super().__init__(initial_state, cost_function, use_jit=use_jit)
+        self.chains = max(1, chains)
+        self.processes = processes
+        self.pool = pool
+        self.chain_results = []
+
+    def anneal(self):
+        inst = KernelInstance(self.cost_function.ctx, self.state)
+        base_seed = self.seed if self.seed is not None else random.getrandbits(32)
+        seeds = [(base_seed + 0x9E3779B9 * k) & 0xFFFFFFFF for k in range(self.chains)]
+        schedule = self.schedule()
+
+        t0 = time.perf_counter()
+        with SharedInstance.publish(inst) as shared:
+            processes = self.pool.processes if self.pool else min(self.chains, self.processes or os.cpu_count() or 1)
+            if processes > 1 and not multiprocessing.current_process().daemon:
+                args = [(shared.name, schedule, seed, self.use_jit) for seed in seeds]
+                if self.pool:
+                    results = self.pool.starmap(shared.name, self.use_jit, args)
+                else:
+                    with ChainPool(processes) as pool:
+                        results = pool.starmap(shared.name, self.use_jit, args)
+            else:
+                if processes > 1:
+                    print("Kernel: tiến trình daemon không thể tạo worker, chạy các chuỗi lần lượt (chậm)")
+                results = [_chain_worker(shared.name, schedule, seed, self.use_jit) for seed in seeds]
+        self.elapsed = time.perf_counter() - t0
+
+        self.chain_results = [
+            {"seed": seed, "hard": hard, "soft": soft, "phase1_steps": p1, "elapsed_s": round(el, 3),
+             "time_to_feasible_s": feasible_time(el, feasible_step, self.steps)}
+            for seed, (_, hard, soft, p1, feasible_step, el) in zip(seeds, results)
+        ]
+        # Chuỗi nào khả thi sớm nhất (thời gian đo trong worker)
+        self.time_to_feasible = min((r["time_to_feasible_s"] for r in self.chain_results
+                                     if r["time_to_feasible_s"] is not None), default=None)
+        best_docs, hard, soft, self.phase1_steps, _, _ = min(results, key=lambda r: (r[1], r[2]))
+        self.best_state = inst.decode(best_docs, self.state)
+        self.best_energy = (hard, soft)
+        return self.best_state, self.best_energy
@@ -0,0 +1,565 @@
+"""
+Bộ giải "kernel": toàn bộ vòng annealing (sinh bước, chi phí DELTA, chấp nhận Metropolis)
+chạy trên ngữ cảnh đã mã hóa thành mảng số nguyên phẳng - không dict, không đối tượng ORM.
+
+    - Biên dịch bằng Numba (numba.njit) nếu có numba + numpy, ngược lại chạy Python thuần.
+      Cả 2 dùng CHUNG mã nguồn (xem _make_kernel) và bộ sinh số ngẫu nhiên số nguyên riêng
+      (xorshift32) -> cùng seed + cùng dữ liệu cho cùng kết quả.
+    - Chi phí giống CostFunction.evaluate (thiếu người, đơn nghỉ, nghỉ < 12h, trùng ngày,
+      quá 48h/tuần, nguyện vọng, công bằng) nhưng cập nhật O(1) mỗi bước:
+        occ[bác sĩ, t]     : số ca tại mốc t = ngày * S + hạng ca (sắp theo giờ bắt đầu)
+                             -> luật nghỉ chỉ xét ca kề bên trong 3 ngày
+        win[bác sĩ, w]     : số PHÚT làm trong tuần lịch w (kể cả ca đã chốt, xem WeeklyHoursTracker)
+        cnt / sums         : khối lượng việc theo nhóm (khoa, vai trò) như FairnessTracker
+      Chi phí cứng được tính bằng "đơn vị phút" (vi phạm * 60 + số phút vượt 48h) để cộng trừ
+      số nguyên chính xác; kết quả trả ra đổi lại về đơn vị của CostFunction.
+    - Lịch trình 2 pha theo thứ tự từ điển như LexicographicAnnealer.
+
+Ngày trong kernel tính từ (ngày đầu kỳ - PRE_DAYS) để đuôi lịch đã chốt (<= 7 ngày) có chỉ số >= 0;
+day_week[ngày] = tuần lịch (theo ctx.hours_origin), -1 với ngày thuộc tuần trước kỳ.
+Module chỉ import thư viện chuẩn ở cấp module; numba/numpy được thử import khi dùng lần đầu.
+"""
+from __future__ import annotations
+import datetime
+import math
+import random
+import time
+from .solver_service import (
+    ScheduleState, CostFunction, ScheduleContextData,
+    MAX_WEEKLY_HOURS, WEEK_DAYS, MIN_REST_HOURS, SAME_DAY_PENALTY,
+)
+
+PRE_DAYS = WEEK_DAYS
+# Ca cách nhau >= 3 ngày không thể vi phạm luật nghỉ (ca dài tối đa 24h + nghỉ 12h)
+REST_SCAN_DAYS = 3
+MINUTE_UNITS = 60
+
+_jit_kernel = None
+_py_kernel = None
+
+
+# =================================================================
+# MÃ HÓA NGỮ CẢNH
+# =================================================================
+class KernelInstance:
+    """
+    Ngữ cảnh đã mã hóa: `ints` / `floats` là các mảng phẳng theo tên, cộng vài hằng số.
+    Chỉ số: bác sĩ = vị trí trong ctx.doctors, hạng ca r = thứ tự theo (giờ bắt đầu, độ dài).
+    """
+    INT_ARRAYS = (
+        'rank_start', 'rank_dur', 'rank_night', 'day_weekend', 'day_weekday', 'day_week',
+        'slot_day', 'slot_rank', 'slot_clinic', 'slot_off', 'slot_len', 'docs',
+        'cand', 'cand_off', 'cand_len', 'role', 'leave', 'pref', 'group', 'group_size',
+        'fixed_doc', 'fixed_t',
+    )
+
+    def __init__(self, ctx: ScheduleContextData, state: ScheduleState):
+        cost = CostFunction(ctx)
+        doc_ids = [doc.id for doc in ctx.doctors]
+        doc_index = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        shifts = sorted(ctx.shifts, key=lambda s: (s.start_time.hour * 60 + s.start_time.minute,
+                                                   ctx.shift_hours[s.id], s.id))
+        rank_of = {s.id: r for r, s in enumerate(shifts)}
+        clinic_index = {c.id: i for i, c in enumerate(ctx.clinics)}
+
+        self.ctx = ctx
+        self.doc_ids = doc_ids
+        self.S = S = len(shifts)
+        self.ND = ND = PRE_DAYS + len(ctx.date_range)
+        self.NT = ND * S
+        self.D = D = len(doc_ids)
+        self.NW = ctx.hours_weeks
+        self.limit_minutes = MAX_WEEKLY_HOURS * 60
+        self.fairness_weight = float(ctx.fairness_weight or 0.0)
+
+        a = {name: [] for name in self.INT_ARRAYS}
+        for s in shifts:
+            a['rank_start'].append(s.start_time.hour * 60 + s.start_time.minute)
+            a['rank_dur'].append(int(round(ctx.shift_hours[s.id] * 60)))
+            a['rank_night'].append(int(s.id in ctx.night_shift_ids))
+        first = ctx.date_range[0]
+        for day in range(ND):
+            date = first + datetime.timedelta(days=day - PRE_DAYS)
+            a['day_weekend'].append(int(date in ctx.weekend_dates))
+            a['day_weekday'].append(date.weekday())
+            a['day_week'].append(ctx.day_index(date) // WEEK_DAYS if ctx.day_index(date) >= 0 else -1)
+
+        # Ca cần trực (theo thứ tự quét của CostFunction) + bác sĩ hiện tại; thiếu người là hằng số
+        # vì mọi bước đều đổi người CÙNG vai trò
+        self.slot_keys = []
+        missing = 0
+        for d_i, date in enumerate(ctx.date_range):
+            clinic_assignments = state.assignments.get(date, {})
+            for clinic in ctx.clinics:
+                for s in shifts:
+                    if not cost._is_shift_required(clinic.name, s.name):
+                        continue
+                    doc_list = [doc_index[x] for x in clinic_assignments.get(clinic.id, {}).get(s.id, [])
+                                if x in doc_index and ctx.doctor_role_key.get(x)]
+                    n_main = sum(1 for i in doc_list if ctx.doctor_role_key[doc_ids[i]] == 'main')
+                    missing += (max(0, clinic.required_main - n_main)
+                                + max(0, clinic.required_sub - (len(doc_list) - n_main)))
+                    self.slot_keys.append((date, clinic.id, s.id))
+                    a['slot_day'].append(PRE_DAYS + d_i)
+                    a['slot_rank'].append(rank_of[s.id])
+                    a['slot_clinic'].append(clinic_index[clinic.id])
+                    a['slot_off'].append(len(a['docs']))
+                    a['slot_len'].append(len(doc_list))
+                    a['docs'].extend(doc_list)
+        self.missing_units = missing * MINUTE_UNITS
+
+        for clinic in ctx.clinics:
+            for role_key in ('main', 'sub'):
+                ids = [doc_index[x] for x in ctx.doctors_by_clinic[clinic.id][role_key] if x in doc_index]
+                a['cand_off'].append(len(a['cand']))
+                a['cand_len'].append(len(ids))
+                a['cand'].extend(ids)
+
+        a['role'] = [{'main': 0, 'sub': 1}.get(ctx.doctor_role_key.get(x), -1) for x in doc_ids]
+        a['leave'] = [0] * (D * ND)
+        a['pref'] = [0] * (D * S * 7)
+        for i, doc_id in enumerate(doc_ids):
+            for day in range(PRE_DAYS, ND):
+                if ctx.leaves_map.get((doc_id, first + datetime.timedelta(days=day - PRE_DAYS)), False):
+                    a['leave'][i * ND + day] = 1
+            for s in shifts:
+                for wd in range(7):
+                    score = ctx.preferences_map.get((doc_id, s.id, wd), 0)
+                    if score < 0:
+                        a['pref'][(i * S + rank_of[s.id]) * 7 + wd] = -score
+        a['group'] = [ctx.fairness_group.get(x, -1) for x in doc_ids]
+        a['group_size'] = list(ctx.fairness_group_sizes) or [1]
+
+        for doc_id, items in ctx.fixed_shifts.items():
+            if doc_id not in doc_index:
+                continue
+            for date, shift_id in items:
+                day = PRE_DAYS + (date - first).days
+                if 0 <= day < PRE_DAYS:
+                    a['fixed_doc'].append(doc_index[doc_id])
+                    a['fixed_t'].append(day * S + rank_of[shift_id])
+        self.ints = a
+
+    # Hằng số đi kèm các mảng (đủ để chạy kernel mà không cần ctx)
+    META_INTS = ('S', 'ND', 'NT', 'D', 'NW', 'limit_minutes', 'missing_units')
+
+    @property
+    def meta(self) -> dict:
+        meta = {name: getattr(self, name) for name in self.META_INTS}
+        meta['fairness_weight'] = self.fairness_weight
+        return meta
+
+    def decode(self, docs, template: ScheduleState) -> ScheduleState:
+        """Ghi danh sách bác sĩ của các ca cần trực vào 1 bản sao của state ban đầu."""
+        state = template.copy()
+        off, length = self.ints['slot_off'], self.ints['slot_len']
+        for k, (date, clinic_id, shift_id) in enumerate(self.slot_keys):
+            state.assignments.setdefault(date, {}).setdefault(clinic_id, {})[shift_id] = [
+                self.doc_ids[docs[j]] for j in range(off[k], off[k] + length[k])
+            ]
+        return state
+
+
+# =================================================================
+# KERNEL (1 mã nguồn cho cả Python thuần và Numba)
+# =================================================================
+def _make_kernel(jit):
+    MIN_REST = MIN_REST_HOURS * 60
+    SAME_DAY = SAME_DAY_PENALTY
+    UNITS = MINUTE_UNITS
+
+    @jit
+    def next_rand(x):
+        x ^= (x << 13) & 0xFFFFFFFF
+        x ^= x >> 17
+        x ^= (x << 5) & 0xFFFFFFFF
+        return x
+
+    @jit
+    def pair_penalty(ta, tb, S, rank_start, rank_dur):
+        da = ta // S
+        db = tb // S
+        end_a = da * 1440 + rank_start[ta - da * S] + rank_dur[ta - da * S]
+        start_b = db * 1440 + rank_start[tb - db * S]
+        p = 0
+        if start_b - end_a < MIN_REST:
+            p += 1
+        if da == db:
+            p += SAME_DAY
+        return p
+
+    @jit
+    def rest_delta(occ, base, t, sign, S, NT, rank_start, rank_dur):
+        """Thay đổi phạt nghỉ ngơi khi thêm (sign=1) / bớt (sign=-1) 1 ca tại t - gọi TRƯỚC khi đổi occ."""
+        c = occ[base + t]
+        if sign > 0 and c > 0:
+            return pair_penalty(t, t, S, rank_start, rank_dur)
+        if sign < 0 and c > 1:
+            return -pair_penalty(t, t, S, rank_start, rank_dur)
+        scan = REST_SCAN_DAYS * S
+        p = -1
+        k = t - 1
+        lo = t - scan
+        if lo < 0:
+            lo = 0
+        while k >= lo:
+            if occ[base + k] > 0:
+                p = k
+                break
+            k -= 1
+        n = -1
+        k = t + 1
+        hi = t + scan
+        if hi > NT - 1:
+            hi = NT - 1
+        while k <= hi:
+            if occ[base + k] > 0:
+                n = k
+                break
+            k += 1
+        d = 0
+        if p >= 0:
+            d += pair_penalty(p, t, S, rank_start, rank_dur)
+        if n >= 0:
+            d += pair_penalty(t, n, S, rank_start, rank_dur)
+        if p >= 0 and n >= 0:
+            d -= pair_penalty(p, n, S, rank_start, rank_dur)
+        return d * sign
+
+    @jit
+    def hours_update(win, base, w, minutes, limit):
+        """Cộng `minutes` vào tuần w (w < 0: tuần trước kỳ, bỏ qua); trả về thay đổi số phút vượt ngưỡng."""
+        if w < 0:
+            return 0
+        old = win[base + w]
+        new = old + minutes
+        win[base + w] = new
+        if old > limit or new > limit:
+            return max(0, new - limit) - max(0, old - limit)
+        return 0
+
+    @jit
+    def fairness_apply(cnt, sums, group, group_size, i, v1, v2, sign):
+        """Cập nhật S1/S2 (ca, ca đêm, ca cuối tuần) của nhóm; trả về thay đổi tổng bình phương độ lệch."""
+        g = group[i]
+        if g < 0:
+            return 0.0
+        n = group_size[g]
+        ch = 0.0
+        for m in range(3):
+            step = 1 if m == 0 else (v1 if m == 1 else v2)
+            if step:
+                d = sign * step
+                x = cnt[i * 3 + m]
+                s1 = sums[g * 3 + m]
+                ch += (2 * x + d) * d - (2 * s1 + d) * d / n
+                cnt[i * 3 + m] = x + d
+                sums[g * 3 + m] = s1 + d
+        return ch
+
+    @jit
+    def apply(i, k, sign, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend,
+              day_weekday, day_week, slot_day, slot_rank, leave, pref, group, group_size,
+              occ, win, cnt, sums, out):
+        """Thêm/bớt bác sĩ i vào ca k; ghi (Δhard theo phút, Δsoft) vào out[0], out[1]."""
+        day = slot_day[k]
+        r = slot_rank[k]
+        t = day * S + r
+        dh = 0
+        if leave[i * ND + day]:
+            dh += UNITS * sign
+        dh += UNITS * rest_delta(occ, i * NT, t, sign, S, NT, rank_start, rank_dur)
+        occ[i * NT + t] += sign
+
+        dh += hours_update(win, i * NW, day_week[day], sign * rank_dur[r], limit)
+
+        ds = 0.0 + sign * pref[(i * S + r) * 7 + day_weekday[day]]
+        if weight > 0:
+            ds += weight * fairness_apply(cnt, sums, group, group_size, i, rank_night[r], day_weekend[day], sign)
+        out[0] = dh
+        out[1] = ds
+
+    @jit
+    def load(docs, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend, day_weekday,
+             day_week, slot_day, slot_rank, slot_off, slot_len, leave, pref, group, group_size, fixed_doc, fixed_t,
+             occ, win, cnt, sums, out, energy):
+        """Dựng lại mọi bộ đếm từ danh sách bác sĩ `docs`; energy = [hard (phút), soft]."""
+        for j in range(len(occ)):
+            occ[j] = 0
+        for j in range(len(win)):
+            win[j] = 0
+        for j in range(len(cnt)):
+            cnt[j] = 0
+        for j in range(len(sums)):
+            sums[j] = 0
+        # Đuôi lịch đã chốt: chỉ nạp vào dòng thời gian và giờ làm nền (phần vượt của riêng nó không tính)
+        for j in range(len(fixed_doc)):
+            i = fixed_doc[j]
+            t = fixed_t[j]
+            occ[i * NT + t] += 1
+            hours_update(win, i * NW, day_week[t // S], rank_dur[t - (t // S) * S], limit)
+        hard = 0
+        soft = 0.0
+        for k in range(len(slot_off)):
+            for j in range(slot_off[k], slot_off[k] + slot_len[k]):
+                apply(docs[j], k, 1, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend,
+                      day_weekday, day_week, slot_day, slot_rank, leave, pref, group, group_size,
+                      occ, win, cnt, sums, out)
+                hard += out[0]
+                soft += out[1]
+        energy[0] = hard
+        energy[1] = soft
+
+    @jit
+    def anneal(steps, phase1_budget, hard_T0, hard_T1, soft_T0, soft_T1, seed, weight, missing_units,
+               S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend, day_weekday, day_week,
+               slot_day, slot_rank, slot_clinic, slot_off, slot_len, docs, cand, cand_off, cand_len, role,
+               leave, pref, group, group_size, fixed_doc, fixed_t,
+               occ, win, cnt, sums, out, energy, best_docs, result):
+        """
+        Vòng annealing 2 pha trên `docs` (sửa tại chỗ).
+        result = [hard tốt nhất (phút), soft, số bước pha 1, bước đầu tiên hard đang giữ == 0 (-1: chưa)].
+        """
+        x = seed & 0xFFFFFFFF
+        if x == 0:
+            x = 2463534242
+        n_slots = len(slot_off)
+
+        load(docs, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend, day_weekday,
+             day_week, slot_day, slot_rank, slot_off, slot_len, leave, pref, group, group_size, fixed_doc, fixed_t,
+             occ, win, cnt, sums, out, energy)
+        hard = energy[0] + missing_units
+        soft = energy[1]
+        for j in range(len(docs)):
+            best_docs[j] = docs[j]
+        best_hard = hard
+        best_soft = soft
+        result[3] = 0 if hard <= 0 else -1
+
+        step = 0
+        phase = 1
+        t_factor = -math.log(hard_T0 / hard_T1)
+        phase_start = 0
+        phase_len = phase1_budget
+        while step < steps and n_slots > 0:
+            if phase == 1 and (hard <= 0 or step >= phase1_budget):
+                # Sang pha 2: bắt đầu lại từ lời giải cứng tốt nhất
+                result[2] = step
+                phase = 2
+                for j in range(len(docs)):
+                    docs[j] = best_docs[j]
+                load(docs, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend,
+                     day_weekday, day_week, slot_day, slot_rank, slot_off, slot_len, leave, pref, group, group_size,
+                     fixed_doc, fixed_t, occ, win, cnt, sums, out, energy)
+                hard = energy[0] + missing_units
+                soft = energy[1]
+                best_hard = hard
+                best_soft = soft
+                t_factor = -math.log(soft_T0 / soft_T1)
+                phase_start = step
+                phase_len = steps - step
+                continue
+
+            if phase == 1:
+                T = hard_T0 * math.exp(t_factor * (step - phase_start) / phase_len)
+            else:
+                T = soft_T0 * math.exp(t_factor * (step - phase_start) / phase_len)
+            step += 1
+
+            # Bước đi: thay 1 bác sĩ trong 1 ca bằng người cùng khoa, cùng vai trò
+            x = next_rand(x)
+            k = x % n_slots
+            length = slot_len[k]
+            if length == 0:
+                continue
+            x = next_rand(x)
+            pos = slot_off[k] + x % length
+            doc_out = docs[pos]
+            r = role[doc_out]
+            if r < 0:
+                continue
+            c = slot_clinic[k] * 2 + r
+            if cand_len[c] == 0:
+                continue
+            x = next_rand(x)
+            doc_in = cand[cand_off[c] + x % cand_len[c]]
+            taken = False
+            for j in range(slot_off[k], slot_off[k] + length):
+                if docs[j] == doc_in:
+                    taken = True
+            if taken:
+                continue
+
+            apply(doc_out, k, -1, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend,
+                  day_weekday, day_week, slot_day, slot_rank, leave, pref, group, group_size,
+                  occ, win, cnt, sums, out)
+            d_hard = out[0]
+            d_soft = out[1]
+            apply(doc_in, k, 1, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend,
+                  day_weekday, day_week, slot_day, slot_rank, leave, pref, group, group_size,
+                  occ, win, cnt, sums, out)
+            d_hard += out[0]
+            d_soft += out[1]
+
+            if phase == 1:
+                accept = d_hard <= 0
+                if not accept:
+                    x = next_rand(x)
+                    accept = math.exp(-(d_hard / UNITS) / T) > x / 4294967296.0
+            elif d_hard < 0:
+                accept = True
+            elif d_hard > 0:
+                accept = False
+            else:
+                accept = d_soft <= 0
+                if not accept:
+                    x = next_rand(x)
+                    accept = math.exp(-d_soft / T) > x / 4294967296.0
+
+            if accept:
+                docs[pos] = doc_in
+                hard += d_hard
+                soft += d_soft
+                if hard <= 0 and result[3] < 0:
+                    result[3] = step
+                if hard < best_hard or (phase == 2 and hard == best_hard and soft < best_soft):
+                    best_hard = hard
+                    best_soft = soft
+                    for j in range(len(docs)):
+                        best_docs[j] = docs[j]
+            else:
+                # Hoàn tác
+                apply(doc_in, k, -1, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend,
+                      day_weekday, day_week, slot_day, slot_rank, leave, pref, group, group_size,
+                      occ, win, cnt, sums, out)
+                apply(doc_out, k, 1, weight, S, ND, NT, NW, limit, rank_start, rank_dur, rank_night, day_weekend,
+                      day_weekday, day_week, slot_day, slot_rank, leave, pref, group, group_size,
+                      occ, win, cnt, sums, out)
+
+        if phase == 1:
+            result[2] = step
+        result[0] = best_hard
+        result[1] = best_soft
+
+    return anneal
+
+
+def _identity(fn):
+    return fn
+
+
+def numba_available() -> bool:
+    try:
+        import numba  # noqa: F401
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_kernel(use_jit: bool):
+    """Kernel đã dựng (Numba biên dịch ở lần gọi đầu trong mỗi tiến trình; Python thuần dùng chung mã nguồn)."""
+    global _jit_kernel, _py_kernel
+    if use_jit:
+        if _jit_kernel is None:
+            import numba
+            # cache=False: các hàm con là closure tham chiếu dispatcher của nhau, khóa cache của Numba
+            # (băm closure) đổi theo tiến trình nên đĩa cache không bao giờ trúng. Worker song song
+            # biên dịch 1 lần cho cả vòng đời pool (xem ChainPool trong shared_instance.py).
+            _jit_kernel = _make_kernel(numba.njit(cache=False))
+        return _jit_kernel
+    if _py_kernel is None:
+        _py_kernel = _make_kernel(_identity)
+    return _py_kernel
+
+
+# =================================================================
+# BỘ GIẢI (cùng giao diện với LexicographicAnnealer)
+# =================================================================
+class KernelAnnealer:
+    def __init__(self, initial_state: ScheduleState, cost_function: CostFunction, use_jit: bool | None = None):
+        self.state = initial_state
+        self.cost_function = cost_function
+        self.use_jit = numba_available() if use_jit is None else use_jit
+
+        self.steps = 50000
+        self.feasibility_fraction = 0.7
+        self.hard_Tmax = 2.5
+        self.hard_Tmin = 0.01
+        self.soft_Tmax = 10.0
+        self.soft_Tmin = 0.1
+        # None: lấy từ random (random.seed(...) của caller quyết định kết quả)
+        self.seed = None
+
+        self.phase1_steps = 0
+        self.elapsed = 0.0
+        # Số giây tới khi chi phí cứng đang giữ đầu tiên về 0 (None: chưa khả thi). Vòng lặp chạy trọn
+        # trong kernel nên được ước lượng từ số bước: elapsed * bước khả thi / steps
+        self.time_to_feasible = None
+        self.best_state = None
+        self.best_energy = None
+
+    def schedule(self) -> tuple:
+        """(steps, ngân sách pha 1, hard_Tmax, hard_Tmin, soft_Tmax, soft_Tmin) truyền cho run_chain."""
+        return (self.steps, int(self.steps * self.feasibility_fraction),
+                self.hard_Tmax, self.hard_Tmin, self.soft_Tmax, self.soft_Tmin)
+
+    def anneal(self):
+        """Trả về (state tốt nhất, (hard, soft) tốt nhất) theo đơn vị của CostFunction."""
+        inst = KernelInstance(self.cost_function.ctx, self.state)
+        seed = self.seed if self.seed is not None else random.getrandbits(32)
+        t0 = time.perf_counter()
+        best_docs, hard, soft, self.phase1_steps, feasible_step = run_chain(
+            inst.ints, inst.meta, self.schedule(), seed, self.use_jit)
+        self.elapsed = time.perf_counter() - t0
+        self.time_to_feasible = feasible_time(self.elapsed, feasible_step, self.steps)
+
+        self.best_state = inst.decode(best_docs, self.state)
+        self.best_energy = (hard, soft)
+        return self.best_state, self.best_energy
+
+
+def feasible_time(elapsed: float, feasible_step: int | None, steps: int) -> float | None:
+    if feasible_step is None:
+        return None
+    return elapsed * feasible_step / steps if steps > 0 else 0.0
+
+
+def run_chain(ints, meta: dict, schedule: tuple, seed: int, use_jit: bool):
+    """
+    Chạy 1 chuỗi annealing trên mảng đã mã hóa
+    -> (docs tốt nhất, hard, soft, số bước pha 1, bước đầu tiên khả thi hoặc None).
+    `ints` chỉ được đọc (trừ 'docs' - luôn chép ra bản riêng), nên có thể là list, mảng numpy
+    hoặc memoryview trỏ vào bộ nhớ dùng chung (xem shared_instance.py).
+    """
+    D, ND, NT, NW = meta['D'], meta['ND'], meta['NT'], meta['NW']
+    n_groups = len(ints['group_size'])
+    if use_jit:
+        import numpy as np
+        # np.asarray trên memoryview / ndarray int64 không sao chép dữ liệu
+        arr = {name: np.asarray(values, dtype=np.int64) for name, values in ints.items()}
+        docs = np.array(arr['docs'], dtype=np.int64)
+        zeros_int = lambda n: np.zeros(n, dtype=np.int64)  # noqa: E731
+        zeros_float = lambda n: np.zeros(n, dtype=np.float64)  # noqa: E731
+    else:
+        arr = ints
+        docs = list(arr['docs'])
+        zeros_int = lambda n: [0] * n  # noqa: E731
+        zeros_float = lambda n: [0.0] * n  # noqa: E731
+
+    best_docs = zeros_int(len(docs))
+    result = zeros_float(4)
+    get_kernel(use_jit)(
+        *schedule, seed,
+        meta['fairness_weight'], meta['missing_units'], meta['S'], ND, NT, NW, meta['limit_minutes'],
+        arr['rank_start'], arr['rank_dur'], arr['rank_night'], arr['day_weekend'], arr['day_weekday'],
+        arr['day_week'],
+        arr['slot_day'], arr['slot_rank'], arr['slot_clinic'], arr['slot_off'], arr['slot_len'], docs,
+        arr['cand'], arr['cand_off'], arr['cand_len'], arr['role'],
+        arr['leave'], arr['pref'], arr['group'], arr['group_size'], arr['fixed_doc'], arr['fixed_t'],
+        zeros_int(D * NT), zeros_int(D * NW), zeros_int(D * 3),
+        zeros_int(n_groups * 3), zeros_float(2), zeros_float(2), best_docs, result,
+    )
+    feasible_step = int(result[3])
+    return ([int(x) for x in best_docs], result[0] / MINUTE_UNITS, float(result[1]), int(result[2]),
+            feasible_step if feasible_step >= 0 else None)
@@ -1,18 +1,51 @@
-import random
-import math
-import time
-from simanneal import Annealer
+from __future__ import annotations
+import bisect
 import datetime
+import time
 from collections import defaultdict
 from typing import List, Dict, Tuple, Any 
-from app.models import Doctor, Clinic, Shift, DoctorRole
+
+# Lưu ý: module này KHÔNG import simanneal hay ORM models ở cấp module để worker
+# khởi động nhanh. Bộ giải simanneal nằm ở app/services/annealer.py.
+
+def _role_key(doc) -> str:
+    """'main' / 'sub' theo vai trò bác sĩ (import DoctorRole khi cần)."""
+    from app.models.doctor import DoctorRole
+    return 'main' if doc.role == DoctorRole.MAIN else 'sub'
+
+# Luật lao động: tối đa 48 giờ mỗi tuần lịch (thứ 2 - chủ nhật)
+MAX_WEEKLY_HOURS = 48
+WEEK_DAYS = 7
+# Nghỉ tối thiểu giữa 2 ca (giờ) và mức phạt cứng khi 2 ca cùng ngày
+MIN_REST_HOURS = 12
+SAME_DAY_PENALTY = 2
+# [SOFT] Công bằng: trọng số mặc định của độ lệch khối lượng việc. Mặc định TẮT để hàm mục tiêu
+# của Job không đặt trọng số giữ nguyên như trước; Job bật bằng cách đặt trọng số > 0
+DEFAULT_FAIRNESS_WEIGHT = 0.0
+
+def shift_duration_hours(shift) -> float:
+    """Độ dài thực của ca (giờ). Ca qua đêm (22h-6h) được tính sang ngày hôm sau."""
+    start = shift.start_time.hour * 60 + shift.start_time.minute
+    end = shift.end_time.hour * 60 + shift.end_time.minute
+    minutes = (end - start) % (24 * 60) or 24 * 60
+    return minutes / 60
+
+def rest_penalty(current_span, next_span) -> int:
+    """Phạt cứng giữa 2 ca liên tiếp (span = (bắt đầu, kết thúc, ...)): nghỉ < 12h, cùng ngày."""
+    penalty = 0
+    if (next_span[0] - current_span[1]).total_seconds() / 3600 < MIN_REST_HOURS:
+        penalty += 1
+    if current_span[0].date() == next_span[0].date():
+        penalty += SAME_DAY_PENALTY
+    return penalty
 
 # =================================================================
 # 1. NGỮ CẢNH DỮ LIỆU
 # =================================================================
 class ScheduleContextData:
     def __init__(self, doctors, clinics, shifts, leaves_map, preferences_map, date_range, 
-                 doctors_map, clinics_map, shifts_map):
+                 doctors_map, clinics_map, shifts_map, fixed_shifts=None,
+                 fairness_weight=DEFAULT_FAIRNESS_WEIGHT):
         self.doctors = doctors
         self.clinics = clinics
         self.shifts = shifts
@@ -23,13 +56,200 @@ class ScheduleContextData:
         self.clinics_map = clinics_map
         self.shifts_map = shifts_map
         
+        # Vai trò của từng bác sĩ ('main'/'sub') - tránh truy cập thuộc tính ORM trong vòng lặp
+        self.doctor_role_key = {doc.id: _role_key(doc) for doc in doctors}
+
+        # Độ dài thực của từng ca và tập ca Đêm (cho báo cáo tổng hợp)
+        self.shift_hours = {s.id: shift_duration_hours(s) for s in shifts}
+        self.night_shift_ids = {s.id for s in shifts if "Đêm" in s.name}
+
         # Indexing danh sách bác sĩ theo Khoa và Vai trò để truy xuất nhanh
         self.doctors_by_clinic = defaultdict(lambda: {'main': [], 'sub': []})
         for doc in doctors:
             if doc.clinic_id:
-                role_key = 'main' if doc.role == DoctorRole.MAIN else 'sub'
+                role_key = self.doctor_role_key[doc.id]
                 self.doctors_by_clinic[doc.clinic_id][role_key].append(doc.id)
 
+        # Ca ĐÃ CHỐT ngay trước cửa sổ giải (doc_id -> [(ngày, shift_id)]): không thay đổi được
+        # nhưng được tính vào luật nghỉ ngơi / giờ làm để không vi phạm qua ranh giới
+        self.fixed_shifts = fixed_shifts or {}
+        self.fixed_shift_spans = {
+            doc_id: sorted(self.shift_span(d, sid) for d, sid in items)
+            for doc_id, items in self.fixed_shifts.items()
+        }
+
+        # Giờ làm theo tuần lịch: ngày gốc = thứ 2 của tuần chứa ngày đầu kỳ; giờ của ca đã chốt
+        # trong cùng tuần được nạp sẵn làm nền (base), ca đã chốt ở tuần trước đó không ảnh hưởng
+        self.hours_origin = date_range[0] - datetime.timedelta(days=date_range[0].weekday()) if date_range else None
+        self.hours_weeks = self.day_index(date_range[-1]) // WEEK_DAYS + 1 if date_range else 0
+        self.hours_base = {}
+        for doc_id, items in self.fixed_shifts.items():
+            for d, sid in items:
+                day = self.day_index(d)
+                if day >= 0:
+                    weeks = self.hours_base.setdefault(doc_id, [0.0] * self.hours_weeks)
+                    weeks[day // WEEK_DAYS] += self.shift_hours[sid]
+
+        # Công bằng: nhóm = (khoa chủ quản, vai trò); bác sĩ không thuộc khoa nào không được xét
+        self.fairness_weight = fairness_weight
+        self.weekend_dates = {d for d in date_range if d.weekday() >= 5}
+        self.fairness_group = {}
+        self.fairness_group_sizes = []
+        for roles in self.doctors_by_clinic.values():
+            for doc_ids in roles.values():
+                if doc_ids:
+                    for doc_id in doc_ids:
+                        self.fairness_group[doc_id] = len(self.fairness_group_sizes)
+                    self.fairness_group_sizes.append(len(doc_ids))
+
+    def shift_span(self, date, shift_id):
+        """(giờ bắt đầu, giờ kết thúc) thực của 1 ca - ca qua đêm kết thúc ngày hôm sau."""
+        start = datetime.datetime.combine(date, self.shifts_map[shift_id].start_time)
+        return start, start + datetime.timedelta(hours=self.shift_hours[shift_id])
+
+    def day_index(self, date) -> int:
+        return (date - self.hours_origin).days
+
+    def week_start(self, week: int) -> datetime.date:
+        return self.hours_origin + datetime.timedelta(days=week * WEEK_DAYS)
+
+    def new_hours_tracker(self) -> "WeeklyHoursTracker":
+        return WeeklyHoursTracker(self.hours_weeks, base=self.hours_base)
+
+    def new_fairness_tracker(self) -> "FairnessTracker":
+        return FairnessTracker(self.fairness_group, self.fairness_group_sizes)
+
+    def workload_vector(self, date, shift_id) -> tuple:
+        """Đóng góp của 1 ca vào (số ca, ca đêm, ca cuối tuần)."""
+        return 1, int(shift_id in self.night_shift_ids), int(date in self.weekend_dates)
+
+    def window(self, dates, fixed_shifts=None) -> "ScheduleContextData":
+        """Ngữ cảnh con cho 1 cửa sổ ngày (dùng chung danh mục và các map tra cứu)."""
+        return ScheduleContextData(
+            self.doctors, self.clinics, self.shifts, self.leaves_map, self.preferences_map,
+            list(dates), self.doctors_map, self.clinics_map, self.shifts_map, fixed_shifts=fixed_shifts,
+            fairness_weight=self.fairness_weight,
+        )
+
+# =================================================================
+# 1b. BỘ ĐẾM GIỜ LÀM THEO TUẦN
+# =================================================================
+class WeeklyHoursTracker:
+    """
+    week_hours[doc][w] = tổng giờ các ca BẮT ĐẦU trong tuần lịch w (chỉ số ngày tính từ
+    ctx.hours_origin, tuần = ngày // 7), kể cả ca đã chốt (base).
+    Phần vượt của 1 tuần = max(0, giờ - 48) - max(0, giờ đã chốt - 48): mỗi giờ vượt được tính
+    đúng 1 lần, phần vượt do riêng ca đã chốt (không sửa được) không bị tính.
+    Thêm/bớt 1 ca chỉ cập nhật 1 tuần và tổng overage trong O(1) - không cần quét lại.
+    """
+    def __init__(self, n_weeks: int, limit: float = MAX_WEEKLY_HOURS, base: dict | None = None):
+        self.n_weeks = n_weeks
+        self.limit = limit
+        self.base = base or {}
+        self.week_hours = {}
+        self.doc_overage = defaultdict(float)
+        self.overage = 0.0
+
+    def _weeks(self, doc_id):
+        weeks = self.week_hours.get(doc_id)
+        if weeks is None:
+            base = self.base.get(doc_id)
+            weeks = self.week_hours[doc_id] = list(base) if base else [0.0] * self.n_weeks
+        return weeks
+
+    def add(self, doc_id, day: int, hours: float):
+        self._update(doc_id, day, hours)
+
+    def remove(self, doc_id, day: int, hours: float):
+        self._update(doc_id, day, -hours)
+
+    def add_delta(self, doc_id, day: int, hours: float) -> float:
+        """Số giờ vượt ngưỡng TĂNG THÊM nếu thêm 1 ca (hours < 0: bớt 1 ca) - không thay đổi bộ đếm."""
+        weeks = self.week_hours.get(doc_id) or self.base.get(doc_id)
+        old = weeks[day // WEEK_DAYS] if weeks else 0.0
+        return max(0.0, old + hours - self.limit) - max(0.0, old - self.limit)
+
+    def week_overage(self, doc_id):
+        """(tuần, số giờ vượt được tính) của các tuần vượt ngưỡng của 1 bác sĩ."""
+        base = self.base.get(doc_id)
+        for w, hours in enumerate(self.week_hours.get(doc_id, ())):
+            over = max(0.0, hours - self.limit) - max(0.0, (base[w] if base else 0.0) - self.limit)
+            if over > 0:
+                yield w, over
+
+    def _update(self, doc_id, day: int, delta: float):
+        weeks = self._weeks(doc_id)
+        w = day // WEEK_DAYS
+        old = weeks[w]
+        new = weeks[w] = old + delta
+        if old > self.limit or new > self.limit:
+            change = max(0.0, new - self.limit) - max(0.0, old - self.limit)
+            self.doc_overage[doc_id] += change
+            self.overage += change
+
+# =================================================================
+# 1c. THỐNG KÊ KHỐI LƯỢNG VIỆC (CÔNG BẰNG)
+# =================================================================
+FAIRNESS_METRICS = ('shifts', 'nights', 'weekends')
+
+class FairnessTracker:
+    """
+    Độ lệch khối lượng việc trong từng nhóm (khoa, vai trò), cho 3 chỉ số: số ca, ca đêm, ca cuối tuần.
+    Mỗi nhóm/chỉ số giữ tổng S1 = Σx và tổng bình phương S2 = Σx² trên MỌI bác sĩ của nhóm
+    (kể cả người 0 ca); tổng bình phương độ lệch = S2 - S1²/n (= n * phương sai).
+    Thêm/bớt 1 ca chỉ đổi x của 1 bác sĩ -> cập nhật S1, S2 và tổng `spread` trong O(1).
+    """
+    def __init__(self, group_of: dict, group_sizes: list):
+        self.group_of = group_of
+        self.group_sizes = group_sizes
+        n_metrics = len(FAIRNESS_METRICS)
+        self.counts = defaultdict(lambda: [0] * n_metrics)
+        self.sums = [[0] * n_metrics for _ in group_sizes]
+        self.squares = [[0] * n_metrics for _ in group_sizes]
+        self.spread = 0.0
+
+    def add(self, doc_id, vector):
+        self._update(doc_id, vector, 1)
+
+    def remove(self, doc_id, vector):
+        self._update(doc_id, vector, -1)
+
+    def delta(self, doc_id, vector, sign: int = 1) -> float:
+        """Thay đổi của `spread` nếu thêm (sign=1) / bớt (sign=-1) 1 ca - không thay đổi bộ đếm."""
+        g = self.group_of.get(doc_id)
+        if g is None:
+            return 0.0
+        counts = self.counts.get(doc_id)
+        sums, n = self.sums[g], self.group_sizes[g]
+        change = 0.0
+        for m, step in enumerate(vector):
+            if step:
+                d = sign * step
+                x = counts[m] if counts else 0
+                # Δ(S2 - S1²/n) khi x -> x + d
+                change += (2 * x + d) * d - (2 * sums[m] + d) * d / n
+        return change
+
+    def swap_correction(self, out_doc, in_doc, vector) -> float:
+        """delta(out, -1) + delta(in, +1) tính độc lập lệch 2Σstep²/n so với đổi thật khi 2 người cùng nhóm."""
+        g = self.group_of.get(out_doc)
+        if g is None or g != self.group_of.get(in_doc):
+            return 0.0
+        return 2 * sum(step * step for step in vector) / self.group_sizes[g]
+
+    def _update(self, doc_id, vector, sign: int):
+        g = self.group_of.get(doc_id)
+        if g is None:
+            return
+        self.spread += self.delta(doc_id, vector, sign)
+        counts, sums, squares = self.counts[doc_id], self.sums[g], self.squares[g]
+        for m, step in enumerate(vector):
+            if step:
+                d = sign * step
+                squares[m] += (2 * counts[m] + d) * d
+                sums[m] += d
+                counts[m] += d
+
 # =================================================================
 # 2. TRẠNG THÁI (State)
 # =================================================================
@@ -48,7 +268,74 @@ class ScheduleState:
         return ScheduleState(new_assignments)
 
 # =================================================================
-# 3. HÀM MỤC TIÊU (Cost Function)
+# 3. TỔNG HỢP KẾT QUẢ (Summary) - ghi kèm khi lưu kết quả Job
+# =================================================================
+# Loại vi phạm trong báo cáo chi tiết (thứ tự = mã số trong dạng JSON gọn)
+VIOLATION_KINDS = ('understaffed', 'leave', 'rest', 'same_day', 'over_48h', 'preference')
+MAX_VIOLATION_ROWS = 5000
+
+class ScheduleSummary:
+    """
+    Số liệu tổng hợp của một lịch, được thu thập trong CÙNG lượt quét với hàm mục tiêu:
+        - doctors   : doc_id -> tổng số ca, số giờ, ca đêm, số lần trúng nguyện vọng, số vi phạm
+        - slots     : (ngày, khoa, ca) -> nhân sự thực tế so với định biên
+        - violations: (loại, bác sĩ, ngày, khoa, ca, chi phí) của TỪNG vi phạm; 0 = không áp dụng
+                      (thiếu người: không có bác sĩ; quá 48h: thứ 2 của tuần, không có ca)
+    """
+    def __init__(self):
+        self.doctors = defaultdict(lambda: {
+            "shift_count": 0,
+            "total_hours": 0.0,
+            "night_shifts": 0,
+            "preference_hits": 0,
+            "violations": 0,
+        })
+        self.slots = []
+        self.violations = []
+        self.hard_cost = 0
+        self.soft_cost = 0
+
+    def add_violation(self, kind, doc_id, date, clinic_id, shift_id, cost):
+        self.violations.append((kind, doc_id, date, clinic_id, shift_id, cost))
+
+    def violation_counts(self) -> dict:
+        counts = defaultdict(int)
+        for row in self.violations:
+            counts[row[0]] += 1
+        return {kind: counts[kind] for kind in VIOLATION_KINDS if counts[kind]}
+
+    def violation_report(self) -> dict:
+        """Dạng JSON gọn để lưu cùng Job: mỗi vi phạm là 1 mảng [mã loại, bác sĩ, ngày, khoa, ca, chi phí]."""
+        ordered = sorted(self.violations, key=lambda v: (v[2], v[3], v[4], v[1], v[0]))
+        return {
+            "kinds": list(VIOLATION_KINDS),
+            "counts": self.violation_counts(),
+            "truncated": max(0, len(ordered) - MAX_VIOLATION_ROWS),
+            "rows": [
+                [VIOLATION_KINDS.index(kind), doc_id, date.isoformat(), clinic_id, shift_id,
+                 round(cost, 2) if isinstance(cost, float) else cost]
+                for kind, doc_id, date, clinic_id, shift_id, cost in ordered[:MAX_VIOLATION_ROWS]
+            ],
+        }
+
+    def add_slot(self, date, clinic, shift_id, count_main, count_sub):
+        missing = max(0, clinic.required_main - count_main) + max(0, clinic.required_sub - count_sub)
+        self.slots.append({
+            "slot_date": date,
+            "clinic_id": clinic.id,
+            "shift_id": shift_id,
+            "assigned_main": count_main,
+            "assigned_sub": count_sub,
+            "required_main": clinic.required_main,
+            "required_sub": clinic.required_sub,
+            "missing": missing,
+        })
+
+    def doctor_rows(self):
+        return [{"doctor_id": doc_id, **totals} for doc_id, totals in self.doctors.items()]
+
+# =================================================================
+# 4. HÀM MỤC TIÊU (Cost Function)
 # =================================================================
 class CostFunction:
     def __init__(self, context: ScheduleContextData):
@@ -63,6 +350,10 @@ class CostFunction:
             "bad_rest": 0,
             "preference_bad": 0
         }
+        # (hard, soft) của lần đánh giá gần nhất
+        self.last_breakdown = (0, 0)
+        # PhaseProfiler (app/services/profiling.py) khi Job bật đo hiệu năng
+        self.profiler = None
 
     # Xác định xem khoa này có cần ca này không
     def _is_shift_required(self, clinic_name, shift_name):
@@ -73,7 +364,27 @@ class CostFunction:
         return True
 
     def calculate_cost(self, state: ScheduleState) -> float:
-        total_cost = 0.0
+        hard, soft = self.evaluate(state)
+        return hard * self.W_HARD + soft * self.W_SOFT
+
+    def build_summary(self, state: ScheduleState) -> ScheduleSummary:
+        """Chạy lại hàm mục tiêu 1 lượt, đồng thời thu thập số liệu tổng hợp."""
+        summary = ScheduleSummary()
+        summary.hard_cost, summary.soft_cost = self.evaluate(state, summary)
+        return summary
+
+    def evaluate_hard(self, state: ScheduleState):
+        """Chỉ phần cứng (bỏ qua nguyện vọng, công bằng): dùng ở pha 1 của bộ giải từ điển."""
+        return self.evaluate(state, hard_only=True)[0]
+
+    def evaluate(self, state: ScheduleState, summary: ScheduleSummary | None = None, hard_only: bool = False):
+        """
+        Trả về (hard, soft): số đơn vị vi phạm cứng và tổng điểm phạt mềm.
+        Chi phí gộp = hard * W_HARD + soft * W_SOFT.
+        hard_only=True: bỏ qua các thành phần mềm (soft luôn = 0).
+        """
+        hard = 0
+        soft = 0
         
         stats = {
             "missing_staff": 0,
@@ -83,11 +394,26 @@ class CostFunction:
         }
 
         doc_shift_history = defaultdict(list) 
+        # Báo cáo vi phạm (chỉ ở lượt tổng hợp): span của ca -> vị trí (ngày, khoa, ca)
+        span_slots = {} if summary is not None else None
+
+        # Bấm giờ lấy mẫu từng giai đoạn (chỉ khi bật profiling)
+        profiler = self.profiler
+        timed = profiler is not None and profiler.should_sample()
+        if timed: t_phase = time.perf_counter()
+
+        # Giờ làm theo tuần lịch, cập nhật O(1) mỗi ca trong lúc quét
+        hours_tracker = self.ctx.new_hours_tracker()
+        # Độ lệch khối lượng việc (công bằng), cũng cập nhật O(1) mỗi ca - tắt khi trọng số = 0
+        fairness_weight = self.ctx.fairness_weight
+        fairness = self.ctx.new_fairness_tracker() if fairness_weight and not hard_only else None
+        check_preferences = not hard_only or summary is not None
 
         # --- GIAI ĐOẠN 1: QUÉT TOÀN BỘ CÁC CA ---
         for date in self.ctx.date_range:
             # Lấy dữ liệu ngày (nếu chưa có thì coi là rỗng)
             date_assignments = state.assignments.get(date, {})
+            day = self.ctx.day_index(date)
             
             for clinic in self.ctx.clinics:
                 clinic_id = clinic.id
@@ -104,163 +430,274 @@ class CostFunction:
                     
                     count_main = 0
                     count_sub = 0
-                    shift_start_dt = datetime.datetime.combine(date, shift.start_time)
+                    shift_span = self.ctx.shift_span(date, shift.id)
+                    shift_hours = self.ctx.shift_hours[shift.id]
+                    workload = self.ctx.workload_vector(date, shift.id) if fairness is not None else None
                     
                     # 3. Phân tích nhân sự trong ca
                     for doc_id in doc_ids:
-                        doc = self.ctx.doctors_map.get(doc_id)
-                        if not doc: continue
+                        role_key = self.ctx.doctor_role_key.get(doc_id)
+                        if not role_key: continue
 
-                        if doc.role == DoctorRole.MAIN: count_main += 1
+                        if role_key == 'main': count_main += 1
                         else: count_sub += 1
                         
                         # Ghi nhận lịch sử làm việc
-                        doc_shift_history[doc_id].append(shift_start_dt)
+                        doc_shift_history[doc_id].append(shift_span)
+                        hours_tracker.add(doc_id, day, shift_hours)
+                        if fairness is not None:
+                            fairness.add(doc_id, workload)
                         
                         # [HARD] Check Đơn nghỉ
-                        if self.ctx.leaves_map.get((doc_id, date), False):
-                            total_cost += self.W_HARD
+                        on_leave = self.ctx.leaves_map.get((doc_id, date), False)
+                        if on_leave:
+                            hard += 1
                             stats["bad_rest"] += 1 
 
                         # [SOFT] Check Nguyện vọng
-                        pref_score = self.ctx.preferences_map.get((doc_id, shift.id, date.weekday()), 0)
-                        if pref_score < 0:
-                            total_cost += abs(pref_score) * self.W_SOFT
-                            stats["preference_bad"] += 1
+                        if check_preferences:
+                            pref_score = self.ctx.preferences_map.get((doc_id, shift.id, date.weekday()), 0)
+                            if pref_score < 0:
+                                soft += abs(pref_score)
+                                stats["preference_bad"] += 1
+
+                        if summary is not None:
+                            totals = summary.doctors[doc_id]
+                            totals["shift_count"] += 1
+                            totals["total_hours"] += shift_hours
+                            if shift.id in self.ctx.night_shift_ids:
+                                totals["night_shifts"] += 1
+                            if pref_score > 0:
+                                totals["preference_hits"] += 1
+                            if on_leave:
+                                totals["violations"] += 1
+                                summary.add_violation('leave', doc_id, date, clinic_id, shift.id, 1)
+                            if pref_score < 0:
+                                summary.add_violation('preference', doc_id, date, clinic_id, shift.id, -pref_score)
+                            span_slots[(doc_id, shift_span)] = (date, clinic_id, shift.id)
 
                     # 4. TÍNH PHẠT ĐỊNH BIÊN
                     if count_main < clinic.required_main:
                         missing = clinic.required_main - count_main
-                        total_cost += missing * self.W_HARD
+                        hard += missing
                         stats["missing_staff"] += missing
                     
                     if count_sub < clinic.required_sub:
                         missing = clinic.required_sub - count_sub
-                        total_cost += missing * self.W_HARD
+                        hard += missing
                         stats["missing_staff"] += missing
+
+                    if summary is not None:
+                        summary.add_slot(date, clinic, shift.id, count_main, count_sub)
+                        missing = (max(0, clinic.required_main - count_main)
+                                   + max(0, clinic.required_sub - count_sub))
+                        if missing:
+                            summary.add_violation('understaffed', 0, date, clinic_id, shift.id, missing)
         
+        if timed:
+            t_now = time.perf_counter()
+            profiler.record_component("phase1_slots", t_now - t_phase)
+            t_phase = t_now
+
+        # [SOFT] Công bằng: tổng bình phương độ lệch (ca / ca đêm / ca cuối tuần) trong từng nhóm
+        if fairness is not None:
+            soft += fairness_weight * fairness.spread
+
         # --- GIAI ĐOẠN 2: KIỂM TRA LUẬT LAO ĐỘNG ---
-        SHIFT_DURATION_HOURS = 8 
+        # [HARD] Quá 48h/tuần: số giờ vượt, mỗi tuần tính 1 lần (trừ phần vượt do riêng ca đã chốt)
+        hard += hours_tracker.overage
+        doc_overage = hours_tracker.doc_overage
+
         for doc_id, shifts_list in doc_shift_history.items():
             shifts_list.sort()
+            doc_violations = 0
+
+            # Ca đã chốt (luôn trước cửa sổ) đứng đầu danh sách; chỉ xét các cặp có ca trong cửa sổ
+            n_fixed = 0
+            fixed = self.ctx.fixed_shift_spans.get(doc_id)
+            if fixed:
+                shifts_list[:0] = fixed
+                n_fixed = len(fixed)
             
-            # [HARD] Quá 48h/tuần
-            total_hours = len(shifts_list) * SHIFT_DURATION_HOURS
-            if total_hours > 48:
-                over = total_hours - 48
-                total_cost += over * self.W_HARD 
+            if doc_overage.get(doc_id, 0) > 0:
                 stats["over_48h"] += 1 
+                doc_violations += 1
             
-            # [HARD] Nghỉ ngơi & Trùng ca
-            for i in range(len(shifts_list) - 1):
-                current_start = shifts_list[i]
-                next_start = shifts_list[i+1]
-                current_end = current_start + datetime.timedelta(hours=SHIFT_DURATION_HOURS)
+            # [HARD] Nghỉ ngơi & Trùng ca (giờ kết thúc thực của ca)
+            for i in range(max(0, n_fixed - 1), len(shifts_list) - 1):
+                current_start, current_end = shifts_list[i]
+                next_start = shifts_list[i+1][0]
                 
                 rest_time_hours = (next_start - current_end).total_seconds() / 3600
                 
-                if rest_time_hours < 12:
-                    total_cost += self.W_HARD
+                bad_rest = rest_time_hours < MIN_REST_HOURS
+                same_day = current_start.date() == next_start.date()
+                if bad_rest:
+                    hard += 1
                     stats["bad_rest"] += 1
+                    doc_violations += 1
                 
-                if current_start.date() == next_start.date():
-                     total_cost += self.W_HARD * 2
+                if same_day:
+                     hard += SAME_DAY_PENALTY
                      stats["bad_rest"] += 1
+                     doc_violations += 1
+
+                if summary is not None and (bad_rest or same_day):
+                    # Ghi tại ca SAU của cặp (luôn nằm trong kỳ)
+                    date, clinic_id, shift_id = span_slots[(doc_id, shifts_list[i+1])]
+                    if bad_rest:
+                        summary.add_violation('rest', doc_id, date, clinic_id, shift_id, 1)
+                    if same_day:
+                        summary.add_violation('same_day', doc_id, date, clinic_id, shift_id, SAME_DAY_PENALTY)
+
+            if summary is not None and doc_violations:
+                summary.doctors[doc_id]["violations"] += doc_violations
+
+        if summary is not None:
+            # [HARD] Quá 48h: mỗi tuần vượt ngưỡng là 1 dòng (ghi theo ngày thứ 2 của tuần)
+            for doc_id, over in doc_overage.items():
+                if over <= 0:
+                    continue
+                for w, week_over in hours_tracker.week_overage(doc_id):
+                    summary.add_violation('over_48h', doc_id, self.ctx.week_start(w), 0, 0, week_over)
+
+        if timed:
+            profiler.record_component("phase2_labour", time.perf_counter() - t_phase)
 
         self.current_stats = stats
-        return total_cost
+        self.last_breakdown = (hard, soft)
+        return hard, soft
+
+    def print_detailed_report(self, state: ScheduleState, summary: ScheduleSummary | None = None):
+        if summary is None:
+            summary = self.build_summary(state)
 
-    def print_detailed_report(self, state: ScheduleState):
         print("\n" + "="*60)
         print("BÁO CÁO KẾT QUẢ CHI TIẾT SAU KHI CHẠY")
         print("="*60)
-        # In chi tiết nếu cần
-        pass 
+        gaps = [slot for slot in summary.slots if slot["missing"] > 0]
+        print(f"  • Chi phí cứng: {summary.hard_cost}  |  Chi phí mềm: {summary.soft_cost}")
+        print(f"  • Số ca cần trực: {len(summary.slots)}  |  Ca thiếu người: {len(gaps)}")
+        print(f"  • Số bác sĩ được xếp lịch: {len(summary.doctors)}")
+
+        counts = summary.violation_counts()
+        if counts:
+            print("  • Vi phạm theo loại: " + ", ".join(f"{kind} {n}" for kind, n in counts.items()))
+
+        worst = sorted(summary.doctor_rows(), key=lambda row: row["violations"], reverse=True)[:5]
+        for row in worst:
+            if row["violations"] == 0: break
+            doc = self.ctx.doctors_map.get(row["doctor_id"])
+            doc_name = doc.name if doc else f"ID:{row['doctor_id']}"
+            print(f"    - {doc_name}: {row['violations']} vi phạm, {row['shift_count']} ca, {row['total_hours']:.0f} giờ")
+        print("="*60)
 
 # =================================================================
-# 4. ANNEALER (Bộ giải thuật toán)
+# 5. CHI PHÍ TĂNG DẦN QUA CÁC BƯỚC ANNEALING
 # =================================================================
-class ScheduleAnnealer(Annealer):
-    def __init__(self, initial_state, cost_function):
-        self.cost_function = cost_function
-        super(ScheduleAnnealer, self).__init__(initial_state)
-        
-        # --- CÁC BIẾN THEO DÕI NÂNG CAO ---
-        self.prev_best_energy = float('inf') 
-        self.step_of_last_best = 0           
-        self.last_move_vars = 0              
-
-    def move(self):
-        """Hàm biến đổi trạng thái (Mutation)"""
-        ctx = self.cost_function.ctx
-        self.last_move_vars = 0 # Reset đếm
-        
-        # 1. Chọn ngày, khoa, ca ngẫu nhiên
-        if not ctx.date_range or not ctx.clinics or not ctx.shifts: return
-        date = random.choice(ctx.date_range)
-        clinic_id = random.choice(list(ctx.clinics_map.keys()))
-        
-        existing_shifts = list(self.state.assignments[date][clinic_id].keys())
-        if not existing_shifts: return
-        shift_id = random.choice(existing_shifts)
-        
-        current_docs = self.state.assignments[date][clinic_id][shift_id]
-        if not current_docs: return
-        
-        # 2. Chọn người để thay ra (OUT)
-        doc_out_id = random.choice(current_docs)
-        doc_out = ctx.doctors_map.get(doc_out_id)
-        if not doc_out: return
-
-        # 3. Chọn người thay thế (IN)
-        role_key = 'main' if doc_out.role == DoctorRole.MAIN else 'sub'
-        candidates = ctx.doctors_by_clinic[clinic_id][role_key]
-        
-        if not candidates: return
-        doc_in_id = random.choice(candidates)
-        
-        if doc_in_id in current_docs: return
+class IncrementalCost:
+    """
+    (hard, soft) của 1 state được GIỮ qua các bước annealing thay vì đánh giá lại cả lịch mỗi bước.
+    Dựng 1 lần (1 lượt CostFunction.evaluate + dòng thời gian, giờ làm, khối lượng việc của mọi bác sĩ);
+    mỗi bước "thay out_doc bằng in_doc trong 1 ca" chỉ tính phần thay đổi:
+        - đơn nghỉ, nguyện vọng : tra cứu
+        - nghỉ ngơi / trùng ca  : 2 ca kề bên trên dòng thời gian của từng bác sĩ (bisect)
+        - quá 48h/tuần          : WeeklyHoursTracker.add_delta (1 tuần)
+        - công bằng             : FairnessTracker.delta + swap_correction
+    Thiếu người không đổi vì bước đi luôn thay người CÙNG vai trò.
+    swap_delta() chỉ đọc; apply_swap() cập nhật bộ đếm khi bước được chấp nhận.
+    """
 
-        # Hoán đổi
-        current_docs.remove(doc_out_id)
-        current_docs.append(doc_in_id)
-        
-        self.last_move_vars = 1 
+    def __init__(self, cost_function: CostFunction, state: ScheduleState, hard_only: bool = False):
+        ctx = self.ctx = cost_function.ctx
+        self.hard_only = hard_only
+        self.hard, self.soft = cost_function.evaluate(state, hard_only=hard_only)
+        self.required = {(clinic.id, shift.id) for clinic in ctx.clinics for shift in ctx.shifts
+                         if cost_function._is_shift_required(clinic.name, shift.name)}
+
+        self.fairness_weight = 0 if hard_only else ctx.fairness_weight
+        self.timelines = defaultdict(list)
+        self.tracker = ctx.new_hours_tracker()
+        self.fairness = ctx.new_fairness_tracker() if self.fairness_weight else None
+        for date in ctx.date_range:
+            day = ctx.day_index(date)
+            for clinic_id, shifts in state.assignments.get(date, {}).items():
+                for shift_id, doc_ids in shifts.items():
+                    if (clinic_id, shift_id) not in self.required:
+                        continue
+                    span = ctx.shift_span(date, shift_id)
+                    for doc_id in doc_ids:
+                        if not ctx.doctor_role_key.get(doc_id):
+                            continue
+                        self.timelines[doc_id].append(span)
+                        self.tracker.add(doc_id, day, ctx.shift_hours[shift_id])
+                        if self.fairness is not None:
+                            self.fairness.add(doc_id, ctx.workload_vector(date, shift_id))
+        for doc_id, spans in ctx.fixed_shift_spans.items():
+            self.timelines[doc_id].extend(spans)
+        for timeline in self.timelines.values():
+            timeline.sort()
 
+    @property
     def energy(self):
-        return self.cost_function.calculate_cost(self.state)
-    
-    def update(self, step, T, E, acceptance, improvement):
-        elapsed = time.time() - self.start
+        return self.hard, self.soft
 
-        if acceptance is None: acceptance = 0.0
-        if improvement is None: improvement = 0.0
-        
-        # Tính toán chỉ số Dashboard
-        accept_rate_pct = acceptance * 100
-        good_rate_pct = improvement * 100
-        bad_rate_pct = (acceptance - improvement) * 100
-        
-        current_best = self.best_energy
-        if current_best < self.prev_best_energy:
-            self.prev_best_energy = current_best
-            self.step_of_last_best = step
-            
-        steps_since_imp = step - self.step_of_last_best
-        avg_time_ms = (elapsed / step) * 1000 if step > 0 else 0
-        stats = self.cost_function.current_stats
-        
-        # HIỂN THỊ LOG FORMAT ĐẸP
-        print("-" * 100)
-        print(f" BƯỚC: {step:6d} / {self.steps}  |  Nhiệt độ (T): {T:10.2f}  |  Thời gian: {elapsed:.1f}s")
-        print(f"   ➤ Cost Hiện tại: {E:10.0f}  |   Best Cost: {current_best:10.0f} (Cập nhật cách đây {steps_since_imp} bước)")
-        
-        print(f"   ➤ Trạng thái bước đi:")
-        print(f"     • Thay đổi: {self.last_move_vars} vị trí (ca trực)")
-        print(f"     • Tỷ lệ Chấp nhận: {accept_rate_pct:5.1f}%  ( Tốt: {good_rate_pct:4.1f}% |  Rủi ro: {bad_rate_pct:4.1f}%)")
-        print(f"     • Tốc độ xử lý:    {avg_time_ms:5.2f} ms/bước")
-        
-        print(f"   ➤ Phân tích Lỗi (Ràng buộc):")
-        print(f"     [CỨNG] Thiếu người: {stats['missing_staff']:3d}  |  Quá 48h: {stats['over_48h']:3d}  |  Nghỉ ít/Trùng: {stats['bad_rest']:3d}")
-        print(f"     [MỀM ] Nguyện vọng: {stats['preference_bad']:3d}")
-        print("-" * 100)
\ No newline at end of file
+    def _rest_delta(self, doc_id, span, sign: int) -> int:
+        """Thay đổi phạt nghỉ ngơi/trùng ca khi thêm (sign=1) / bớt (sign=-1) 1 ca của doc_id."""
+        timeline = self.timelines.get(doc_id, ())
+        i = bisect.bisect_left(timeline, span)
+        prev = timeline[i - 1] if i > 0 else None
+        j = i if sign > 0 else i + 1
+        nxt = timeline[j] if j < len(timeline) else None
+        change = 0
+        if prev is not None:
+            change += rest_penalty(prev, span)
+        if nxt is not None:
+            change += rest_penalty(span, nxt)
+        if prev is not None and nxt is not None:
+            change -= rest_penalty(prev, nxt)
+        return sign * change
+
+    def swap_delta(self, date, clinic_id, shift_id, out_doc, in_doc):
+        """(Δhard, Δsoft) nếu thay out_doc bằng in_doc trong ca (date, clinic_id, shift_id)."""
+        if (clinic_id, shift_id) not in self.required:
+            return 0, 0
+        ctx = self.ctx
+        span = ctx.shift_span(date, shift_id)
+        day, hours = ctx.day_index(date), ctx.shift_hours[shift_id]
+
+        hard = int(ctx.leaves_map.get((in_doc, date), False)) - int(ctx.leaves_map.get((out_doc, date), False))
+        hard += self._rest_delta(out_doc, span, -1) + self._rest_delta(in_doc, span, 1)
+        hard += self.tracker.add_delta(out_doc, day, -hours) + self.tracker.add_delta(in_doc, day, hours)
+
+        soft = 0
+        if not self.hard_only:
+            weekday = date.weekday()
+            soft += max(0, -ctx.preferences_map.get((in_doc, shift_id, weekday), 0))
+            soft -= max(0, -ctx.preferences_map.get((out_doc, shift_id, weekday), 0))
+        if self.fairness is not None:
+            vector = ctx.workload_vector(date, shift_id)
+            soft += self.fairness_weight * (self.fairness.delta(out_doc, vector, -1)
+                                            + self.fairness.delta(in_doc, vector)
+                                            + self.fairness.swap_correction(out_doc, in_doc, vector))
+        return hard, soft
+
+    def apply_swap(self, date, clinic_id, shift_id, out_doc, in_doc, delta):
+        """Ghi nhận bước đã được chấp nhận (delta = kết quả swap_delta của chính bước đó)."""
+        # Làm tròn để sai số dấu phẩy động (giờ lẻ, công bằng) không tích lũy qua hàng chục nghìn bước
+        self.hard = round(self.hard + delta[0], 9)
+        self.soft = round(self.soft + delta[1], 9)
+        if (clinic_id, shift_id) not in self.required:
+            return
+        ctx = self.ctx
+        span = ctx.shift_span(date, shift_id)
+        timeline = self.timelines[out_doc]
+        del timeline[bisect.bisect_left(timeline, span)]
+        bisect.insort(self.timelines[in_doc], span)
+        day, hours = ctx.day_index(date), ctx.shift_hours[shift_id]
+        self.tracker.remove(out_doc, day, hours)
+        self.tracker.add(in_doc, day, hours)
+        if self.fairness is not None:
+            vector = ctx.workload_vector(date, shift_id)
+            self.fairness.remove(out_doc, vector)
+            self.fairness.add(in_doc, vector)
@@ -0,0 +1,123 @@
+"""
+Sinh dữ liệu bệnh viện TỔNG HỢP (synthetic) có tham số, tất định theo seed.
+
+Chỉ dùng thư viện chuẩn và trả về các dict thuần (không ORM) để dùng chung cho:
+    - `flask seed scale` (app/seeder.py): ghi vào CSDL bằng INSERT hàng loạt
+    - benchmark solver không cần CSDL (benchmarks/bench_solver.py)
+Quan hệ giữa các bảng được biểu diễn bằng CHỈ SỐ trong danh sách (clinic_index,
+doctor_index, shift_index) vì id thật chỉ có sau khi ghi CSDL.
+"""
+import datetime
+import random
+
+SHIFT_TEMPLATES = [
+    ("Ca Sáng (6h-14h)", datetime.time(6, 0), datetime.time(14, 0)),
+    ("Ca Chiều (14h-22h)", datetime.time(14, 0), datetime.time(22, 0)),
+    ("Ca Đêm (22h-6h)", datetime.time(22, 0), datetime.time(6, 0)),
+]
+
+SPECIALTIES = [
+    "Cấp Cứu", "Hồi Sức", "Nội Trú", "Mắt", "Da Liễu", "Tai Mũi Họng", "Răng Hàm Mặt",
+    "Y Học Cổ Truyền", "Vật Lý Trị Liệu", "Dinh Dưỡng", "Tim Mạch", "Nhi", "Sản", "Ngoại",
+]
+
+FIRST_NAMES = ["An", "Bảo", "Chi", "Dũng", "Giang", "Hà", "Hùng", "Lan", "Linh", "Minh",
+               "Nam", "Ngọc", "Phong", "Quân", "Sơn", "Tâm", "Thảo", "Trang", "Tuấn", "Vân"]
+LAST_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Phan", "Vũ", "Đặng", "Bùi", "Đỗ"]
+
+# Số ca tối đa một bác sĩ làm trong 1 tuần khi ước lượng định biên (5 ca x 8h < 48h,
+# chừa chỗ cho đơn nghỉ và luật nghỉ 12h giữa 2 ca)
+SHIFTS_PER_DOCTOR_WEEK = 5
+
+
+def generate_hospital(clinics: int = 10, doctors_per_clinic: int = 3, main_ratio: float = 0.67,
+                      ratio_247: float = 0.3, leave_density: float = 0.05,
+                      preference_density: float = 0.2, horizon_days: int = 31,
+                      start_date: datetime.date = datetime.date(2025, 12, 1), seed: int = 42) -> dict:
+    """
+    Sinh 1 bệnh viện tổng hợp.
+        main_ratio         : tỷ lệ bác sĩ Chính trong mỗi khoa
+        ratio_247          : tỷ lệ khoa trực 24/7 (cần cả ca Đêm)
+        leave_density      : tỷ lệ (bác sĩ, ngày) trong kỳ có đơn nghỉ
+        preference_density : tỷ lệ ô (bác sĩ, ca, thứ) có nguyện vọng
+    Định biên mỗi khoa được suy ra từ số bác sĩ sao cho mỗi bác sĩ làm không quá
+    SHIFTS_PER_DOCTOR_WEEK ca/tuần (dưới trần 48h). Mỗi ca cần ít nhất 1 bác sĩ Chính:
+    khoa có quá ít bác sĩ Chính để phủ mọi ca cần trực thì được THÊM bác sĩ Chính, nên
+    `doctors_per_clinic` là số tối thiểu (khoa 24/7 cần >= 5 Chính, khoa thường >= 3).
+    Bác sĩ Phụ không đủ thì định biên Phụ = 0. Đơn nghỉ không làm khoa thiếu người trong ngày.
+    Đây là điều kiện cần về số người, không phải chứng minh khả thi (luật nghỉ 12h vẫn có thể chặn).
+    """
+    rng = random.Random(seed)
+    data = {"shifts": [], "clinics": [], "doctors": [], "leaves": [], "preferences": []}
+
+    for name, start, end in SHIFT_TEMPLATES:
+        data["shifts"].append({"name": name, "start_time": start, "end_time": end})
+
+    # (khoa, vai trò) -> (số bác sĩ, số người phải đi làm mỗi ngày - 1 người chỉ trực 1 ca/ngày)
+    daily_need = {}
+    n_247 = round(clinics * ratio_247)
+    n_main = max(1, round(doctors_per_clinic * main_ratio))
+    n_sub = max(0, doctors_per_clinic - n_main)
+
+    for c in range(clinics):
+        is_247 = c < n_247
+        specialty = SPECIALTIES[c % len(SPECIALTIES)]
+        name = f"Khoa {specialty} {c + 1}" + (" (24/7)" if is_247 else "")
+        shifts_needed = 3 if is_247 else 2
+        # Số lượt (bác sĩ, ca) cần trực trong 1 tuần cho mỗi người trong định biên
+        week_slots = 7 * shifts_needed
+        required_main = max(1, n_main * SHIFTS_PER_DOCTOR_WEEK // week_slots)
+        required_sub = n_sub * SHIFTS_PER_DOCTOR_WEEK // week_slots
+        # Đủ bác sĩ Chính để phủ định biên mà không ai vượt SHIFTS_PER_DOCTOR_WEEK ca/tuần
+        clinic_main = max(n_main, -(-required_main * week_slots // SHIFTS_PER_DOCTOR_WEEK))
+        data["clinics"].append({
+            "name": name,
+            "required_main": required_main,
+            "required_sub": required_sub,
+        })
+        daily_need[(c, "MAIN")] = (clinic_main, shifts_needed * required_main)
+        daily_need[(c, "SUB")] = (n_sub, shifts_needed * required_sub)
+        for i in range(clinic_main + n_sub):
+            data["doctors"].append({
+                "name": f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)} {c + 1}.{i + 1}",
+                "specialty": name,
+                "role": "MAIN" if i < clinic_main else "SUB",
+                "clinic_index": c,
+            })
+
+    week_cells = [(s, d) for s in range(len(SHIFT_TEMPLATES)) for d in range(7)]
+    on_leave = {}
+    for doc_index, doctor in enumerate(data["doctors"]):
+        # Đơn nghỉ: bỏ ngày mà nếu nghỉ thêm thì khoa không còn đủ người cùng vai trò để phủ các ca
+        group = (doctor["clinic_index"], doctor["role"])
+        headcount, need = daily_need[group]
+        for day in rng.sample(range(horizon_days), _rounded(rng, horizon_days * leave_density, horizon_days)):
+            if headcount - on_leave.get((group, day), 0) <= need:
+                continue
+            on_leave[(group, day)] = on_leave.get((group, day), 0) + 1
+            data["leaves"].append({
+                "doctor_index": doc_index,
+                "date": start_date + datetime.timedelta(days=day),
+                "reason": "Việc riêng",
+                "status": "Approved",
+            })
+        # Nguyện vọng (mỗi ô (ca, thứ) tối đa 1 dòng)
+        for shift_index, day_of_week in rng.sample(week_cells, _rounded(rng, len(week_cells) * preference_density, len(week_cells))):
+            data["preferences"].append({
+                "doctor_index": doc_index,
+                "shift_index": shift_index,
+                "day_of_week": day_of_week,
+                "preference_score": rng.choice([-10, -5, 5, 10]),
+            })
+
+    data["start_date"] = start_date
+    data["end_date"] = start_date + datetime.timedelta(days=horizon_days - 1)
+    return data
+
+
+def _rounded(rng: random.Random, expected: float, upper: int) -> int:
+    """Làm tròn ngẫu nhiên để kỳ vọng đúng bằng `expected` (kể cả khi < 1)."""
+    k = int(expected)
+    if rng.random() < expected - k:
+        k += 1
+    return max(0, min(upper, k))
@@ -0,0 +1,71 @@
+"""
+Điểm vào (entry point) gọn nhẹ cho tiến trình chạy solver.
+
+Tiến trình con KHÔNG dựng lại cả ứng dụng Flask (create_app, blueprint, CLI seeder,
+connection pool) chỉ để chạy một bài toán tính toán thuần CPU. Nó chỉ cần:
+    - 1 kết nối CSDL (NullPool: mở khi cần, đóng ngay khi xong)
+    - các module solver (import muộn bên trong hàm)
+
+Module này cố ý chỉ import thư viện chuẩn ở cấp module để `spawn` trên Windows
+(và `benchmarks/bench_worker_startup.py`) import nó thật nhanh.
+"""
+from __future__ import annotations
+import os
+import time
+
+
+def run_job_in_worker(job_id: int, db_uri: str | None = None):
+    """Chạy một SchedulingJob trong tiến trình hiện tại, không cần Flask app context."""
+    t0 = time.perf_counter()
+    # Tiến trình fork từ web app: bắt đầu số liệu từ 0, ghi ra file riêng của worker
+    from app.metrics import registry
+    registry.reset()
+
+    db_uri = db_uri or os.environ.get('SQLALCHEMY_DATABASE_URI')
+    if not db_uri:
+        raise RuntimeError("SQLALCHEMY_DATABASE_URI is not set. Check your .env file.")
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import NullPool
+    from app import engine_options
+    from app.services.scheduling_service import SchedulingService
+
+    engine = create_engine(db_uri, poolclass=NullPool, **engine_options(db_uri))
+    print(f"--- [AI] Worker sẵn sàng sau {(time.perf_counter() - t0) * 1000:.0f} ms (Job {job_id}) ---")
+    try:
+        with Session(engine) as session:
+            try:
+                print(f"--- [AI] Bắt đầu chạy Job {job_id} ---")
+                SchedulingService(session).run_scheduling_job(job_id)
+                print(f"--- [AI] Hoàn tất Job {job_id} ---")
+            except Exception as e:
+                print(f"--- [AI] Lỗi Job {job_id}: {e} ---")
+                _mark_job_failed(session, job_id, e)
+    finally:
+        engine.dispose()
+        # Ghi số liệu của Job cho endpoint /metrics của web app
+        registry.flush(final=True)
+
+
+def _mark_job_failed(session, job_id: int, error: Exception):
+    # Cập nhật trạng thái lỗi (best-effort, giống logic cũ trong main_routes)
+    try:
+        from app.models import SchedulingJob
+        from app.models.scheduling_job import JobStatus
+        session.rollback()
+        job = session.get(SchedulingJob, job_id)
+        if job:
+            job.status = JobStatus.FAILED
+            job.status_message = str(error)[:500]
+            session.commit()
+    except Exception:
+        pass
+
+
+if __name__ == '__main__':
+    # Cho phép chạy tay: python -m app.worker <job_id>
+    import sys
+    from dotenv import load_dotenv
+    load_dotenv()
+    run_job_in_worker(int(sys.argv[1]))
@@ -0,0 +1,276 @@
+"""
+Benchmark BỘ GIẢI (solver) trên dữ liệu tổng hợp, KHÔNG cần CSDL.
+
+Mỗi trường hợp (case) là 1 bệnh viện sinh bởi app/services/synthetic_data.py với
+seed cố định, được dựng thẳng thành ScheduleContextData (đối tượng SimpleNamespace
+thay cho ORM). Với mỗi (case, engine) đo:
+    - steps_per_sec          : số bước giải / giây
+    - time_to_feasible_s     : thời gian tới lời giải đầu tiên không vi phạm cứng (hard == 0), theo
+                               chi phí cứng mà chính bộ giải theo dõi (annealer.time_to_feasible)
+    - final_hard / final_soft: chi phí của lời giải tốt nhất
+    - peak_mem_mb            : đỉnh bộ nhớ Python (tracemalloc) khi dựng ngữ cảnh + giải
+                               một đoạn ngắn (đo riêng để không làm chậm lượt đo tốc độ)
+
+Cách chạy (từ thư mục doctor-scheduler-python):
+    python benchmarks/bench_solver.py --grid quick --steps 5000 --output bench.json
+    python benchmarks/bench_solver.py --grid quick --baseline bench.json --threshold 0.2
+Với --baseline: thoát mã 1 nếu tốc độ giảm hoặc chi phí tăng quá ngưỡng (dùng làm cổng CI).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.services.synthetic_data import generate_hospital  # noqa: E402
+from app.services.solver_service import (  # noqa: E402
+    CostFunction, ScheduleContextData, ScheduleState,
+)
+
+# Số chuỗi song song của engine 'kernel_par'
+KERNEL_CHAINS = 4
+
+# (tên, số khoa, bác sĩ/khoa, số ngày)
+GRIDS = {
+    'quick': [
+        ('c5_d4_14', 5, 4, 14),
+        ('c10_d6_31', 10, 6, 31),
+    ],
+    'full': [
+        ('c5_d4_14', 5, 4, 14),
+        ('c10_d6_31', 10, 6, 31),
+        ('c20_d8_31', 20, 8, 31),
+        ('c40_d10_31', 40, 10, 31),
+        ('c40_d10_90', 40, 10, 90),
+    ],
+}
+
+MEMORY_PROBE_STEPS = 1000
+# Lượt chạy ngắn không tính giờ trước khi đo: Numba biên dịch, pool worker khởi động
+WARMUP_STEPS = 100
+
+# Pool của 'kernel_par' dùng lại cho mọi case (như 1 Job dùng lại cho mọi cửa sổ)
+_chain_pool = None
+
+
+# =================================================================
+# DỰNG NGỮ CẢNH TỪ DỮ LIỆU TỔNG HỢP
+# =================================================================
+def build_context(data: dict) -> ScheduleContextData:
+    """Chuyển dict của generate_hospital thành ScheduleContextData (id = chỉ số + 1)."""
+    from app.models.doctor import DoctorRole
+
+    shifts = [SimpleNamespace(id=i + 1, **s) for i, s in enumerate(data["shifts"])]
+    clinics = [SimpleNamespace(id=i + 1, **c) for i, c in enumerate(data["clinics"])]
+    doctors = [
+        SimpleNamespace(id=i + 1, name=d["name"], specialty=d["specialty"],
+                        role=DoctorRole[d["role"]], clinic_id=d["clinic_index"] + 1)
+        for i, d in enumerate(data["doctors"])
+    ]
+    leaves_map = {(l["doctor_index"] + 1, l["date"]): True for l in data["leaves"]}
+    preferences_map = {
+        (p["doctor_index"] + 1, p["shift_index"] + 1, p["day_of_week"]): p["preference_score"]
+        for p in data["preferences"]
+    }
+    date_range = []
+    curr = data["start_date"]
+    while curr <= data["end_date"]:
+        date_range.append(curr)
+        curr += datetime.timedelta(days=1)
+
+    return ScheduleContextData(
+        doctors, clinics, shifts, leaves_map, preferences_map, date_range,
+        {d.id: d for d in doctors}, {c.id: c for c in clinics}, {s.id: s for s in shifts},
+    )
+
+
+def initial_state(ctx: ScheduleContextData) -> ScheduleState:
+    # _create_smart_initial_solution không dùng CSDL -> truyền session None
+    from app.services.scheduling_service import SchedulingService
+    return ScheduleState(SchedulingService(None)._create_smart_initial_solution(ctx))
+
+
+# =================================================================
+# ENGINE: (ctx, state ban đầu, cost_function, steps) -> annealer đã chạy xong
+# =================================================================
+# Không đo khả thi qua CostFunction.evaluate: các bộ giải chỉ tính chi phí delta (IncrementalCost /
+# kernel), evaluate hầu như không được gọi trong vòng lặp.
+def run_simanneal(ctx, state, cost_function, steps):
+    from app.services.annealer import ScheduleAnnealer
+    annealer = ScheduleAnnealer(state, cost_function)
+    annealer.Tmax = 25000.0
+    annealer.Tmin = 2.5
+    annealer.steps = steps
+    annealer.updates = 0  # tắt log tiến trình
+    annealer.anneal()
+    return annealer
+
+
+def run_lexicographic(ctx, state, cost_function, steps):
+    from app.services.lexicographic_annealer import LexicographicAnnealer
+    annealer = LexicographicAnnealer(state, cost_function)
+    annealer.steps = steps
+    annealer.updates = 0
+    annealer.anneal()
+    return annealer
+
+
+def run_kernel(ctx, state, cost_function, steps, use_jit=None):
+    # use_jit=None: Numba nếu cài được, ngược lại Python thuần (cùng kết quả với cùng seed)
+    from app.services.solver_kernel import KernelAnnealer
+    annealer = KernelAnnealer(state, cost_function, use_jit=use_jit)
+    annealer.steps = steps
+    annealer.anneal()
+    return annealer
+
+
+def run_kernel_python(ctx, state, cost_function, steps):
+    return run_kernel(ctx, state, cost_function, steps, use_jit=False)
+
+
+def run_kernel_parallel(ctx, state, cost_function, steps, chains=KERNEL_CHAINS):
+    # Mỗi chuỗi chạy `steps` bước trong 1 worker riêng, cùng gắn vào 1 vùng shared memory
+    global _chain_pool
+    from app.services.shared_instance import ChainPool, ParallelKernelAnnealer
+    if _chain_pool is None:
+        _chain_pool = ChainPool(min(chains, os.cpu_count() or 1))
+    annealer = ParallelKernelAnnealer(state, cost_function, chains=chains, pool=_chain_pool)
+    annealer.steps = steps
+    annealer.anneal()
+    return annealer
+
+
+ENGINES = {
+    'simanneal': run_simanneal,
+    'lexicographic': run_lexicographic,
+    'kernel': run_kernel,
+    'kernel_py': run_kernel_python,
+    'kernel_par': run_kernel_parallel,
+}
+
+
+def run_case(case, engine_name: str, steps: int, seed: int) -> dict:
+    name, clinics, doctors_per_clinic, days = case
+    data = generate_hospital(clinics=clinics, doctors_per_clinic=doctors_per_clinic,
+                             horizon_days=days, seed=seed)
+    engine = ENGINES[engine_name]
+
+    warmup_ctx = build_context(data)
+    engine(warmup_ctx, initial_state(warmup_ctx), CostFunction(warmup_ctx), WARMUP_STEPS)
+
+    # Lượt 1: đo tốc độ và chất lượng (không bật tracemalloc)
+    ctx = build_context(data)
+    random.seed(seed)
+    state = initial_state(ctx)
+    t0 = time.perf_counter()
+    annealer = engine(ctx, state, CostFunction(ctx), steps)
+    elapsed = time.perf_counter() - t0
+    hard, soft = CostFunction(ctx).evaluate(annealer.best_state)
+
+    # Lượt 2: đỉnh bộ nhớ khi dựng ngữ cảnh + giải một đoạn ngắn
+    tracemalloc.start()
+    probe_ctx = build_context(data)
+    random.seed(seed)
+    engine(probe_ctx, initial_state(probe_ctx), CostFunction(probe_ctx), min(steps, MEMORY_PROBE_STEPS))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'case': name,
+        'engine': engine_name,
+        'doctors': len(ctx.doctors),
+        'clinics': len(ctx.clinics),
+        'days': len(ctx.date_range),
+        'steps': steps,
+        'elapsed_s': round(elapsed, 3),
+        'steps_per_sec': round(steps / elapsed, 1) if elapsed > 0 else None,
+        'time_to_feasible_s': (round(annealer.time_to_feasible, 3)
+                               if annealer.time_to_feasible is not None else None),
+        'final_hard': hard,
+        'final_soft': soft,
+        'peak_mem_mb': round(peak / 2**20, 2),
+    }
+
+
+# =================================================================
+# SO SÁNH VỚI BASELINE
+# =================================================================
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """Trả về danh sách mô tả các hồi quy (regression) vượt ngưỡng."""
+    base_rows = {(r['case'], r['engine']): r for r in baseline.get('results', [])}
+    regressions = []
+    for row in results:
+        base = base_rows.get((row['case'], row['engine']))
+        if not base:
+            continue
+        label = f"{row['case']}/{row['engine']}"
+        if base['steps_per_sec'] and row['steps_per_sec'] < base['steps_per_sec'] * (1 - threshold):
+            regressions.append(f"{label}: steps/s {row['steps_per_sec']} < baseline {base['steps_per_sec']}")
+        if row['final_hard'] > base['final_hard']:
+            regressions.append(f"{label}: hard {row['final_hard']} > baseline {base['final_hard']}")
+        elif row['final_hard'] == base['final_hard'] and row['final_soft'] > base['final_soft'] * (1 + threshold):
+            regressions.append(f"{label}: soft {row['final_soft']} > baseline {base['final_soft']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--grid', choices=sorted(GRIDS), default='quick')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument('--steps', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+    parser.add_argument('--baseline', help='File JSON kết quả cũ để so sánh')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Ngưỡng hồi quy tương đối (mặc định 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = []
+    for case in GRIDS[args.grid]:
+        for engine_name in args.engines:
+            row = run_case(case, engine_name, args.steps, args.seed)
+            results.append(row)
+            ttf = row['time_to_feasible_s']
+            print(f"{row['case']:12s} {row['engine']:10s} {row['steps_per_sec']:>10} steps/s  "
+                  f"feasible@{'-' if ttf is None else f'{ttf:.2f}s':>8}  "
+                  f"hard {row['final_hard']:7.1f}  soft {row['final_soft']:8.1f}  "
+                  f"mem {row['peak_mem_mb']:7.2f} MB")
+
+    if _chain_pool is not None:
+        _chain_pool.close()
+
+    report = {
+        'meta': {
+            'grid': args.grid,
+            'steps': args.steps,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("Không có hồi quy so với baseline.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Đo thời gian KHỞI ĐỘNG tiến trình solver (không tính thời gian giải).
+
+So sánh 2 cách chạy tiến trình con (spawn - giống Windows):
+    - legacy : create_app() đầy đủ (Flask, Flask-Migrate, blueprint, CLI seeder)
+    - worker : app.worker + các module solver (chỉ SQLAlchemy engine, không Flask)
+
+Cách chạy (từ thư mục doctor-scheduler-python):
+    python benchmarks/bench_worker_startup.py --runs 5
+Không cần CSDL thật: engine được tạo với URI sqlite trong bộ nhớ và không mở kết nối.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+DUMMY_DB_URI = 'sqlite://'
+
+
+def _legacy_startup(queue, t_spawn):
+    os.environ.setdefault('SQLALCHEMY_DATABASE_URI', DUMMY_DB_URI)
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        from app.services.scheduling_service import SchedulingService  # noqa: F401
+        from app.services.annealer import ScheduleAnnealer  # noqa: F401
+    queue.put(time.time() - t_spawn)
+
+
+def _worker_startup(queue, t_spawn):
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+    import app.worker  # noqa: F401
+    from app.services.scheduling_service import SchedulingService  # noqa: F401
+    from app.services.annealer import ScheduleAnnealer  # noqa: F401
+    create_engine(DUMMY_DB_URI, poolclass=NullPool).dispose()
+    queue.put(time.time() - t_spawn)
+
+
+MODES = {'legacy': _legacy_startup, 'worker': _worker_startup}
+
+
+def measure(mode: str, runs: int) -> list:
+    ctx = multiprocessing.get_context('spawn')
+    samples = []
+    for _ in range(runs):
+        queue = ctx.Queue()
+        p = ctx.Process(target=MODES[mode], args=(queue, time.time()))
+        p.start()
+        samples.append(queue.get(timeout=120) * 1000)
+        p.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='Ghi kết quả ra file JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for mode in MODES:
+        samples = measure(mode, args.runs)
+        results[mode] = {
+            'median_ms': round(statistics.median(samples), 1),
+            'min_ms': round(min(samples), 1),
+            'max_ms': round(max(samples), 1),
+        }
+        print(f"{mode:7s}: median {results[mode]['median_ms']:8.1f} ms  "
+              f"(min {results[mode]['min_ms']:.1f} / max {results[mode]['max_ms']:.1f})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
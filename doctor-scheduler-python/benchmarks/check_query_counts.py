@@ -0,0 +1,148 @@
+"""
+Kiểm tra hồi quy SỐ TRUY VẤN SQL của từng trang (không cần SQL Server).
+
+Dựng ứng dụng trên SQLite trong bộ nhớ, gieo một bệnh viện nhỏ, đếm số câu lệnh
+SQL mà mỗi route phát sinh; sau đó thêm nhiều Job đã hoàn thành (kèm assignments)
+và đếm lại. Thất bại (exit code 1) nếu:
+    - một route vượt ngân sách QUERY_BUDGETS, hoặc
+    - số truy vấn của một route TĂNG theo số Job / assignments đã chạy.
+
+Cách chạy (từ thư mục doctor-scheduler-python):
+    python benchmarks/check_query_counts.py
+"""
+import datetime
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.models import (
+    Doctor, Clinic, Shift, LeaveRequest, SchedulePreference, SchedulingJob, Assignment, DoctorRole
+)
+from app.models.scheduling_job import JobStatus
+from app.services.result_cache import result_cache
+from app.services.solver_service import VIOLATION_KINDS
+
+# Số truy vấn tối đa cho phép của mỗi trang
+QUERY_BUDGETS = {
+    '/': 4,
+    '/doctors': 1,
+    '/clinics': 1,
+    '/shifts': 1,
+    '/leave_requests': 2,
+    '/preferences': 3,
+    '/scheduling': 2,
+    '/scheduling/results/{job_id}': 6,
+    '/calendar/{job_id}': 6,
+}
+
+
+def seed_hospital():
+    shifts = [
+        Shift(name="Ca Sáng (6h-14h)", start_time=datetime.time(6), end_time=datetime.time(14)),
+        Shift(name="Ca Chiều (14h-22h)", start_time=datetime.time(14), end_time=datetime.time(22)),
+        Shift(name="Ca Đêm (22h-6h)", start_time=datetime.time(22), end_time=datetime.time(6)),
+    ]
+    clinics = [Clinic(name=f"Khoa {i}", required_main=1, required_sub=0) for i in range(4)]
+    db.session.add_all(shifts + clinics)
+    db.session.flush()
+    doctors = [
+        Doctor(name=f"Bác sĩ {c.id}-{i}", specialty=c.name, clinic_id=c.id,
+               role=DoctorRole.MAIN if i < 2 else DoctorRole.SUB)
+        for c in clinics for i in range(3)
+    ]
+    db.session.add_all(doctors)
+    db.session.flush()
+    db.session.add_all([LeaveRequest(doctor_id=d.id, date=datetime.date(2025, 12, 1), status="Approved")
+                        for d in doctors[:3]])
+    db.session.add_all([SchedulePreference(doctor_id=d.id, shift_id=shifts[0].id, day_of_week=0,
+                                           preference_score=10) for d in doctors[:3]])
+    db.session.commit()
+    return doctors, clinics, shifts
+
+
+def add_completed_jobs(count, doctors, clinics, shifts, days=14):
+    start = datetime.date(2025, 12, 1)
+    job = None
+    for n in range(count):
+        job = SchedulingJob(name=f"Job {n}", start_date=start, end_date=start + datetime.timedelta(days=days - 1),
+                            status=JobStatus.COMPLETED, status_message="Hoàn thành với chi phí: 0.00",
+                            finished_at=datetime.datetime.now(datetime.timezone.utc))
+        db.session.add(job)
+        db.session.flush()
+        rows = [
+            {"assignment_date": start + datetime.timedelta(days=d), "doctor_id": doc.id,
+             "clinic_id": doc.clinic_id, "shift_id": shifts[(d + k) % len(shifts)].id, "job_id": job.id}
+            for d in range(days) for k, doc in enumerate(doctors)
+        ]
+        db.session.execute(insert(Assignment), rows)
+        # Báo cáo vi phạm như solver lưu (để đo cả phần hiển thị vi phạm của trang kết quả)
+        doc = doctors[0]
+        job.violation_counts = json.dumps({"understaffed": 1, "leave": 1, "over_48h": 1})
+        job.violation_report = json.dumps({
+            "kinds": list(VIOLATION_KINDS),
+            "counts": json.loads(job.violation_counts),
+            "truncated": 0,
+            "rows": [
+                [VIOLATION_KINDS.index("understaffed"), 0, start.isoformat(), clinics[-1].id, shifts[2].id, 1],
+                [VIOLATION_KINDS.index("leave"), doc.id, start.isoformat(), doc.clinic_id, shifts[0].id, 1],
+                [VIOLATION_KINDS.index("over_48h"), doc.id, start.isoformat(), 0, 0, 8.0],
+            ],
+        })
+    db.session.commit()
+    return job
+
+
+def count_queries(app, client, path):
+    # Số truy vấn do middleware app/query_counter.py đếm (header X-DB-Query-Count)
+    result_cache.clear()
+    response = client.get(path)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{path} -> HTTP {response.status_code}")
+    return int(response.headers['X-DB-Query-Count'])
+
+
+def measure_all(app, client, job_id):
+    return {route: count_queries(app, client, route.format(job_id=job_id)) for route in QUERY_BUDGETS}
+
+
+def main():
+    app = create_app()
+    app.config['TESTING'] = True
+    failures = []
+    with app.app_context():
+        db.create_all()
+        doctors, clinics, shifts = seed_hospital()
+        job = add_completed_jobs(1, doctors, clinics, shifts)
+        client = app.test_client()
+
+        small = measure_all(app, client, job.id)
+        job = add_completed_jobs(20, doctors, clinics, shifts)
+        large = measure_all(app, client, job.id)
+
+    print(f"{'Route':35s} {'1 job':>6s} {'21 jobs':>8s} {'budget':>7s}")
+    for route, budget in QUERY_BUDGETS.items():
+        status = ''
+        if large[route] > budget:
+            status = '  <-- VƯỢT NGÂN SÁCH'
+        elif large[route] > small[route]:
+            status = '  <-- TĂNG THEO SỐ JOB'
+        if status:
+            failures.append(route)
+        print(f"{route:35s} {small[route]:6d} {large[route]:8d} {budget:7d}{status}")
+
+    if failures:
+        print(f"\nTHẤT BẠI: {len(failures)} route hồi quy số truy vấn.")
+        sys.exit(1)
+    print("\nOK: số truy vấn của mọi route nằm trong ngân sách và không tăng theo số Job.")
+
+
+if __name__ == '__main__':
+    main()